@@ -9,7 +9,7 @@ from nengo_extras.vision import Gabor, Mask
 # Requires python image library: pip install pillow
 from PIL import Image
 
-from nengo_fpga.networks import FpgaPesEnsembleNetwork
+from nengo_fpga.networks import ShardedFpgaPesEnsembleNetwork
 
 
 # ------ MISC HELPER FUNCTIONS -----
@@ -35,8 +35,9 @@ def one_hot(labels, c=None):
 
 
 # ---------------- BOARD SELECT ----------------------- #
-# Change this to your desired device name
-board = "de1"
+# Change this to your desired device names (the hidden layer is split across
+# all the listed devices)
+boards = ["de1"]
 # ---------------- BOARD SELECT ----------------------- #
 
 # Set the nengo logging level to 'info' to display all of the information
@@ -79,9 +80,10 @@ test_targets = one_hot(y_test, 10)
 # Set up the vision network parameters
 n_vis = x_train.shape[1]  # Number of training samples
 n_out = train_targets.shape[1]  # Number of output classes
-n_hid = 16000 // (im_size**2)  # Number of neurons to use
-# Note: the number of neurons to use is limited such that NxD <= 16000,
-#       where D = im_size * im_size, and N is the number of neurons to use
+n_hid = len(boards) * (16000 // (im_size**2))  # Number of neurons to use
+# Note: the number of neurons to use on each board is limited such that
+#       NxD <= 16000, where D = im_size * im_size, and N is the number of
+#       neurons on the board
 gabor_size = (int(im_size / 2.5), int(im_size / 2.5))  # Size of the gabor filt
 
 # Generate the encoders for the neural ensemble
@@ -110,10 +112,10 @@ with nengo.Network(seed=3) as model:
         nengo.processes.PresentInput(x_test, presentation_time), label="input"
     )
 
-    # Ensemble to run on the FPGA. This ensemble is non-adaptive and just
+    # Ensemble to run on the FPGAs. This ensemble is non-adaptive and just
     # uses the encoders and decoders to perform the image classification
-    ens = FpgaPesEnsembleNetwork(
-        board,
+    ens = ShardedFpgaPesEnsembleNetwork(
+        boards,
         n_neurons=n_hid,
         dimensions=n_vis,
         learning_rate=0,
@@ -122,15 +124,17 @@ with nengo.Network(seed=3) as model:
         label="output class",
     )
 
-    # Set custom ensemble parameters for the FPGA Ensemble Network
-    ens.ensemble.neuron_type = ens_neuron_type
-    ens.ensemble.intercepts = ens_intercepts
-    ens.ensemble.max_rates = ens_max_rates
-    ens.ensemble.encoders = encoders
+    # Set custom ensemble parameters for the FPGA Ensemble Network (the
+    # encoders are split between the boards)
+    ens.set_ensemble_params(
+        neuron_type=ens_neuron_type,
+        intercepts=ens_intercepts,
+        max_rates=ens_max_rates,
+        encoders=encoders,
+    )
 
     # Set custom connection parameters for the FPGA Ensemble Network
-    ens.connection.synapse = conn_synapse
-    ens.connection.solver = conn_solver
+    ens.set_connection_params(synapse=conn_synapse, solver=conn_solver)
 
     # Output display node
     output_node = nengo.Node(size_in=n_out, label="output class")
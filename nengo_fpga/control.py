@@ -0,0 +1,211 @@
+"""
+Control channel used to query the FPGA board while a simulation is running.
+
+The control channel is a UDP socket separate from the (lockstep) data socket.
+Every request is a packet of float64 values ``[opcode, seq, *args]`` sent to the
+board's control port; the board replies to the sender with a packet starting with
+the same ``[opcode, seq]`` pair followed by the reply payload.
+
+Arrays too large for a single packet are sent back in chunks, each with the
+payload ``[chunk_index, n_chunks, offset, *values]``. A request without arguments
+asks the board for a new snapshot of the array (all chunks), while a request with a
+``chunk_index`` argument asks for that chunk of the latest snapshot to be sent
+again.
+"""
+
+import collections
+import logging
+import socket
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Opcodes understood by the board-side control server
+OP_HEALTH = 1
+OP_DECODERS = 2
+
+# Maximum UDP payload size
+MAX_PACKET_BYTES = 65507
+
+
+class BoardHealth(
+    collections.namedtuple(
+        "BoardHealth",
+        [
+            "host_time",
+            "board_time",
+            "sim_time",
+            "step_time",
+            "queue_depth",
+            "temperature",
+            "latency",
+        ],
+    )
+):
+    """
+    Heartbeat reply from an FPGA board.
+
+    Attributes
+    ----------
+    host_time : float
+        Host wall-clock time (``time.time()``) at which the reply was received.
+    board_time : float
+        Board wall-clock time at which the reply was sent.
+    sim_time : float
+        Latest simulation time processed by the board.
+    step_time : float
+        Average wall-clock duration of a board-side simulation step (in seconds).
+    queue_depth : int
+        Number of packets waiting to be processed on the board.
+    temperature : float
+        Board temperature in degrees Celsius (NaN if not available).
+    latency : float
+        Round-trip time of the heartbeat request (in seconds).
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_reply(cls, reply, host_time, latency):
+        """Create from the payload of an ``OP_HEALTH`` reply."""
+        return cls(
+            host_time=host_time,
+            board_time=float(reply[0]),
+            sim_time=float(reply[1]),
+            step_time=float(reply[2]),
+            queue_depth=int(reply[3]),
+            temperature=float(reply[4]) if len(reply) > 4 else float("nan"),
+            latency=latency,
+        )
+
+    @property
+    def age(self):
+        """Time since this heartbeat was received (in seconds)."""
+        return time.time() - self.host_time
+
+
+class ControlChannel:
+    """
+    Request/reply channel to the board's control port.
+
+    Requests are blocking; they are run in the session manager's thread pool.
+
+    Parameters
+    ----------
+    host_ip : str
+        IP address of the host interface used to reach the board.
+    board_addr : (str, int)
+        Address (ip, control port) of the board-side control server.
+    timeout : float, optional (Default: 1)
+        Maximum time to wait for a reply (in seconds).
+    """
+
+    def __init__(self, host_ip, board_addr, timeout=1.0):
+        self.host_ip = host_ip
+        self.board_addr = board_addr
+        self.timeout = timeout
+
+        self.socket = None
+        self.seq = 0
+        self.recv_buffer = bytearray(MAX_PACKET_BYTES)
+
+        # Requests may be made from several threads (e.g., heartbeats from the
+        # session manager and checkpoints from the main thread)
+        self.lock = threading.Lock()
+
+    def open(self):
+        """Create and bind the control socket (to any free port)."""
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((self.host_ip, 0))
+
+    def close(self):
+        """Close the control socket."""
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+    def send(self, opcode, *args):
+        """Send a request, return its sequence number."""
+        self.seq += 1
+        packet = np.array([opcode, self.seq] + list(args), dtype=np.float64)
+        self.socket.sendto(packet.tobytes(), self.board_addr)
+        return self.seq
+
+    def recv(self, opcode, seqs, deadline):
+        """
+        Receive the next reply to one of the requests ``seqs`` before ``deadline``.
+
+        Replies to other (e.g., timed out) requests are discarded. Raises
+        `socket.timeout` if no reply is received in time.
+        """
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise socket.timeout(f"No reply to control request {opcode}")
+            self.socket.settimeout(remaining)
+            n_bytes = self.socket.recv_into(self.recv_buffer)
+            reply = np.frombuffer(
+                self.recv_buffer, dtype=np.float64, count=n_bytes // 8
+            )
+            if len(reply) >= 2 and reply[0] == opcode and reply[1] in seqs:
+                return reply[2:].copy()
+
+    def request(self, opcode, *args):
+        """Send a request and return the payload of the reply."""
+        with self.lock:
+            seq = self.send(opcode, *args)
+            return self.recv(opcode, (seq,), time.monotonic() + self.timeout)
+
+    def request_array(self, opcode, size, max_retries=3):
+        """
+        Request an array of ``size`` values sent back in several chunks.
+
+        Chunks that are not received within the timeout are requested again (up
+        to ``max_retries`` times).
+        """
+        with self.lock:
+            array = np.zeros(size)
+            received = set()
+            n_chunks = None
+            seqs = (self.send(opcode),)
+
+            for _ in range(max_retries + 1):
+                deadline = time.monotonic() + self.timeout
+                try:
+                    while n_chunks is None or len(received) < n_chunks:
+                        reply = self.recv(opcode, seqs, deadline)
+                        index, n_chunks, offset = (int(v) for v in reply[:3])
+                        values = reply[3:]
+                        if offset + len(values) > size:
+                            raise RuntimeError(
+                                f"Received {offset + len(values)} values from the "
+                                f"board, expected {size}."
+                            )
+                        array[offset : offset + len(values)] = values
+                        received.add(index)
+                    return array
+                except socket.timeout:
+                    if n_chunks is None:
+                        # Nothing received, ask for a new snapshot
+                        seqs = (self.send(opcode),)
+                    else:
+                        seqs = tuple(
+                            self.send(opcode, i)
+                            for i in range(n_chunks)
+                            if i not in received
+                        )
+                    logger.info("Requesting %d missing chunks again", len(seqs))
+
+            raise socket.timeout(
+                f"Received {len(received)} of {n_chunks} chunks after "
+                f"{max_retries} retries"
+            )
+
+    def health(self):
+        """Request a heartbeat from the board, return a `.BoardHealth`."""
+        start = time.monotonic()
+        reply = self.request(OP_HEALTH)
+        return BoardHealth.from_reply(reply, time.time(), time.monotonic() - start)
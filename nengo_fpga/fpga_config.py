@@ -3,6 +3,7 @@
 """Read NengoFPGA config that describes available FPGA devices."""
 
 import configparser
+import functools
 import logging
 
 import nengo_fpga.utils.paths
@@ -17,10 +18,30 @@ fpga_config_files = [
 ]
 
 
+def _loads_config(method):
+    """Load the config files (if not loaded yet) before calling ``method``."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self.loaded:
+            self.reload_config()
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+
 class _FPGA_CONFIG(configparser.ConfigParser):
+    """
+    The NengoFPGA config, read from `fpga_config_files`.
+
+    The config files are only read when the config is first used, so that
+    importing NengoFPGA (e.g., to build models simulated without a board) does
+    not touch the file system.
+    """
+
     def __init__(self):
+        self.loaded = False
         configparser.ConfigParser.__init__(self)
-        self.reload_config()
 
     def _clear(self):
         for s in self.sections():
@@ -46,8 +67,25 @@ class _FPGA_CONFIG(configparser.ConfigParser):
         if filenames is None:
             filenames = fpga_config_files
 
+        self.loaded = True
         self._clear()
         self.read(filenames)
 
+    # Accessors reading the config files on first use
+    read = _loads_config(read)
+    sections = _loads_config(configparser.ConfigParser.sections)
+    has_section = _loads_config(configparser.ConfigParser.has_section)
+    options = _loads_config(configparser.ConfigParser.options)
+    has_option = _loads_config(configparser.ConfigParser.has_option)
+    get = _loads_config(configparser.ConfigParser.get)
+    items = _loads_config(configparser.ConfigParser.items)
+    set = _loads_config(configparser.ConfigParser.set)
+    add_section = _loads_config(configparser.ConfigParser.add_section)
+    remove_section = _loads_config(configparser.ConfigParser.remove_section)
+    __getitem__ = _loads_config(configparser.ConfigParser.__getitem__)
+    __contains__ = _loads_config(configparser.ConfigParser.__contains__)
+    __iter__ = _loads_config(configparser.ConfigParser.__iter__)
+    __len__ = _loads_config(configparser.ConfigParser.__len__)
+
 
 fpga_config = _FPGA_CONFIG()
@@ -1,15 +1,27 @@
 """Top level script for reading device ID."""
 
 import argparse
+import collections
+import concurrent.futures
+import csv
+import json
 import os
 import socket
 import sys
 import threading
-
-import numpy as np
-import paramiko
+import time
 
 from nengo_fpga.fpga_config import fpga_config
+from nengo_fpga.pool import is_pool
+from nengo_fpga.utils.id_cache import IDCache
+from nengo_fpga.utils.ports import allocate_ports, parse_port_range
+from nengo_fpga.utils.ssh import (
+    exec_remote,
+    fetch_host_fingerprint,
+    key_fingerprint,
+    new_ssh_client,
+    sudo_command,
+)
 
 
 class IDExtractor:
@@ -33,24 +45,31 @@ class IDExtractor:
         self.timeout = timeout
 
         # Make SSHClient object
-        self.ssh_client = paramiko.SSHClient()
-        self.ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        self.ssh_client = new_ssh_client()
         self.ssh_info_str = ""
         self.ssh_lock = False
+        self.host_key_type = None
+        self.host_key_fingerprint = None
 
         # Check if the desired FPGA name is defined in the configuration file
         if self.config_found:
             # Handle the tcp port selection: Use the config specified port.
             # If none is provided (i.e., the specified port number is 0),
-            # choose a random tcp port number between 20000 and 65535.
+            # bind a free port (in ``port_range`` if given) and send the bound
+            # port to the board.
             # We will use the udp port number from the config but use tcp.
-            self.tcp_port = int(fpga_config.get(fpga_name, "udp_port"))
-            if self.tcp_port == 0:
-                self.tcp_port = int(np.random.uniform(low=20000, high=65535))
+            allocation = allocate_ports(
+                fpga_config.get("host", "ip"),
+                port=int(fpga_config.get(fpga_name, "udp_port")),
+                port_range=parse_port_range(
+                    fpga_config.get(fpga_name, "port_range", fallback=None)
+                ),
+                sock_type=socket.SOCK_STREAM,
+            )
+            self.tcp_port = allocation.port
 
             # Make the TCP socket for receiving Device ID.
-            self.tcp_init = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.tcp_init.bind((fpga_config.get("host", "ip"), self.tcp_port))
+            self.tcp_init = allocation.sockets[0]
             self.tcp_init.settimeout(self.timeout)
             self.tcp_init.listen(1)  # Ready to accept a connection
             self.tcp_recv = None  # Placeholder until socket is connected
@@ -115,38 +134,47 @@ class IDExtractor:
 
         self.connect_ssh_client(ssh_user, remote_ip)
 
-        # Invoke a shell in the ssh client
-        ssh_channel = self.ssh_client.invoke_shell()
+        # Identify the board by its host key (see `IDCache`)
+        transport = self.ssh_client.get_transport()
+        self.host_key_type = transport.host_key_type
+        self.host_key_fingerprint = key_fingerprint(transport.get_remote_server_key())
+
+        # Launch the ID script on an exec channel, with sudo in the same command
+        # if the SSH user is not root
+        command = sudo_command(self.ssh_string, ssh_user)
+        print(f"<{remote_ip}> Sending cmd to fpga board: \n{command}", flush=True)
+        ssh_channel, launch_time = exec_remote(
+            self.ssh_client, command, combine_stderr=True
+        )
+        print(f"<{remote_ip}> Script launched in {launch_time:0.3f}s", flush=True)
 
-        # If board configuration specifies using sudo to run scripts
-        # - Assume all non-root users will require sudo to run the scripts
-        # - Note: Also assumes that the fpga has been configured to allow
-        #         the ssh user to run sudo commands WITHOUT needing a password
-        #         (see specific fpga hardware docs for details)
-        if ssh_user != "root":
-            print(f"<{remote_ip}> Script to be run with sudo. Sudoing.", flush=True)
-            ssh_channel.send("sudo su\n")
+        # Get and process the information being returned over the ssh
+        # connection until the script terminates. The standard error is combined
+        # with the standard output, since a script filling the SSH window with
+        # unread standard error would block.
+        try:
+            self.process_ssh_stream(ssh_channel.recv, remote_ip)
+            exit_status = ssh_channel.recv_exit_status()
+        finally:
+            ssh_channel.close()
+
+        if exit_status > 0:
+            raise RuntimeError(
+                f"The ID script on <{remote_ip}> exited with status {exit_status}."
+            )
 
-        # Send required ssh string
-        print(
-            f"<{fpga_config.get(self.fpga_name, 'ip')}> Sending cmd to fpga board: \n"
-            f"{self.ssh_string}",
-            flush=True,
-        )
-        ssh_channel.send(self.ssh_string)
+    def process_ssh_stream(self, recv, remote_ip):
+        """Process one output stream (``recv`` function) of the ID script."""
 
         # Variable for remote error handling
         got_error = 0
         error_strs = []
+        self.ssh_info_str = ""
 
-        # Get and process the information being returned over the ssh
-        # connection
         while True:
-            data = ssh_channel.recv(256)
+            data = recv(256)
             if not data:
-                # If no data is received, the client has been closed, so close
-                # the channel, and break out of the while loop
-                ssh_channel.close()
+                # If no data is received, the stream has been closed
                 break
 
             self.process_ssh_output(data)
@@ -160,7 +188,6 @@ class IDExtractor:
             # The traceback usually contains 3 lines, so collect the first
             # three lines then display it.
             if got_error == 2:
-                ssh_channel.close()
                 raise RuntimeError(
                     f"Received the following error on the remote side <{remote_ip}>:\n"
                     + "\n".join(error_strs)
@@ -179,10 +206,8 @@ class IDExtractor:
         connect_thread.start()
 
     def process_ssh_output(self, data):
-        """Clean up the data stream coming back over ssh."""
-        str_data = data.decode("latin1").replace("\r\n", "\r")
-        str_data = str_data.replace("\r\r", "\r")
-        str_data = str_data.replace("\r", "\n")
+        """Collect the data stream coming back over ssh."""
+        str_data = data.decode("latin1")
 
         # Process and dump the returned ssh data to logger. Data (strings)
         # returned over SSH are terminated by a newline, so, keep track of
@@ -229,7 +254,6 @@ class IDExtractor:
                 + fpga_config.get(self.fpga_name, "id_script")
                 + f" --host_ip=\"{fpga_config.get('host', 'ip')}\""
                 + f" --tcp_port={self.tcp_port}"
-                + "\n"
             )
         return ssh_str
 
@@ -265,22 +289,162 @@ class IDExtractor:
         self.id_int = int.from_bytes(self.id_bytes, "big")
 
 
-def main(fpga_name):
+def cached_id(fpga_name, cache, timeout=5):
+    """
+    Return the ID of a board from ``cache``, or None.
+
+    The board's host key of the type recorded in the cache is fetched from the
+    board (SSH key exchange only), and must match the host key of the board the
+    ID was extracted from.
+    """
+    ip = fpga_config.get(fpga_name, "ip")
+    key_type = cache.load().get(ip, {}).get("key_type")
+    if key_type is None:
+        return None
+
+    import paramiko  # pylint: disable=import-outside-toplevel
+
+    port = fpga_config.get(fpga_name, "ssh_port", fallback="22")
+    try:
+        key = fetch_host_fingerprint(ip, port, key_type=key_type, timeout=timeout)
+    except paramiko.SSHException:
+        # No host key of that type, the board was replaced
+        key = (key_type, None)
+    except OSError:
+        return None
+    return cache.get(ip, *key)
+
+
+def extract_id(fpga_name, cache=None, refresh=False):
+    """
+    Extract the ID (int) of a board, return it and whether it was cached.
+
+    If ``cache`` is given, known boards are answered from the cache (unless
+    ``refresh``), and extracted IDs are added to the cache.
+    """
+    if cache is not None and not refresh:
+        id_int = cached_id(fpga_name, cache)
+        if id_int is not None:
+            return id_int, True
+
+    # Connect to FPGA, run script to get ID
+    fpga = IDExtractor(fpga_name)
+    try:
+        fpga.connect()
+        fpga.recv_id()
+    finally:
+        fpga.cleanup()
+
+    if cache is not None and fpga.host_key_fingerprint is not None:
+        cache.put(
+            fpga_config.get(fpga_name, "ip"),
+            fpga.host_key_type,
+            fpga.host_key_fingerprint,
+            fpga.id_int,
+        )
+    return fpga.id_int, False
+
+
+def main(fpga_name, cache=None, refresh=False):
     """Main script to extract device ID."""
     filename = "id_" + fpga_name + ".txt"
 
-    # Connect to FPGA, run script to get ID, write ID to file
-    fpga = IDExtractor(fpga_name)
-    fpga.connect()
-    fpga.recv_id()
+    # Get the ID (from the board or the cache), write ID to file
+    id_int, cached = extract_id(fpga_name, cache=cache, refresh=refresh)
 
-    id_str = f"Found board ID: {fpga.id_int:#018X}"
+    id_str = f"Found board ID: {id_int:#018X}"
 
     with open(filename, "w", encoding="ascii") as file:
         file.write(id_str)
-    fpga.cleanup()
-    print(id_str)
+    print(id_str + (" (cached)" if cached else ""))
+    print(f"Written to file {filename}")
+
+
+# Columns of the ID inventory files
+INVENTORY_FIELDS = ("fpga_name", "ip", "id", "cached", "time", "error")
+
+
+def board_names():
+    """Names of all the FPGA board sections of the ``fpga_config`` file."""
+    return [
+        name for name in fpga_config.sections() if name != "host" and not is_pool(name)
+    ]
+
+
+def scan_board(fpga_name, cache=None, refresh=False):
+    """
+    Extract the ID of one board (see `extract_id`).
+
+    Returns an inventory record with the board's ID (or the error that occurred),
+    whether it was cached, and the time (in seconds) taken to get it.
+    """
+    record = dict.fromkeys(INVENTORY_FIELDS)
+    record["fpga_name"] = fpga_name
+    record["ip"] = fpga_config.get(fpga_name, "ip")
+
+    start = time.perf_counter()
+    try:
+        id_int, record["cached"] = extract_id(fpga_name, cache=cache, refresh=refresh)
+        record["id"] = f"{id_int:#018X}"
+    except Exception as e:  # pylint: disable=broad-except
+        record["error"] = str(e)
+    record["time"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def scan(fpga_names, max_workers=None, cache=None, refresh=False):
+    """
+    Extract the IDs of several boards concurrently (see `extract_id`).
+
+    Boards configured with the same (non-zero) port are scanned one after the
+    other, since their ID sockets are bound to the same host port. Returns the
+    inventory records (see `scan_board`) in the order of ``fpga_names``.
+    """
+    groups = collections.defaultdict(list)
+    for fpga_name in fpga_names:
+        port = int(fpga_config.get(fpga_name, "udp_port"))
+        groups[fpga_name if port == 0 else port].append(fpga_name)
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max_workers or max(len(groups), 1)
+    ) as executor:
+        results = executor.map(
+            lambda names: [scan_board(name, cache, refresh) for name in names],
+            groups.values(),
+        )
+        records = {record["fpga_name"]: record for group in results for record in group}
+    return [records[fpga_name] for fpga_name in fpga_names]
+
+
+def write_inventory(records, filename):
+    """Write inventory records to a JSON (``.json``) or CSV (otherwise) file."""
+    with open(filename, "w", encoding="utf-8", newline="") as file:
+        if filename.endswith(".json"):
+            json.dump(records, file, indent=2)
+            file.write("\n")
+        else:
+            writer = csv.DictWriter(file, fieldnames=INVENTORY_FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+
+
+def scan_main(fpga_names, filename, cache=None, refresh=False):
+    """Main script to extract the IDs of several boards into an inventory."""
+    start = time.perf_counter()
+    records = scan(fpga_names, cache=cache, refresh=refresh)
+    write_inventory(records, filename)
+
+    for record in records:
+        result = record["id"] if record["error"] is None else "ERROR"
+        if record["cached"]:
+            result += " (cached)"
+        print(f"{record['fpga_name']}: {result} ({record['time']:.1f}s)")
+    print(
+        f"Scanned {len(records)} boards in {time.perf_counter() - start:.1f}s, "
+        f"{sum(record['error'] is not None for record in records)} failed"
+    )
     print(f"Written to file {filename}")
+    return records
 
 
 def run():
@@ -291,22 +455,58 @@ def run():
             + "FPGA board."
         )
 
-        # FPGA board name
+        # FPGA board names
         parser.add_argument(
             "fpga_name",
             type=str,
+            nargs="*",
             help="Name of the FPGA board as specified in the fpga_config file",
         )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Scan all the FPGA boards of the fpga_config file",
+        )
+        parser.add_argument(
+            "--output",
+            type=str,
+            default=None,
+            help="Inventory file (.csv or .json) of the IDs of several boards "
+            + "(default: id_inventory.csv)",
+        )
 
-        # Print full help text, otherwise error message isn't very useful
-        if len(sys.argv) != 2:
-            parser.print_help()
-            sys.exit()
+        parser.add_argument(
+            "--refresh",
+            action="store_true",
+            help="Extract the IDs from the boards even if they are cached",
+        )
 
         # Parse the arguments
         args = parser.parse_args()
+        cache = IDCache()
+        fpga_names = board_names() if args.all else args.fpga_name
 
-        main(args.fpga_name)
+        # Print full help text, otherwise error message isn't very useful
+        if len(fpga_names) == 0:
+            parser.print_help()
+            sys.exit()
+
+        if len(fpga_names) == 1 and not args.all and args.output is None:
+            main(fpga_names[0], cache=cache, refresh=args.refresh)
+        else:
+            missing = [name for name in fpga_names if not fpga_config.has_section(name)]
+            if missing:
+                print(f"ERROR: Specified FPGA configurations {missing} not found.")
+                sys.exit(1)
+
+            records = scan_main(
+                fpga_names,
+                args.output or "id_inventory.csv",
+                cache=cache,
+                refresh=args.refresh,
+            )
+            if any(record["error"] is not None for record in records):
+                sys.exit(1)
 
 
 run()  # Run the __name__ == __main__ case by default (wrapper function)
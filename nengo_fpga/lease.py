@@ -0,0 +1,427 @@
+"""
+Leases of FPGA boards shared between the processes of a host.
+
+A board can only run one model at a time, and a board used by another process
+is only detected once its script has been started (after connecting over SSH
+and uploading the model). To avoid these failed startups, networks lease their
+board from a local `.LeaseBroker` before connecting to it. The broker is a small
+daemon listening on a Unix socket (``python -m nengo_fpga.lease``) that grants
+leases in the order they are requested. If no broker is running, boards are
+leased with file locks instead (see `.FileLeases`).
+
+The socket and lock files are kept in a directory shared by the users of the
+host (``lease_dir`` in the ``[host]`` section of the config), which is created
+group-writable so that the boards are leased across users.
+
+Leases end when they are released, when the leasing process exits, or (with the
+broker) after their time-to-live.
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import os
+import socket
+import tempfile
+import time
+
+from nengo_fpga.fpga_config import fpga_config
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover (Windows)
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Default lease settings (overridden in the ``[host]`` section of the config)
+LEASE_DIR = os.path.join(tempfile.gettempdir(), "nengo-fpga-leases")
+LEASE_TTL = 24 * 3600  # seconds
+LEASE_WAIT = 600  # seconds
+
+
+def make_shared_dir(path):
+    """Create the directory ``path`` (if needed) writable by the owner's group."""
+    if os.path.isdir(path):
+        return
+    os.makedirs(path, exist_ok=True)
+    # Set explicitly, since ``makedirs`` is restricted by the umask. The setgid
+    # bit makes the lock files inherit the group of the directory.
+    os.chmod(path, 0o2775)
+
+
+class BrokerLease:
+    """A board leased from a `.LeaseBroker`, held while the connection is open."""
+
+    def __init__(self, board, writer):
+        self.board = board
+        self._writer = writer
+        self._loop = asyncio.get_running_loop()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.board!r})"
+
+    def release(self):
+        """Return the board to the broker (can be called from any thread)."""
+        if self._writer is None or self._loop.is_closed():
+            return
+        writer, self._writer = self._writer, None
+        try:
+            running = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            running = False
+        if running:
+            writer.close()
+        else:
+            self._loop.call_soon_threadsafe(writer.close)
+
+
+class LeaseClient:
+    """
+    Leases boards from the `.LeaseBroker` listening on the Unix socket ``path``.
+
+    Parameters
+    ----------
+    path : str
+        Path of the broker's Unix socket.
+    ttl : float, optional (Default: `LEASE_TTL`)
+        Maximum duration (in seconds) of the leases.
+    fallback : `.FileLeases`, optional (Default: None)
+        Used instead of the broker if it cannot be reached.
+    """
+
+    def __init__(self, path, ttl=LEASE_TTL, fallback=None):
+        self.path = path
+        self.ttl = ttl
+        self.fallback = fallback
+
+    async def acquire(self, boards, timeout=None):
+        """
+        Lease the first free board of ``boards``.
+
+        Waits (in turn with the other clients of the broker) for up to
+        ``timeout`` seconds (forever if ``None``) for one of the boards to be
+        free, returns ``None`` if none is.
+        """
+        try:
+            reader, writer = await asyncio.open_unix_connection(self.path)
+        except OSError as e:
+            if self.fallback is None:
+                raise
+            logger.warning("Could not reach the lease broker (%s), using file locks", e)
+            return await self.fallback.acquire(boards, timeout=timeout)
+
+        try:
+            request = {
+                "op": "acquire",
+                "boards": list(boards),
+                "ttl": self.ttl,
+                "wait": timeout is None or timeout > 0,
+                "client": f"{socket.gethostname()}:{os.getpid()}",
+            }
+            writer.write(json.dumps(request).encode() + b"\n")
+            await writer.drain()
+            try:
+                line = await asyncio.wait_for(reader.readline(), timeout)
+            except asyncio.TimeoutError:
+                line = b'{"board": null}'
+            reply = json.loads(line or b'{"error": "connection closed"}')
+            if "error" in reply:
+                raise RuntimeError(f"Lease broker error: {reply['error']}")
+        except BaseException:
+            writer.close()
+            raise
+
+        if reply["board"] is None:
+            writer.close()
+            return None
+        return BrokerLease(reply["board"], writer)
+
+
+class FileLease:
+    """A board leased with a file lock, held while the file is open."""
+
+    def __init__(self, board, lock_file):
+        self.board = board
+        self._lock_file = lock_file
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.board!r})"
+
+    def release(self):
+        """Unlock the board."""
+        if self._lock_file is not None:
+            self._lock_file.close()  # Also releases the lock
+            self._lock_file = None
+
+
+class FileLeases:
+    """
+    Leases boards with locks on files of the directory ``path``.
+
+    Used when no broker is running. Unlike the broker, waiting clients are not
+    served in order (they poll the locks every ``poll_interval`` seconds), and
+    leases are only bounded by the lifetime of the leasing process.
+    """
+
+    def __init__(self, path=LEASE_DIR, poll_interval=0.5):
+        self.path = path
+        self.poll_interval = poll_interval
+
+    def try_acquire(self, board):
+        """Lease ``board`` if it is free, return ``None`` otherwise."""
+        make_shared_dir(self.path)
+        # Locks only need read access, so the files of other users can be used
+        fd = os.open(
+            os.path.join(self.path, f"{board}.lock"), os.O_RDONLY | os.O_CREAT, 0o664
+        )
+        lock_file = os.fdopen(fd, "rb")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        except BaseException:
+            lock_file.close()
+            raise
+        return FileLease(board, lock_file)
+
+    async def acquire(self, boards, timeout=None):
+        """
+        Lease the first free board of ``boards``.
+
+        Waits for up to ``timeout`` seconds (forever if ``None``) for one of the
+        boards to be free, returns ``None`` if none is.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            for board in boards:
+                lease = self.try_acquire(board)
+                if lease is not None:
+                    return lease
+
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            delay = self.poll_interval
+            if deadline is not None:
+                delay = min(delay, deadline - time.monotonic())
+            await asyncio.sleep(max(delay, 0))
+
+
+def lease_dir():
+    """Directory of the lease socket and lock files, from the config."""
+    return os.path.expanduser(fpga_config.get("host", "lease_dir", fallback=LEASE_DIR))
+
+
+def lease_socket():
+    """Path of the lease broker's socket, from the config."""
+    return os.path.expanduser(
+        fpga_config.get(
+            "host", "lease_socket", fallback=os.path.join(lease_dir(), "broker.sock")
+        )
+    )
+
+
+def lease_manager():
+    """
+    Lease manager configured in the ``[host]`` section of the config.
+
+    The ``leases`` option selects the lease manager: ``auto`` (the default) uses
+    the broker listening on ``lease_socket`` if it exists and file locks in
+    ``lease_dir`` otherwise, ``broker`` always uses the broker, ``file`` always
+    uses file locks, and ``none`` disables leases (``None`` is returned).
+    """
+    mode = fpga_config.get("host", "leases", fallback="auto").strip().lower()
+    if mode not in ("auto", "broker", "file", "none"):
+        raise ValueError(
+            f"Unknown lease mode '{mode}' (must be auto, broker, file or none)"
+        )
+    if mode == "none":
+        return None
+
+    path = lease_socket()
+    ttl = fpga_config.getfloat("host", "lease_ttl", fallback=LEASE_TTL)
+    file_leases = FileLeases(lease_dir()) if fcntl is not None else None
+
+    if mode == "broker" or (
+        mode == "auto" and hasattr(socket, "AF_UNIX") and os.path.exists(path)
+    ):
+        return LeaseClient(
+            path, ttl=ttl, fallback=file_leases if mode == "auto" else None
+        )
+    return file_leases
+
+
+def lease_wait():
+    """Time (in seconds) to wait for a leased board, from the config."""
+    return fpga_config.getfloat("host", "lease_wait", fallback=LEASE_WAIT)
+
+
+class LeaseBroker:
+    """
+    Grants leases of FPGA boards to the processes of a host.
+
+    Clients connect to the Unix socket ``path`` and send one JSON line
+    ``{"op": "acquire", "boards": [...], "ttl": ..., "wait": ...}``. The broker
+    answers ``{"board": <name>}`` once one of the boards is free (or
+    ``{"board": null}`` straight away if ``wait`` is false), and the lease is
+    held until the client closes the connection or ``ttl`` seconds have passed.
+    Waiting clients are served in the order they connected. A
+    ``{"op": "status"}`` request returns the current leases and queue.
+
+    Parameters
+    ----------
+    path : str
+        Path of the Unix socket.
+    max_ttl : float, optional (Default: `LEASE_TTL`)
+        Maximum duration (in seconds) of the leases.
+    """
+
+    def __init__(self, path, max_ttl=LEASE_TTL):
+        self.path = path
+        self.max_ttl = max_ttl
+
+        self.leases = {}  # board -> (client, expiry time)
+        self.waiters = collections.deque()  # (boards, client, future)
+        self.server = None
+
+    async def start(self):
+        """Start listening on the socket."""
+        if os.path.exists(self.path):
+            os.remove(self.path)  # Left behind by a broker that was killed
+        make_shared_dir(os.path.dirname(os.path.abspath(self.path)))
+        self.server = await asyncio.start_unix_server(self.handle, path=self.path)
+        os.chmod(self.path, 0o666)  # Boards are shared between users
+        logger.info("Lease broker listening on %s", self.path)
+
+    async def close(self):
+        """Stop listening on the socket."""
+        self.server.close()
+        await self.server.wait_closed()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def status(self):
+        """Current leases and waiting clients."""
+        now = time.time()
+        return {
+            "leases": {
+                board: {"client": client, "remaining": expiry - now}
+                for board, (client, expiry) in self.leases.items()
+            },
+            "waiting": [
+                {"client": client, "boards": boards}
+                for boards, client, _, _ in self.waiters
+            ],
+        }
+
+    def dispatch(self):
+        """Grant free boards to the waiting clients, in order."""
+        for waiter in list(self.waiters):
+            boards, client, ttl, future = waiter
+            if future.done():
+                self.waiters.remove(waiter)
+                continue
+            free = [board for board in boards if board not in self.leases]
+            if free:
+                self.waiters.remove(waiter)
+                self.leases[free[0]] = (client, time.time() + ttl)
+                future.set_result(free[0])
+
+    async def handle(self, reader, writer):
+        """Serve one client connection."""
+        try:
+            request = json.loads(await reader.readline() or b"{}")
+            if request.get("op") == "status":
+                writer.write(json.dumps(self.status()).encode() + b"\n")
+            elif request.get("op") == "acquire" and request.get("boards"):
+                await self.lease(request, reader, writer)
+            else:
+                writer.write(
+                    json.dumps({"error": f"Invalid request {request}"}).encode() + b"\n"
+                )
+            await writer.drain()
+        except (ValueError, OSError):
+            pass  # Invalid JSON or client gone
+        finally:
+            writer.close()
+
+    async def lease(self, request, reader, writer):
+        """Lease a board to a client until it disconnects or the lease expires."""
+        client = str(request.get("client", "unknown"))
+        ttl = min(float(request.get("ttl", self.max_ttl)), self.max_ttl)
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append((list(request["boards"]), client, ttl, future))
+        self.dispatch()
+
+        closed = asyncio.ensure_future(reader.read())  # Returns at EOF
+        try:
+            if not future.done() and request.get("wait", True):
+                await asyncio.wait(
+                    {future, closed}, return_when=asyncio.FIRST_COMPLETED
+                )
+            if not future.done():
+                # Not waiting, or the client left while waiting
+                future.cancel()
+                writer.write(b'{"board": null}\n')
+                return
+
+            board = future.result()
+            try:
+                logger.info("Leased %s to %s", board, client)
+                writer.write(json.dumps({"board": board}).encode() + b"\n")
+                await writer.drain()
+                await asyncio.wait_for(asyncio.shield(closed), ttl)
+            except asyncio.TimeoutError:
+                logger.warning("Lease of %s by %s expired", board, client)
+            finally:
+                del self.leases[board]
+                logger.info("Released %s", board)
+        finally:
+            closed.cancel()
+            self.dispatch()
+
+
+def main(argv=None):
+    """Run the lease broker (or show its status)."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--socket",
+        default=lease_socket(),
+        help="path of the Unix socket",
+    )
+    parser.add_argument(
+        "--max-ttl", type=float, default=LEASE_TTL, help="maximum lease duration (s)"
+    )
+    parser.add_argument(
+        "--status", action="store_true", help="show the leases and exit"
+    )
+    args = parser.parse_args(argv)
+
+    if args.status:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(args.socket)
+            sock.sendall(b'{"op": "status"}\n')
+            print(json.dumps(json.loads(sock.makefile().readline()), indent=2))
+        return
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    async def serve():
+        broker = LeaseBroker(args.socket, max_ttl=args.max_ttl)
+        await broker.start()
+        try:
+            await broker.server.serve_forever()
+        finally:
+            await broker.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
 """Self contained networks to be run on the FPGA."""
 
 from .fpga_pes_ensemble_network import FpgaPesEnsembleNetwork
+from .sharded_fpga_pes_ensemble_network import ShardedFpgaPesEnsembleNetwork
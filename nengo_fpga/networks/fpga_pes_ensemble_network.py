@@ -6,22 +6,42 @@ FPGA network containing:
 - Feedback connection
 """
 
+import asyncio
+import collections
 import logging
 import os
 import socket
-import sys
 import threading
 import time
+import uuid
 from functools import partial
 
 import nengo
 import numpy as np
-import paramiko
 from nengo.builder.operator import Copy, Reset, SimPyFunc
 from nengo.builder.signal import Signal
 
+from nengo_fpga.control import OP_DECODERS, ControlChannel
 from nengo_fpga.fpga_config import fpga_config
-from nengo_fpga.utils.fileio import write_array
+from nengo_fpga.lease import lease_manager, lease_wait
+from nengo_fpga.pool import BoardBusyError, BoardPool, is_pool
+from nengo_fpga.reconnect import ReconnectPolicy
+from nengo_fpga.session import SessionManager
+from nengo_fpga.telemetry import SimTelemetry, Telemetry, TelemetryStream
+from nengo_fpga.utils import janitor
+from nengo_fpga.utils.fileio import (
+    digest_arg_data,
+    get_compressor,
+    load_checkpoint,
+    save_checkpoint,
+    write_arg_data,
+)
+from nengo_fpga.utils.jitter import JitterBuffer
+from nengo_fpga.utils.paths import cache_dir
+from nengo_fpga.utils.ports import allocate_ports, parse_port_range
+from nengo_fpga.utils.remote_log import RemoteLog, remote_log_queue, remote_logger
+from nengo_fpga.utils.ssh import exec_remote, new_ssh_client, sudo_command
+from nengo_fpga.worker import RemoteWorker, get_worker
 
 logger = logging.getLogger(__name__)
 
@@ -33,7 +53,9 @@ class FpgaPesEnsembleNetwork(nengo.Network):
     Parameters
     ----------
     fpga_name : str
-        The name of the fpga defined in the config file.
+        The name of the fpga defined in the config file, or of a pool of boards
+        (``"pool:<name>"``, see `.BoardPool`) of which the first free board
+        is used.
     n_neurons : int
         The number of neurons.
     dimensions : int
@@ -68,11 +90,45 @@ class FpgaPesEnsembleNetwork(nengo.Network):
         from the FPGA board. Default: 300s
         ``recv_timeout``: Determines the maximum timeout for each packet received
         from the FPGA board. Default: 0.1s
+        ``heartbeat_interval``: If not ``None``, the board is polled for its
+        health (see ``health``) at this interval over a separate control channel
+        (on port ``udp_port + 1`` of the board). Default: None
+        ``heartbeat_timeout``: Determines the maximum timeout to wait for a reply
+        to a heartbeat or control request. Default: 1s
+        ``jitter_delay``: In ``"realtime"`` mode, playout delay of the jitter
+        buffer (in seconds). Default: two simulation steps
+        ``jitter_buffer_size``: In ``"realtime"`` mode, maximum number of samples
+        kept in the jitter buffer. Default: 1024
+        ``control``: Enables the control channel (required to read the learned
+        decoders back from the board, see ``read_decoders``). Default: enabled if
+        ``heartbeat_interval`` or ``reconnect`` is set
     feedback : float or (D_out, D_in) array_like, optional
         Defines the transform for a recurrent connection. If ``None``, no
         recurrent connection will be built. The default synapse used for the
         recurrent connection is ``nengo.Lowpass(0.1)``, this can be changed
         using the ``feedback`` attribute of this class.
+    reconnect : bool or `nengo_fpga.reconnect.ReconnectPolicy`, optional
+        If not ``None``, the connection to the FPGA board is automatically
+        re-established (restarting the board-side script) when it is lost during
+        a simulation, instead of terminating the simulation. The reconnected
+        board restores the most recent decoders captured from the lost board
+        (see ``decoder_snapshot``), not its exact state. ``True`` uses the
+        default `nengo_fpga.reconnect.ReconnectPolicy`. Not available in
+        ``"realtime"`` mode. Default: None
+    telemetry : `nengo_fpga.telemetry.Telemetry`, optional
+        If not ``None``, the board streams the given telemetry (neuron activities
+        and/or decoder snapshots) to the host so that ``ensemble``, its neurons
+        and the ``weights`` of ``connection`` can be probed. Default: None
+    mode : "lockstep", "realtime" or "offline", optional (Default: "lockstep")
+        In ``"lockstep"`` mode, the board exchanges one packet with the host for
+        every simulation step and waits for the host. In ``"realtime"`` mode, the
+        board runs at wall-clock ``dt`` and the host exchanges samples with it
+        through a jitter buffer (see ``jitter_buffer``), so host pauses do not
+        stall the board (the host simulation must then be paced to wall-clock
+        time, which `nengo_fpga.Simulator` does by default). In ``"offline"`` mode, the input and error signals
+        for the whole run are set in advance (see ``set_trajectory``) and
+        uploaded in bulk, the board runs at hardware speed and its output is
+        fetched back in bulk and played back by the ``output`` node.
     label : str, optional (Default: None)
         A descriptive label for the connection.
     seed : int, optional (Default: None)
@@ -102,6 +158,43 @@ class FpgaPesEnsembleNetwork(nengo.Network):
     feedback : `nengo.Connection`
         The connection object used to configure the recurrent connection
         implementation on the FPGA board.
+    remote_log : `nengo_fpga.utils.remote_log.RemoteLog`
+        Ring buffer of the most recent output of the FPGA board script.
+    health : `nengo_fpga.control.BoardHealth`
+        Latest heartbeat received from the FPGA board (``None`` if heartbeats are
+        disabled or none has been received yet).
+    health_history : `collections.deque`
+        The most recent heartbeats received from the FPGA board.
+    missed_heartbeats : int
+        Number of consecutive heartbeat requests that went unanswered.
+    initial_decoders : (size_out, n_neurons) array_like
+        If not ``None``, overrides the initial decoders of the learning
+        connection (e.g., with a checkpoint, see ``load_checkpoint``).
+    last_decoders : (size_out, n_neurons) array_like
+        Decoders most recently read from the FPGA board with ``read_decoders``
+        (``None`` if they have not been read yet).
+    decoder_snapshot : ((size_out, n_neurons) array_like, float)
+        The most recent decoders captured from the FPGA board since it was
+        connected, and the board time at which they were captured (``None`` if
+        none were captured). Decoders are captured by ``read_decoders``, by
+        decoder telemetry and, with a reconnection policy, periodically over the
+        control channel (see `nengo_fpga.reconnect.ReconnectPolicy`). When the
+        board reconnects, these decoders are restored (the learning since the
+        snapshot is lost). Cleared when the network is closed or reset.
+    jitter_buffer : `nengo_fpga.utils.jitter.JitterBuffer`
+        In ``"realtime"`` mode, buffer of the output samples received from the
+        FPGA board (created by the builder).
+    offline_chunk_steps : int
+        Number of steps run by the board per offline transfer (``None`` to run
+        all the requested steps in a single transfer).
+    pool : `nengo_fpga.pool.BoardPool`
+        The pool of boards the board is chosen from (``None`` if ``fpga_name``
+        names a board).
+    pool_wait_time : float
+        Time (in seconds) spent waiting for a free board of the pool on the
+        last connection.
+    lease : `nengo_fpga.lease.BrokerLease` or `nengo_fpga.lease.FileLease`
+        The lease of the board while connected (see `nengo_fpga.lease`).
     """
 
     def __init__(
@@ -115,26 +208,53 @@ class FpgaPesEnsembleNetwork(nengo.Network):
         eval_points=nengo.Default,
         socket_args=None,
         feedback=None,
+        reconnect=None,
+        telemetry=None,
+        mode="lockstep",
         label=None,
         seed=None,
         add_to_container=None,
     ):
         # Flags for determining whether or not the FPGA board is being used
         self.config_found = fpga_config.has_section(fpga_name)
+        self.pool = None
+        self.pool_wait_time = 0.0
+        self.lease = None
         self.fpga_found = True  # TODO: Ping board to determine?
         self.using_fpga_sim = False
+        # Set by `nengo_fpga.Simulator` while it builds the model, so that the
+        # board is only started by the builds it requested
+        self.start_on_build = False
 
-        # Make SSHClient object
-        self.ssh_client = paramiko.SSHClient()
-        self.ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        self.ssh_info_str = ""
+        # SSHClient object (created on first use, see `ssh_client`)
+        self._ssh_client = None
         self.ssh_lock = False
 
+        # Ring buffer of the most recent output of the board-side script
+        self.remote_log = RemoteLog()
+
+        # The SSH session runs on the event loop of a session manager (shared
+        # between all FPGA networks when using `nengo_fpga.Simulator`)
+        self.session_manager = None
+        self._own_session_manager = False
+        self.ssh_future = None
+        self.connect_future = None
+        self.handshake_cancelled = threading.Event()
+        self.launch_time = None
+
+        # Persistent board-side worker running the models (if enabled)
+        self.use_worker = False
+        self.worker = None
+
         # Save ssh details
         self.fpga_name = fpga_name
-        self.arg_data_path = os.curdir
+        self.arg_data_path = cache_dir
         self.arg_data_file = ""
 
+        # Unique name of the data files of this network (``id(self)`` may be
+        # reused by other processes sharing the same directories)
+        self.uid = uuid.uuid4().hex[:16]
+
         # Process dimensions, function, transform arguments
         self.input_dimensions = dimensions
 
@@ -162,26 +282,105 @@ class FpgaPesEnsembleNetwork(nengo.Network):
         # Call the superconstructor
         super().__init__(label, seed, add_to_container)
 
-        # Socket attributes
+        # Socket attributes (the communication buffers are cleared on connect)
         self.udp_socket = None
-        self.send_buffer = None
-        self.recv_buffer = None
+        self.send_buffer = np.zeros(self.input_dimensions + self.output_dimensions + 1)
+        self.recv_buffer = np.zeros(self.output_dimensions + 1)
 
         if socket_args is None:
             socket_args = {}
         self.connect_timeout = socket_args.get("connect_timeout", 30)
         self.recv_timeout = socket_args.get("recv_timeout", 0.1)
+        self.heartbeat_interval = socket_args.get("heartbeat_interval", None)
+        self.heartbeat_timeout = socket_args.get("heartbeat_timeout", 1.0)
+        self.jitter_delay = socket_args.get("jitter_delay", None)
+        self.jitter_buffer_size = socket_args.get("jitter_buffer_size", 1024)
+
+        # Reconnection attributes
+        if reconnect is True:
+            reconnect = ReconnectPolicy()
+        elif not (reconnect is None or isinstance(reconnect, ReconnectPolicy)):
+            raise nengo.exceptions.ValidationError(
+                "Must be None, True or a ReconnectPolicy", "reconnect", self
+            )
+        self.reconnect = reconnect
+        self.control_enabled = socket_args.get(
+            "control", self.heartbeat_interval is not None or reconnect is not None
+        )
+        self.reconnect_future = None
+        self.n_reconnects = 0
+        self.n_timeouts = 0
+        self.hold_steps = 0
+        self.last_output = None
+
+        # Telemetry attributes
+        if not (telemetry is None or isinstance(telemetry, Telemetry)):
+            raise nengo.exceptions.ValidationError(
+                "Must be None or a Telemetry", "telemetry", self
+            )
+        self.telemetry = telemetry
+        self.telemetry_stream = None
+
+        # Real-time and offline mode attributes
+        if mode not in ("lockstep", "realtime", "offline"):
+            raise nengo.exceptions.ValidationError(
+                "Must be 'lockstep', 'realtime' or 'offline'", "mode", self
+            )
+        if mode == "offline" and telemetry is not None:
+            raise nengo.exceptions.ValidationError(
+                "Telemetry is not available in offline mode", "telemetry", self
+            )
+        if mode == "realtime" and reconnect is not None:
+            raise nengo.exceptions.ValidationError(
+                "Reconnection is not available in realtime mode", "reconnect", self
+            )
+        self.mode = mode
+        self.jitter_buffer = None
+        self.trajectory = None
+        self.offline_chunk_steps = None
+        self.offline_start = 0
+        self.offline_output = np.zeros((0, self.output_dimensions))
+        self.offline_decoders = None
+        self.offline_range = None
+
+        # Board health monitoring attributes
+        self.control_channel = None
+        self.health_future = None
+        self.health = None
+        self.health_history = collections.deque(maxlen=100)
+        self.missed_heartbeats = 0
+
+        # Decoder checkpoint attributes
+        self.initial_decoders = None
+        self.last_decoders = None
+        self.decoder_snapshot = None
+        self.resume_decoders = None
+        self.snapshot_future = None
+        self.arg_data = None
+        self.arg_codec = "none"
+
+        # Port allocation attributes
+        self.port_range = None
+        self.port_attempts = 0  # Number of port collisions
 
         # Check if the desired FPGA name is defined in the configuration file
         if self.config_found:
-            # Handle the udp port selection: Use the config specified port.
-            # If none is provided (i.e., the specified port number is 0),
-            # choose a random udp port number between 20000 and 65535.
-            self.udp_port = int(fpga_config.get(fpga_name, "udp_port"))
-            if self.udp_port == 0:
-                self.udp_port = int(np.random.uniform(low=20000, high=65535))
-
-            self.send_addr = (fpga_config.get(fpga_name, "ip"), self.udp_port)
+            if is_pool(fpga_name):
+                if mode == "offline":
+                    raise nengo.exceptions.ValidationError(
+                        "Board pools are not supported in offline mode", "mode", self
+                    )
+                try:
+                    self.pool = BoardPool(fpga_name)
+                except ValueError as e:
+                    raise nengo.exceptions.ValidationError(
+                        str(e), "fpga_name", self
+                    ) from e
+
+                # The board is chosen when connecting
+                fpga_name = self.pool.boards[0]
+
+            self.select_board(fpga_name)
         else:
             # FPGA name not found, throw a warning.
             logger.warning("Specified FPGA configuration '%s' not found.", fpga_name)
@@ -230,6 +429,37 @@ class FpgaPesEnsembleNetwork(nengo.Network):
         for k, v in self.objects.items():
             self.objects[k] = tuple(v)
 
+    def select_board(self, fpga_name):
+        """Use the FPGA board ``fpga_name`` (e.g., one of the boards of a pool)."""
+        self.fpga_name = fpga_name
+
+        # Handle the udp port selection: Use the config specified port.
+        # If none is provided (i.e., the specified port number is 0), a free
+        # port (in ``port_range`` if given) is bound when connecting.
+        self.set_udp_port(int(fpga_config.get(fpga_name, "udp_port")))
+        try:
+            self.port_range = parse_port_range(
+                fpga_config.get(fpga_name, "port_range", fallback=None)
+            )
+        except ValueError as e:
+            raise nengo.exceptions.ValidationError(str(e), "port_range", self) from e
+
+        # Compression codec of the parameter uploads
+        self.arg_codec = fpga_config.get(fpga_name, "arg_codec", fallback="none")
+        try:
+            get_compressor(self.arg_codec)
+        except ValueError as e:
+            raise nengo.exceptions.ValidationError(str(e), "arg_codec", self) from e
+
+        # Run the models on a persistent board-side worker
+        self.use_worker = fpga_config.getboolean(fpga_name, "worker", fallback=False)
+
+    def set_udp_port(self, udp_port):
+        """Use port ``udp_port`` (and the following ports) for the board."""
+        self.udp_port = udp_port
+        self.send_addr = (fpga_config.get(self.fpga_name, "ip"), self.udp_port)
+        self.control_addr = (fpga_config.get(self.fpga_name, "ip"), self.udp_port + 1)
+
     def get_output_dim(self, function, dimensions):
         """Simplify init function by moving output shape calculation here."""
         if function is nengo.Default:
@@ -243,15 +473,6 @@ class FpgaPesEnsembleNetwork(nengo.Network):
                 "Must be callable or array-like", "function", self
             )
 
-    @property
-    def local_data_filepath(self):
-        """
-        Full path to ensemble parameter value data file on the local system.
-
-        Ensemble parameter values are generated by the builder.
-        """
-        return os.path.join(self.arg_data_path, self.arg_data_file)
-
     def terminate_client(self):
         """
         Send termination packet to FPGA board.
@@ -272,6 +493,35 @@ class FpgaPesEnsembleNetwork(nengo.Network):
         if not self.config_found:
             return
 
+        # Stop any connection or reconnection in progress
+        if self.connect_future is not None:
+            self.connect_future.cancel()
+            self.connect_future = None
+        if self.reconnect_future is not None:
+            self.reconnect_future.cancel()
+            self.reconnect_future = None
+
+        self.disconnect()
+
+        # The next connection starts from the initial decoders
+        self.decoder_snapshot = None
+        self.resume_decoders = None
+
+        if self._own_session_manager:
+            self.session_manager.close()
+            self.session_manager = None
+            self._own_session_manager = False
+
+    def disconnect(self):
+        """
+        Close the UDP, control and SSH connections to the FPGA board.
+
+        Unlike `close`, this can be called from the session manager's event loop.
+        """
+
+        # Stop waiting for the handshake (in the session manager's thread pool)
+        self.handshake_cancelled.set()
+
         # Close the UDP socket if it is open
         if self.udp_socket is not None:
             # Send termination signal to the board
@@ -284,27 +534,72 @@ class FpgaPesEnsembleNetwork(nengo.Network):
             self.udp_socket.close()
             self.udp_socket = None
 
-        # Reset the udp communication buffers
-        self.send_buffer = np.zeros(self.input_dimensions + self.output_dimensions + 1)
-        self.recv_buffer = np.zeros(self.output_dimensions + 1)
-
-        # Close the SSH connection
+        # Stop monitoring the board health and capturing its decoders
+        if self.health_future is not None:
+            self.health_future.cancel()
+            self.health_future = None
+        if self.snapshot_future is not None:
+            self.snapshot_future.cancel()
+            self.snapshot_future = None
+        if self.control_channel is not None:
+            self.control_channel.close()
+            self.control_channel = None
+
+        if self.telemetry_stream is not None:
+            self.telemetry_stream.close()
+
+        # Close the SSH connection. This also terminates the SSH session
+        # (cancelled here in case it is still being set up).
+        if self.ssh_future is not None:
+            self.ssh_future.cancel()
+            self.ssh_future = None
         logger.info("<%s> SSH connection closed", fpga_config.get(self.fpga_name, "ip"))
-        self.ssh_client.close()
+        if self._ssh_client is not None:
+            self._ssh_client.close()
+        self.worker = None
+
+        # Let other networks use the board
+        if self.pool is not None:
+            self.pool.release(self.fpga_name, self)
+        self.release_lease()
+
+    def clean_remote_tmp(self, sftp_client):
+        """Evict stale data files from the board's ``remote_tmp`` directory."""
+        remote_tmp = fpga_config.get(self.fpga_name, "remote_tmp")
+        try:
+            janitor.clean_remote_dir(
+                sftp_client, remote_tmp, **tmp_limits(self.fpga_name)
+            )
+        except OSError as e:
+            logger.warning(
+                "<%s> Could not clean up %s: %s",
+                fpga_config.get(self.fpga_name, "ip"),
+                remote_tmp,
+                e,
+            )
 
     def cleanup(self):
-        """Remove FPGA data file if applicable."""
+        """Remove local FPGA data files if applicable."""
 
         # Function does nothing if FPGA configuration not found in config file
         if not self.config_found:
             return
 
-        # Clean up any existing argument data files
-        if os.path.isfile(self.local_data_filepath):
-            os.remove(self.local_data_filepath)
+        # Clean up any offline results left behind (e.g., by an interrupted run)
+        if os.path.isfile(self.local_results_filepath):
+            os.remove(self.local_results_filepath)
+
+    @property
+    def ssh_client(self):
+        """SSH client connected to the board (created on first use)."""
+        if self._ssh_client is None:
+            self._ssh_client = new_ssh_client()
+        return self._ssh_client
 
-    def connect_ssh_client(self, ssh_user, remote_ip):
+    def connect_ssh_client(self, ssh_user, remote_ip, ssh_client=None):
         """Helper function to parse config and setup ssh client."""
+        if ssh_client is None:
+            ssh_client = self.ssh_client
 
         # Get the SSH options from the fpga_config file
         ssh_port = fpga_config.get(self.fpga_name, "ssh_port")
@@ -322,180 +617,337 @@ class FpgaPesEnsembleNetwork(nengo.Network):
         # Connect to remote location over ssh
         if ssh_key is not None:
             # If an ssh key is provided, just use it
-            self.ssh_client.connect(
+            ssh_client.connect(
                 remote_ip, port=ssh_port, username=ssh_user, key_filename=ssh_key
             )
         elif ssh_pwd is not None:
             # If an ssh password is provided, just use it
-            self.ssh_client.connect(
+            ssh_client.connect(
                 remote_ip, port=ssh_port, username=ssh_user, password=ssh_pwd
             )
         else:
             # If no password or key is specified, just use the default connect
             # (paramiko will then try to connect using the id_rsa file in the
             #  ~/.ssh/ folder)
-            self.ssh_client.connect(remote_ip, port=ssh_port, username=ssh_user)
+            ssh_client.connect(remote_ip, port=ssh_port, username=ssh_user)
+
+    def start_worker(self):
+        """Start a persistent board-side worker (over its own SSH connection)."""
+        remote_ip = fpga_config.get(self.fpga_name, "ip")
+        ssh_user = fpga_config.get(self.fpga_name, "ssh_user")
+
+        ssh_client = new_ssh_client()
+        self.connect_ssh_client(ssh_user, remote_ip, ssh_client=ssh_client)
+
+        command = sudo_command(
+            f"python {fpga_config.get(self.fpga_name, 'remote_script')} --worker",
+            ssh_user,
+        )
+
+        logger.info("<%s> Starting worker: %s", remote_ip, command)
+        worker = RemoteWorker(self.fpga_name, ssh_client, command)
+        try:
+            worker.start(
+                timeout=fpga_config.getfloat(
+                    self.fpga_name, "worker_timeout", fallback=30.0
+                )
+            )
+        except BaseException:
+            ssh_client.close()
+            raise
+        return worker
 
-    def connect_thread_func(self):
-        """Start SSH in a separate thread if applicable."""
+    @property
+    def transfer_client(self):
+        """SSH client used to transfer data files to and from the board."""
+        return self.ssh_client if self.worker is None else self.worker.ssh_client
+
+    async def ssh_session(self):
+        """
+        Run the board-side script over SSH if applicable.
+
+        Uploads the argument data file, launches the remote script and streams
+        the remote output to the logger until the remote script terminates. Runs
+        on the session manager's event loop, blocking SSH calls are run in the
+        session manager's thread pool.
+        """
 
         # Function does nothing if FPGA configuration not found in config file
         if not self.config_found:
             return
 
+        to_thread = self.session_manager.to_thread
+
         # Get the IP of the remote device from the fpga_config file
         remote_ip = fpga_config.get(self.fpga_name, "ip")
 
         # Get the SSH options from the fpga_config file
         ssh_user = fpga_config.get(self.fpga_name, "ssh_user")
 
-        self.connect_ssh_client(ssh_user, remote_ip)
-
-        # Send argument file over
-        remote_data_filepath = (
-            f"{fpga_config.get(self.fpga_name, 'remote_tmp')}/{self.arg_data_file}"
-        )
+        if self.use_worker:
+            # Runs are handed to the board's worker, started on first use
+            self.worker = await to_thread(get_worker, self.fpga_name, self.start_worker)
+        else:
+            await to_thread(self.connect_ssh_client, ssh_user, remote_ip)
 
-        if os.path.exists(self.local_data_filepath):
-            logger.info(
-                "<%s> Sending argument data (%s) to fpga board",
-                fpga_config.get(self.fpga_name, "ip"),
-                self.arg_data_file,
+        if self.arg_data is not None:
+            # Argument files are named after their contents, so that they can
+            # be shared between runs (and processes) and are never clobbered
+            self.arg_data_file = (
+                f"fpen_args_{digest_arg_data(self.current_arg_data())[:16]}.bin"
+            )
+            remote_data_filepath = (
+                f"{fpga_config.get(self.fpga_name, 'remote_tmp')}/{self.arg_data_file}"
             )
 
-            # Send the argument data over to the fpga board
             # Create sftp connection
-            sftp_client = self.ssh_client.open_sftp()
-            sftp_client.put(self.local_data_filepath, remote_data_filepath)
+            sftp_client = await to_thread(self.transfer_client.open_sftp)
+            try:
+                await to_thread(self.clean_remote_tmp, sftp_client)
+
+                if await to_thread(
+                    touch_remote_file, sftp_client, remote_data_filepath
+                ):
+                    logger.info(
+                        "<%s> Argument data (%s) already on fpga board",
+                        remote_ip,
+                        self.arg_data_file,
+                    )
+                else:
+                    logger.info(
+                        "<%s> Sending argument data (%s) to fpga board",
+                        remote_ip,
+                        self.arg_data_file,
+                    )
+                    # Stream the argument data straight to the fpga board
+                    await to_thread(
+                        upload_file,
+                        sftp_client,
+                        remote_data_filepath,
+                        self.write_arg_data,
+                    )
+
+                if self.mode == "offline":
+                    await to_thread(
+                        upload_file,
+                        sftp_client,
+                        self.remote_filepath("traj"),
+                        self.write_trajectory,
+                    )
+            finally:
+                # Close sftp connection
+                sftp_client.close()
+
+        if self.worker is not None:
+            await self.run_on_worker(self.worker, remote_ip)
+            return
 
-            # Close sftp connection and release ssh connection lock
-            sftp_client.close()
+        # Launch the remote script on an exec channel. Closing the channel (also
+        # done on cancellation) unblocks any pending `recv` call.
+        command = sudo_command(self.ssh_string, ssh_user)
+        logger.info("<%s> Sending cmd to fpga board: \n%s", remote_ip, command)
+        ssh_channel, self.launch_time = await to_thread(
+            exec_remote, self.ssh_client, command
+        )
+        logger.info(
+            "<%s> Remote script launched in %0.3fs", remote_ip, self.launch_time
+        )
 
-        # Invoke a shell in the ssh client
-        ssh_channel = self.ssh_client.invoke_shell()
+        # Get and process the information being returned over the ssh
+        # connection, until the remote script terminates
+        stderr_tail = collections.deque(maxlen=10)
+        self.remote_log.clear_partial()
+        remote_log_queue.acquire()
+        try:
+            await asyncio.gather(
+                self.read_ssh_stream(ssh_channel.recv, remote_ip),
+                self.read_ssh_stream(
+                    ssh_channel.recv_stderr, remote_ip, stderr_tail=stderr_tail
+                ),
+            )
+            exit_status = await to_thread(ssh_channel.recv_exit_status)
+        finally:
+            ssh_channel.close()
+            remote_log_queue.release()
 
-        # Wait for the SSH shell to initialize
-        time.sleep(0.1)
+        # No exit status (-1) is received if the connection was closed
+        if exit_status > 0:
+            raise RuntimeError(
+                f"The remote script on <{remote_ip}> exited with status "
+                f"{exit_status}:\n" + "\n".join(stderr_tail)
+            )
+        logger.info("<%s> Terminating SSH session", remote_ip)
 
-        # If board configuration specifies using sudo to run scripts
-        # - Assume all non-root users will require sudo to run the scripts
-        # - Note: Also assumes that the fpga has been configured to allow
-        #         the ssh user to run sudo commands WITHOUT needing a password
-        #         (see specific fpga hardware docs for details)
-        if ssh_user != "root":
-            logger.info("<%s> Script to be run with sudo. Sudoing.", remote_ip)
-            ssh_channel.send("sudo su\n")
+    async def read_ssh_stream(self, recv, remote_ip, stderr_tail=None):
+        """
+        Process one output stream (``recv`` function) of the remote script.
 
-        # Send required ssh string
-        logger.info(
-            "<%s> Sending cmd to fpga board: \n%s",
-            fpga_config.get(self.fpga_name, "ip"),
-            self.ssh_string,
-        )
-        ssh_channel.send(self.ssh_string)
+        Runs until the stream is closed. The lines of the standard error are
+        also kept in ``stderr_tail``.
+        """
+        stderr = stderr_tail is not None
 
         # Variable for remote error handling
         got_error = 0
         error_strs = []
 
-        # Get and process the information being returned over the ssh
-        # connection
         while True:
-            data = ssh_channel.recv(256)
+            data = await self.session_manager.to_thread(recv, 4096)
             if not data:
-                # If no data is received, the client has been closed, so close
-                # the channel, and break out of the while loop
-                ssh_channel.close()
+                # If no data is received, the stream has been closed
                 break
 
-            self.process_ssh_output(data)
-            info_str_list = self.ssh_info_str.split("\n")
-            for info_str in info_str_list[:-1]:
+            for info_str in self.process_ssh_output(data, stderr=stderr):
+                if stderr:
+                    stderr_tail.append(info_str)
                 got_error, error_strs = self.check_ssh_str(
                     info_str, error_strs, got_error, remote_ip
                 )
-            self.ssh_info_str = info_str_list[-1]
 
             # The traceback usually contains 3 lines, so collect the first
-            # three lines then display it.
+            # three lines then display it. The error is re-raised in the
+            # main thread by `check_ssh_session`.
             if got_error == 2:
-                # Close the UDP and SSH connections so that the main simulation thread
-                # terminates
-                self.close()
                 raise RuntimeError(
-                    f"Received the following error on the remote side <{remote_ip}>:\n"
-                    + "\n".join(error_strs)
+                    "Received the following error on the remote side "
+                    f"<{remote_ip}>:\n" + "\n".join(error_strs)
                 )
-        logger.info("Terminating SSH thread")
 
-    def connect(self):  # noqa: C901
-        """Connect to FPGA via SSH if applicable."""
+    async def run_on_worker(self, worker, remote_ip):
+        """
+        Run the model on the board's persistent worker.
 
-        # Function does nothing if FPGA configuration not found in config file
-        if not self.config_found:
-            return
+        Streams the output of the run to the logger until the run ends (i.e., is
+        terminated by the host, or the end of an offline run).
+        """
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
 
-        logger.info("<%s> Open SSH connection", fpga_config.get(self.fpga_name, "ip"))
-        # Start a new thread to open the ssh connection. Use a thread to
-        # handle the opening of the connection because it can lag for certain
-        # devices, and we don't want it to impact the rest of the build process.
-        connect_thread = threading.Thread(target=self.connect_thread_func, args=())
-        connect_thread.start()
-
-        logger.info("<%s> Open UDP connection", fpga_config.get(self.fpga_name, "ip"))
-        # Create a UDP socket to communicate with the board
-        self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.udp_socket.bind((fpga_config.get("host", "ip"), self.udp_port))
-
-        # # Set the socket timeout to the connection timeout and wait for the
-        # # board to connect to the PC.
-        # # Note that this is the "correct" way to wait for an incoming connection
-        # # request. However, because the error detection mechanism in the SSH
-        # # thread is done by closing the UDP socket, a polling approach is used
-        # # (see below).
-        # # TODO: Re-examine this during the SSH refactoring.
-        # self.udp_socket.settimeout(self.connect_timeout)
-        # while True:
-        #     try:
-        #         self.udp_socket.recv_into(self.recv_buffer.data)
-        #         # Connection packet has a t of 0
-        #         if self.recv_buffer[0] <= 0.0:
-        #             break
-        #     except socket.timeout:
-        #         self.close()
-        #     raise RuntimeError("Did not receive connection from board within "
-        #                        + "specified timeout (%fs)." % self.connect_timeout)
-        # if self.recv_buffer[0] < 0.0:
-        #     self.close()
-        #     raise RuntimeError("Simulation terminated by FPGA board.")
-
-        # Connection with the board established. Set the socket timeout to
-        # recv_timeout.
+        def listener(kind, payload):
+            try:
+                loop.call_soon_threadsafe(events.put_nowait, (kind, payload))
+            except RuntimeError:
+                # The event loop was closed
+                pass
+
+        args = self.remote_args
+        logger.info("<%s> Sending run to worker: \n%s", remote_ip, args)
+        run_id = await self.session_manager.to_thread(worker.submit, args, listener)
+
+        # Variable for remote error handling
+        got_error = 0
+        error_strs = []
+
+        self.remote_log.clear_partial()
+        remote_log_queue.acquire()
+        try:
+            while True:
+                kind, payload = await events.get()
+                if kind == "done":
+                    break
+                if kind == "error":
+                    raise RuntimeError(
+                        "Received the following error on the remote side "
+                        f"<{remote_ip}>:\n{payload}"
+                    )
+                if kind == "exit":
+                    raise RuntimeError(
+                        f"The worker on FPGA board <{self.fpga_name}> exited."
+                    )
+
+                for info_str in self.process_ssh_output(payload):
+                    got_error, error_strs = self.check_ssh_str(
+                        info_str, error_strs, got_error, remote_ip
+                    )
+                if got_error == 2:
+                    raise RuntimeError(
+                        "Received the following error on the remote side "
+                        f"<{remote_ip}>:\n" + "\n".join(error_strs)
+                    )
+        finally:
+            # Realtime and lockstep runs are stopped (by the host's termination
+            # signal) after the session is cancelled, ignore the rest of the run
+            worker.forget(run_id)
+            remote_log_queue.release()
+        logger.info("<%s> Worker run done", remote_ip)
+
+    def check_ssh_session(self):
+        """Re-raise any error encountered by the SSH session."""
+        future = self.ssh_future
+        if future is not None and future.done() and not future.cancelled():
+            error = future.exception()
+            if error is not None:
+                raise error
+
+    def open_udp_socket(self):
+        """
+        Create and bind the UDP sockets used to communicate with the board.
+
+        Binds the data socket and, with telemetry, the telemetry socket (port
+        ``udp_port + 2``). If no port is configured, free ports are bound
+        first, and the bound port is then passed to the board-side script.
+        """
+        remote_ip = fpga_config.get(self.fpga_name, "ip")
+        logger.info("<%s> Open UDP connection", remote_ip)
+        allocation = allocate_ports(
+            fpga_config.get("host", "ip"),
+            port=int(fpga_config.get(self.fpga_name, "udp_port")),
+            offsets=(0,) if self.telemetry_stream is None else (0, 2),
+            port_range=self.port_range,
+        )
+        self.set_udp_port(allocation.port)
+        self.port_attempts += allocation.attempts - 1
+        if allocation.attempts > 1:
+            logger.info(
+                "<%s> Using port %d after %d port collisions",
+                remote_ip,
+                self.udp_port,
+                allocation.attempts - 1,
+            )
+
+        self.udp_socket = allocation.sockets[0]
+        self.send_buffer[:] = 0
+        self.recv_buffer[:] = 0
+        if self.telemetry_stream is not None:
+            self.telemetry_stream.open_socket(allocation.sockets[1])
+
+        # Set the socket timeout to recv_timeout. The board connection is
+        # awaited by polling (see `wait_for_handshake`) so that an error in the
+        # SSH session is reported without waiting for the full connect_timeout.
         self.udp_socket.settimeout(self.recv_timeout)
 
-        # Wait for the connection packet from the board. Note that the
-        # implementation above (setting the socket timeout to ``connect_timeout``)
-        # is the "proper" implementation. Below is a workaround to allow the SSH
-        # connection thread to terminate the connection process (by closing the
-        # udp socket, so an exception is thrown).
+    def wait_for_handshake(self):
+        """
+        Wait for the connection packet from the board.
+
+        Blocking, run in the session manager's thread pool by `connect_async`.
+        Returns early if ``handshake_cancelled`` is set (by `disconnect`, or when
+        the connection is cancelled).
+        """
+        udp_socket = self.udp_socket
         max_attempts = int(self.connect_timeout / self.recv_timeout)
-        for conn_attempts in range(max_attempts):
+        for _ in range(max_attempts):
+            if self.handshake_cancelled.is_set():
+                return
+            # Report errors from the SSH session (e.g., remote script crashed)
+            self.check_ssh_session()
             try:
-                self.udp_socket.recv_into(self.recv_buffer)
+                udp_socket.recv_into(self.recv_buffer)
                 if self.recv_buffer[0] <= 0.0:
-                    # Received a connection packet (t == 0) from the board, or received
-                    # a "terminate client" packet (t < 0) from the board, so break out
-                    # of the connection waiting loop
+                    # Received a connection packet (t == 0) from the board, or
+                    # received a "terminate client" packet (t < 0) from the board,
+                    # so break out of the connection waiting loop
                     break
             except socket.timeout:
                 pass
-            except AttributeError:
-                sys.exit(1)
-        if conn_attempts >= (max_attempts - 1):
+            except OSError:
+                if self.handshake_cancelled.is_set():
+                    return  # The socket was closed by `disconnect`
+                raise
+        else:
             # Number of connection attempts exceeds maximum number of attempts.
             # I.e., no connection has been received within the timeout limit.
-            self.close()
+            self.check_ssh_session()
             raise RuntimeError(
                 f"Did not receive connection from board within "
                 f"specified timeout ({self.connect_timeout}s)."
@@ -508,22 +960,526 @@ class FpgaPesEnsembleNetwork(nengo.Network):
             if self.recv_buffer[0] <= -20:
                 reason = "Unable to load FPGA driver! "
             elif self.recv_buffer[0] <= -10:
-                reason = "Unable to acquire FPGA resource lock! "
-            self.close()
+                # The board is used by someone else (can be retried later)
+                raise BoardBusyError(
+                    "Unable to acquire FPGA resource lock! "
+                    "Simulation terminated by FPGA board."
+                )
             raise RuntimeError(reason + "Simulation terminated by FPGA board.")
 
-    def process_ssh_output(self, data):
-        """Clean up the data stream coming back over ssh if applicable."""
+    async def connect_async(self):
+        """
+        Connect to FPGA via SSH if applicable.
+
+        Starts the SSH session in the background and waits for the handshake
+        from the board. Must be run on the session manager's event loop; this
+        allows the connections to several boards to be made concurrently.
+        """
+
+        # Function does nothing if FPGA configuration not found in config file
+        if not self.config_found:
+            return
+
+        # Offline runs start the board when their output is needed
+        if self.mode == "offline":
+            await self.session_manager.to_thread(
+                janitor.clean_local_dir, self.arg_data_path, **tmp_limits("host")
+            )
+            self.offline_start = 0
+            self.offline_output = np.zeros((0, self.output_dimensions))
+            self.offline_decoders = None
+            return
 
-        str_data = data.decode("latin1").replace("\r\n", "\r")
-        str_data = str_data.replace("\r\r", "\r")
-        str_data = str_data.replace("\r", "\n")
+        # Lease the board before connecting, so that boards used by other
+        # processes of this host are not started only to find them busy
+        leases = lease_manager()
 
-        # Process and dump the returned ssh data to logger. Data (strings)
-        # returned over SSH are terminated by a newline, so, keep track of
-        # the data and write the data to logger only when a newline is
-        # received.
-        self.ssh_info_str += str_data
+        if self.pool is not None:
+            board, self.pool_wait_time = await self.pool.acquire(
+                self.connect_pool_board, owner=self, leases=leases
+            )
+            logger.info(
+                "<%s> Using board %s (waited %0.1fs for a free board)",
+                self.pool.name,
+                board,
+                self.pool_wait_time,
+            )
+            return
+
+        await self.acquire_lease(leases)
+        await self.connect_board_async()
+
+    async def acquire_lease(self, leases):
+        """Lease the board from ``leases`` (if not None), raise if it stays busy."""
+        if leases is None:
+            return
+        self.lease = await leases.acquire([self.fpga_name], timeout=lease_wait())
+        if self.lease is None:
+            raise BoardBusyError(
+                f"FPGA board <{self.fpga_name}> is leased by another process."
+            )
+
+    def release_lease(self):
+        """Let other processes use the board."""
+        if self.lease is not None:
+            self.lease.release()
+            self.lease = None
+
+    def start_connect(self):
+        """
+        Start connecting to the board in the background.
+
+        Called by the builder as soon as the parameters of the network are ready,
+        so that the board starts up (SSH connection, parameter upload and remote
+        script startup) while the rest of the model is being built. The
+        connection is completed by `finish_connect_async`.
+        """
+        if not self.config_found or self.connect_future is not None:
+            return
+        self.connect_future = self.session_manager.submit(self.connect_async())
+
+    async def finish_connect_async(self):
+        """Wait for the connection started by `start_connect` (or connect)."""
+        future, self.connect_future = self.connect_future, None
+        if future is None:
+            await self.connect_async()
+        else:
+            await asyncio.wrap_future(future)
+
+    async def connect_pool_board(self, fpga_name):
+        """Connect to the board ``fpga_name`` of the pool, or raise if busy."""
+        self.select_board(fpga_name)
+        try:
+            await self.connect_board_async()
+        except BaseException:
+            self.disconnect()
+            raise
+
+    async def connect_board_async(self):
+        """Start the SSH session and wait for the handshake of the board."""
+        # The ports are bound before the board-side script is told to use them
+        self.handshake_cancelled.clear()
+        self.open_udp_socket()
+        if self.jitter_buffer is not None:
+            self.jitter_buffer.clear()
+
+        logger.info("<%s> Open SSH connection", fpga_config.get(self.fpga_name, "ip"))
+        self.ssh_future = self.session_manager.submit(self.ssh_session())
+
+        try:
+            await self.session_manager.to_thread(self.wait_for_handshake)
+        except asyncio.CancelledError:
+            # The waiting thread is not interrupted by the cancellation
+            self.handshake_cancelled.set()
+            raise
+
+        # The board runs freely after the handshake, never wait for it
+        if self.mode == "realtime":
+            self.udp_socket.setblocking(False)
+
+        if self.control_enabled:
+            self.control_channel = ControlChannel(
+                fpga_config.get("host", "ip"),
+                self.control_addr,
+                timeout=self.heartbeat_timeout,
+            )
+            self.control_channel.open()
+        if self.heartbeat_interval is not None:
+            self.health_future = self.session_manager.submit(self.monitor_health())
+        if (
+            self.reconnect is not None
+            and self.reconnect.snapshot_interval is not None
+            and self.control_channel is not None
+        ):
+            self.snapshot_future = self.session_manager.submit(self.capture_decoders())
+
+    async def capture_decoders(self):
+        """Periodically read the learned decoders from the board until cancelled."""
+        while True:
+            await asyncio.sleep(self.reconnect.snapshot_interval)
+            try:
+                await self.session_manager.to_thread(self.read_decoders)
+            except (socket.timeout, OSError, RuntimeError) as e:
+                logger.warning(
+                    "<%s> Could not capture the decoders: %s",
+                    fpga_config.get(self.fpga_name, "ip"),
+                    e,
+                )
+
+    async def monitor_health(self):
+        """Poll the board for heartbeats until cancelled."""
+        remote_ip = fpga_config.get(self.fpga_name, "ip")
+        self.health = None
+        self.missed_heartbeats = 0
+
+        while True:
+            try:
+                health = await self.session_manager.to_thread(
+                    self.control_channel.health
+                )
+            except (socket.timeout, OSError):
+                self.missed_heartbeats += 1
+                logger.warning(
+                    "<%s> Missed heartbeat (%d in a row)",
+                    remote_ip,
+                    self.missed_heartbeats,
+                )
+            else:
+                self.missed_heartbeats = 0
+                self.health = health
+                self.health_history.append(health)
+            await asyncio.sleep(self.heartbeat_interval)
+
+    def health_status(self, max_age=None, max_step_time=None, max_queue_depth=None):
+        """
+        Check the health of the board.
+
+        Returns a string describing why the board is considered degraded, or
+        ``None`` if the board is healthy (or heartbeats are disabled).
+
+        Parameters
+        ----------
+        max_age : float, optional (Default: None)
+            Maximum age (in seconds) of the latest heartbeat. Defaults to three
+            heartbeat intervals.
+        max_step_time : float, optional (Default: None)
+            Maximum board-side step duration (in seconds).
+        max_queue_depth : int, optional (Default: None)
+            Maximum number of packets waiting to be processed on the board.
+        """
+        if self.heartbeat_interval is None or self.health_future is None:
+            return None
+
+        if max_age is None:
+            max_age = 3 * max(self.heartbeat_interval, self.heartbeat_timeout)
+
+        if self.health is None:
+            return "no heartbeat received"
+        if self.health.age > max_age:
+            return (
+                f"no heartbeat for {self.health.age:.2f}s "
+                f"({self.missed_heartbeats} missed)"
+            )
+        if max_step_time is not None and self.health.step_time > max_step_time:
+            return f"step time {self.health.step_time * 1e3:.3f}ms"
+        if max_queue_depth is not None and self.health.queue_depth > max_queue_depth:
+            return f"queue depth {self.health.queue_depth}"
+        return None
+
+    def read_decoders(self):
+        """Read the current (learned) decoders back from the FPGA board."""
+        if self.control_channel is None:
+            raise RuntimeError(
+                f"The control channel to FPGA board <{self.fpga_name}> is not "
+                "open. Enable it with the 'control' socket argument."
+            )
+
+        shape = (self.output_dimensions, self.ensemble.n_neurons)
+        t = self.recv_buffer[0]  # Board time of the last packet received
+        decoders = self.control_channel.request_array(OP_DECODERS, np.prod(shape))
+        self.last_decoders = decoders.reshape(shape)
+        self.record_decoders(self.last_decoders, t)
+        return self.last_decoders
+
+    def record_decoders(self, decoders, t):
+        """Record ``decoders`` captured from the board at board time ``t``."""
+        if self.decoder_snapshot is None or t >= self.decoder_snapshot[1]:
+            self.decoder_snapshot = (np.array(decoders), t)
+
+    def save_checkpoint(self, filename):
+        """Read the current decoders from the FPGA board and save them to file."""
+        save_checkpoint(
+            filename,
+            self.read_decoders(),
+            n_neurons=self.ensemble.n_neurons,
+            output_dimensions=self.output_dimensions,
+        )
+
+    def load_checkpoint(self, filename):
+        """Use the decoders saved in a checkpoint file as the initial decoders."""
+        decoders = load_checkpoint(filename)["decoders"]
+        shape = (self.output_dimensions, self.ensemble.n_neurons)
+        if decoders.shape != shape:
+            raise nengo.exceptions.ValidationError(
+                f"Checkpoint decoders have shape {decoders.shape}, expected {shape}",
+                "initial_decoders",
+                self,
+            )
+        self.initial_decoders = decoders
+
+    def set_trajectory(self, input_data, error_data):
+        """
+        Set the input and error signals of an offline run.
+
+        Parameters
+        ----------
+        input_data : (n_steps, input_dimensions) array_like
+            Input signal of the FPGA ensemble at each simulation step.
+        error_data : (n_steps, output_dimensions) array_like
+            Error signal of the learning rule at each simulation step.
+        """
+        input_data = np.asarray(input_data, dtype=np.float64)
+        error_data = np.asarray(error_data, dtype=np.float64)
+        if input_data.ndim != 2 or input_data.shape[1] != self.input_dimensions:
+            raise nengo.exceptions.ValidationError(
+                f"Must have shape (n_steps, {self.input_dimensions})",
+                "input_data",
+                self,
+            )
+        if error_data.shape != (len(input_data), self.output_dimensions):
+            raise nengo.exceptions.ValidationError(
+                f"Must have shape ({len(input_data)}, {self.output_dimensions})",
+                "error_data",
+                self,
+            )
+        self.trajectory = (input_data, error_data)
+
+    def remote_filepath(self, prefix):
+        """Path of an (offline) data file on the FPGA board."""
+        return (
+            f"{fpga_config.get(self.fpga_name, 'remote_tmp')}/"
+            f"fpen_{prefix}_{self.uid}.npz"
+        )
+
+    @property
+    def local_results_filepath(self):
+        """Full path to the offline results data file on the local system."""
+        return os.path.join(self.arg_data_path, f"fpen_results_{self.uid}.npz")
+
+    async def fetch_offline_async(self, start, stop):
+        """
+        Make sure the board output for steps ``[start, stop)`` has been fetched.
+
+        The steps are run on the board in chunks of ``offline_chunk_steps``
+        steps, the decoders learned in one chunk are uploaded with the next.
+        """
+        if not self.config_found or self.mode != "offline":
+            return
+        if self.offline_start <= start and stop <= self.offline_start + len(
+            self.offline_output
+        ):
+            return
+
+        chunk_steps = self.offline_chunk_steps or (stop - start)
+        outputs = []
+        for chunk_start in range(start, stop, chunk_steps):
+            chunk_stop = min(chunk_start + chunk_steps, stop)
+            outputs.append(await self.run_offline_chunk(chunk_start, chunk_stop))
+        self.offline_start = start
+        self.offline_output = np.concatenate(outputs)
+
+    async def run_offline_chunk(self, start, stop):
+        """Run steps ``[start, stop)`` on the board, return the output."""
+        if self.trajectory is None:
+            raise RuntimeError(
+                f"No offline trajectory set for FPGA board <{self.fpga_name}>."
+            )
+        if stop > len(self.trajectory[0]):
+            raise RuntimeError(
+                f"The offline trajectory only has {len(self.trajectory[0])} steps, "
+                f"cannot run up to step {stop}."
+            )
+
+        remote_ip = fpga_config.get(self.fpga_name, "ip")
+        logger.info("<%s> Running steps %d to %d offline", remote_ip, start, stop)
+
+        self.offline_range = (start, stop)
+        await self.acquire_lease(lease_manager())
+        try:
+            await self.ssh_session()
+            results = await self.session_manager.to_thread(self.fetch_offline_results)
+        finally:
+            self.release_lease()
+
+        self.offline_decoders = results["decoders"]
+        return results["output"]
+
+    def current_arg_data(self):
+        """
+        Argument data to upload to the board for the next run.
+
+        The argument data generated by the builder is never modified: learning
+        resumes from the end of the previous offline chunk, or from the decoders
+        captured before a reconnection, in a copy of it.
+        """
+        arg_data = self.arg_data
+        if self.mode == "offline":
+            decoders = self.offline_decoders
+        else:
+            decoders = self.resume_decoders
+        if decoders is not None:
+            arg_data = dict(arg_data)
+            arg_data["conn_args"] = dict(arg_data["conn_args"], weights=decoders)
+        return arg_data
+
+    def write_arg_data(self, f):
+        """Write the argument data generated by the builder to file ``f``."""
+        write_arg_data(f, self.current_arg_data(), codec=self.arg_codec)
+
+    def write_trajectory(self, f):
+        """Write the trajectory of the current offline chunk to file ``f``."""
+        start, stop = self.offline_range
+        np.savez(
+            f,
+            input=self.trajectory[0][start:stop],
+            error=self.trajectory[1][start:stop],
+            start_time=start * self.arg_data["sim_args"]["dt"],
+        )
+
+    def fetch_offline_results(self):
+        """Download the results of an offline chunk from the board."""
+        os.makedirs(self.arg_data_path, exist_ok=True)
+        tmp_filepath = f"{self.local_results_filepath}.part"
+
+        sftp_client = self.transfer_client.open_sftp()
+        try:
+            sftp_client.get(self.remote_filepath("results"), tmp_filepath)
+            os.replace(tmp_filepath, self.local_results_filepath)
+
+            # The data files of this chunk are not needed anymore
+            sftp_client.remove(self.remote_filepath("results"))
+            sftp_client.remove(self.remote_filepath("traj"))
+        finally:
+            sftp_client.close()
+
+        with np.load(self.local_results_filepath, allow_pickle=False) as data:
+            results = {key: data[key] for key in data.files}
+        os.remove(self.local_results_filepath)
+        return results
+
+    def connect(self):
+        """Connect to FPGA via SSH if applicable."""
+
+        # Function does nothing if FPGA configuration not found in config file
+        if not self.config_found:
+            return
+
+        # Use a private session manager if one has not been provided (e.g., by
+        # `nengo_fpga.Simulator`)
+        if self.session_manager is None:
+            self.session_manager = SessionManager()
+            self._own_session_manager = True
+
+        try:
+            self.session_manager.run(self.connect_async())
+        except BaseException:
+            self.close()
+            raise
+
+    def board_lost(self, t):
+        """
+        Handle the loss of the connection to the FPGA board at time ``t``.
+
+        Raises an error unless a reconnection policy is set, in which case the
+        reconnection is started in the background and the held output is returned.
+        """
+        if self.reconnect is None:
+            self.close()
+            raise RuntimeError(
+                f"Lost connection to FPGA board <{self.fpga_name}> at t={t:0.5f}s."
+            )
+
+        logger.warning(
+            "<%s> Lost connection to FPGA board at t=%0.5fs, reconnecting",
+            fpga_config.get(self.fpga_name, "ip"),
+            t,
+        )
+        self.last_output = self.recv_buffer[1:].copy()
+        self.hold_steps = 1
+        self.reconnect_future = self.session_manager.submit(self.reconnect_async())
+        return self.reconnect.hold_output(t, self.last_output)
+
+    async def reconnect_async(self):
+        """
+        Re-establish the connection to the board, restarting its script.
+
+        The restarted board-side script is given the most recent decoders
+        captured from the lost board (see ``decoder_snapshot``), so the learning
+        done after that snapshot is lost. If no decoders were captured since the
+        board was connected, the board restarts from its initial decoders (the
+        build-time or ``initial_decoders``) and a warning is logged. No other
+        board state (e.g., neuron states or filters) is restored.
+        """
+        remote_ip = fpga_config.get(self.fpga_name, "ip")
+        error = None
+
+        if self.decoder_snapshot is None:
+            logger.warning(
+                "<%s> No decoders were captured from the board, it restarts from "
+                "its initial decoders (the learning so far is lost)",
+                remote_ip,
+            )
+        else:
+            self.resume_decoders, snapshot_time = self.decoder_snapshot
+            logger.info(
+                "<%s> Resuming learning from the decoders captured at t=%0.5fs",
+                remote_ip,
+                snapshot_time,
+            )
+
+        for attempt in range(self.reconnect.max_attempts):
+            await asyncio.sleep(self.reconnect.attempt_delay(attempt))
+            logger.info(
+                "<%s> Reconnection attempt %d of %d",
+                remote_ip,
+                attempt + 1,
+                self.reconnect.max_attempts,
+            )
+
+            # The argument data file (with the resumed decoders) is uploaded
+            # again by the new SSH session
+            self.disconnect()
+            try:
+                await self.connect_async()
+            except Exception as e:  # pylint: disable=broad-except
+                logger.warning("<%s> Reconnection failed: %s", remote_ip, e)
+                error = e
+            else:
+                logger.info("<%s> Reconnected to FPGA board", remote_ip)
+                self.n_reconnects += 1
+                return
+
+        self.disconnect()
+        raise RuntimeError(
+            f"Unable to reconnect to FPGA board <{self.fpga_name}> after "
+            f"{self.reconnect.max_attempts} attempts."
+        ) from error
+
+    def hold_output(self, t):
+        """
+        Output of the network while the board is reconnecting.
+
+        Returns ``None`` once the board has reconnected.
+        """
+        if self.reconnect_future.done():
+            future, self.reconnect_future = self.reconnect_future, None
+            if future.cancelled() or future.exception() is not None:
+                self.close()
+                raise RuntimeError(
+                    f"Lost connection to FPGA board <{self.fpga_name}>."
+                ) from (None if future.cancelled() else future.exception())
+            self.n_timeouts = 0
+            return None
+
+        self.hold_steps += 1
+        max_hold_steps = self.reconnect.max_hold_steps
+        if max_hold_steps is not None and self.hold_steps > max_hold_steps:
+            self.close()
+            raise RuntimeError(
+                f"FPGA board <{self.fpga_name}> did not reconnect within "
+                f"{max_hold_steps} steps."
+            )
+        return self.reconnect.hold_output(t, self.last_output)
+
+    def process_ssh_output(self, data, stderr=False):
+        """
+        Split the data stream coming back over ssh into lines.
+
+        Data (strings) returned over SSH are terminated by a newline, so only the
+        completed lines are returned (and recorded in ``remote_log``). The
+        standard output and error (``stderr=True``) are split separately.
+        """
+        return self.remote_log.feed(data, stderr=stderr)
 
     def check_ssh_str(self, info_str, error_strs, got_error, remote_ip):
         """Process info from ssh and check for errors."""
@@ -545,7 +1501,7 @@ class FpgaPesEnsembleNetwork(nengo.Network):
             # messages until the termination condition (above)
             error_strs.append(info_str)
         else:
-            logger.info("<%s> %s", remote_ip, info_str)
+            remote_logger.info("<%s> %s", remote_ip, info_str)
 
         return got_error, error_strs
 
@@ -565,6 +1521,41 @@ class FpgaPesEnsembleNetwork(nengo.Network):
         self.close()
         self.connect()
 
+    @property
+    def telemetry_port(self):
+        """Host port to which the board streams its telemetry."""
+        return self.udp_port + 2
+
+    @property
+    def remote_args(self):
+        """
+        Arguments of the board-side script.
+
+        Maps the names of the command line arguments of the remote script to
+        their values (flags are given a value of ``True``).
+        """
+        remote_args = {}
+        if self.config_found:
+            remote_args = {
+                "host_ip": fpga_config.get("host", "ip"),
+                "remote_ip": fpga_config.get(self.fpga_name, "ip"),
+                "udp_port": self.udp_port,
+                "arg_data_file": (
+                    f"{fpga_config.get(self.fpga_name, 'remote_tmp')}"
+                    f"/{self.arg_data_file}"
+                ),
+            }
+            if self.control_enabled:
+                remote_args["control_port"] = self.control_addr[1]
+            if self.telemetry is not None:
+                remote_args["telemetry_port"] = self.telemetry_port
+            if self.mode == "realtime":
+                remote_args["realtime"] = True
+            elif self.mode == "offline":
+                remote_args["offline_file"] = self.remote_filepath("traj")
+                remote_args["results_file"] = self.remote_filepath("results")
+        return remote_args
+
     @property
     def ssh_string(self):
         """
@@ -575,16 +1566,14 @@ class FpgaPesEnsembleNetwork(nengo.Network):
         """
         ssh_str = ""
         if self.config_found:
-            ssh_str = (
-                "python "
-                + fpga_config.get(self.fpga_name, "remote_script")
-                + f" --host_ip='{fpga_config.get('host', 'ip')}'"
-                + f" --remote_ip='{fpga_config.get(self.fpga_name, 'ip')}'"
-                + f" --udp_port={self.udp_port}"
-                + f" --arg_data_file='{fpga_config.get(self.fpga_name, 'remote_tmp')}"
-                + f"/{self.arg_data_file}'"
-                + "\n"
-            )
+            ssh_str = "python " + fpga_config.get(self.fpga_name, "remote_script")
+            for name, value in self.remote_args.items():
+                if value is True:
+                    ssh_str += f" --{name}"
+                elif isinstance(value, str):
+                    ssh_str += f" --{name}='{value}'"
+                else:
+                    ssh_str += f" --{name}={value}"
         return ssh_str
 
 
@@ -637,7 +1626,12 @@ def validate_net(network):
 
 
 def extract_and_save_params(model, network):
-    """Generate the ensemble and connection parameters and save them to file."""
+    """
+    Generate the ensemble and connection parameters.
+
+    The parameters are kept in ``network.arg_data`` (without copying the
+    parameter arrays) and streamed to the board when connecting.
+    """
 
     # Generate the network used to get the ensemble and output connection parameters
     param_model = nengo.builder.Model(dt=model.dt)
@@ -658,6 +1652,13 @@ def extract_and_save_params(model, network):
     # Collect the connection argument values
     conn_args = {}
     conn_args["weights"] = param_model.params[network.connection].weights
+    if network.initial_decoders is not None:
+        if network.initial_decoders.shape != conn_args["weights"].shape:
+            raise nengo.exceptions.BuildError(
+                f"Initial decoders have shape {network.initial_decoders.shape}, "
+                f"expected {conn_args['weights'].shape}."
+            )
+        conn_args["weights"] = network.initial_decoders
 
     # Validate neuron_type, learning_rule, and feedback connection
     ens_args["neuron_type"], conn_args["learning_rate"] = validate_net(network)
@@ -671,29 +1672,85 @@ def extract_and_save_params(model, network):
         recur_args["weights"] = param_model.params[network.feedback].weights
         recur_args["tau"] = network.feedback.synapse.tau
 
-    # Save the NPZ data file
-    npz_filename = "fpen_args_" + str(id(network)) + ".npz"
-    network.arg_data_file = npz_filename
+    network.arg_data = {
+        "sim_args": sim_args,
+        "ens_args": ens_args,
+        "conn_args": conn_args,
+        "recur_args": recur_args,
+    }
+    if network.telemetry is not None:
+        network.arg_data["telemetry_args"] = network.telemetry.args(
+            network.ensemble.n_neurons
+        )
 
-    # Monkey patch NumPy's write_array function to override pickle protocol from 3 to 2
-    numpy_writearray = np.lib.format.write_array
-    np.lib.format.write_array = write_array
+    return param_model
 
-    np.savez_compressed(
-        network.local_data_filepath,
-        sim_args=sim_args,
-        ens_args=ens_args,
-        conn_args=conn_args,
-        recur_args=recur_args,
-    )
 
-    # Undo monkey patch
-    np.lib.format.write_array = numpy_writearray
+def tmp_limits(section):
+    """Eviction limits of the data files, from ``section`` of the config."""
+    return {
+        "max_age": fpga_config.getfloat(
+            section, "tmp_max_age", fallback=janitor.MAX_AGE / 86400
+        )
+        * 86400,
+        "max_size": fpga_config.getfloat(
+            section, "tmp_max_size", fallback=janitor.MAX_SIZE / 2**20
+        )
+        * 2**20,
+    }
+
+
+def touch_remote_file(sftp_client, remote_path):
+    """Update the modification time of a file on the board, if it exists."""
+    try:
+        sftp_client.utime(remote_path, None)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def upload_file(sftp_client, remote_path, write):
+    """
+    Stream a file to the board, ``write(f)`` writes its contents to ``f``.
+
+    The file is first written under a temporary name, so that an interrupted
+    upload never leaves a partial file at ``remote_path``.
+    """
+    start = time.perf_counter()
+    tmp_path = f"{remote_path}.{uuid.uuid4().hex[:8]}.part"
+    try:
+        with sftp_client.open(tmp_path, "wb") as f:
+            f.set_pipelined(True)
+            write(f)
+            n_bytes = f.tell()
+        sftp_client.posix_rename(tmp_path, remote_path)
+    except BaseException:
+        try:
+            sftp_client.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    logger.info(
+        "Uploaded %s (%d bytes) in %.3f s",
+        remote_path,
+        n_bytes,
+        time.perf_counter() - start,
+    )
 
 
 def udp_comm_func(t, x, net, dt):
     """UDP communication function for nengo SimPyFunc."""
 
+    # Fill in the output while the board is reconnecting
+    if net.reconnect_future is not None:
+        output = net.hold_output(t)
+        if output is not None:
+            return output
+
+    if net.udp_socket is None:
+        # The connection has been closed (e.g., by an error on the remote side)
+        return net.board_lost(t)
+
     # Assemble the information to send to the board
     net.send_buffer[0] = t
     net.send_buffer[1:] = x
@@ -710,13 +1767,85 @@ def udp_comm_func(t, x, net, dt):
                 # Nengo simulation.
                 net.close()
                 raise RuntimeError("Simulation terminated by FPGA board.")
+        net.n_timeouts = 0
     except socket.timeout:
         logger.info("Socket timeout for t=%0.5fs", t)
+        net.n_timeouts += 1
+
+        # The board may have stopped responding because the remote script
+        # crashed, if so, report the remote error (or reconnect)
+        try:
+            net.check_ssh_session()
+        except Exception:
+            if net.reconnect is None:
+                net.close()
+                raise
+            return net.board_lost(t)
+
+        if net.reconnect is not None and (
+            net.n_timeouts >= net.reconnect.loss_timeouts
+        ):
+            return net.board_lost(t)
 
     # Return the received information
     return net.recv_buffer[1:]
 
 
+def realtime_comm_func(t, x, net, dt):  # pylint: disable=unused-argument
+    """Jitter-buffered UDP communication function for nengo SimPyFunc."""
+
+    if net.udp_socket is None:
+        # The connection has been closed (e.g., by an error on the remote side)
+        net.close()
+        raise RuntimeError(f"Lost connection to FPGA board <{net.fpga_name}>.")
+
+    # Send the latest input and error to the board, the board uses the most
+    # recent packet it received
+    net.send_buffer[0] = t
+    net.send_buffer[1:] = x
+    try:
+        net.udp_socket.sendto(net.send_buffer.tobytes(), net.send_addr)
+    except BlockingIOError:
+        logger.debug("Dropping packet for t=%0.5fs", t)
+
+    # Buffer everything the board sent since the last step
+    while True:
+        try:
+            net.udp_socket.recv_into(net.recv_buffer.data)
+        except (BlockingIOError, InterruptedError):
+            break
+        if net.recv_buffer[0] < 0:
+            # Received a "terminate client" packet from the board, terminate the
+            # Nengo simulation.
+            net.close()
+            raise RuntimeError("Simulation terminated by FPGA board.")
+        net.jitter_buffer.push(net.recv_buffer[0], net.recv_buffer[1:])
+
+    n_underruns = net.jitter_buffer.n_underruns
+    output = net.jitter_buffer.sample(t)
+    if net.jitter_buffer.n_underruns > n_underruns:
+        # The board may have stopped sending because the remote script crashed
+        try:
+            net.check_ssh_session()
+        except Exception:
+            net.close()
+            raise
+    return output
+
+
+def offline_comm_func(t, net, dt):
+    """Play back the output of an offline run for nengo SimPyFunc."""
+    step = int(round(t / dt)) - 1
+    index = step - net.offline_start
+    if not 0 <= index < len(net.offline_output):
+        # Not prefetched by `nengo_fpga.Simulator.run_steps`, run the rest of the
+        # trajectory
+        stop = len(net.trajectory[0]) if net.trajectory is not None else step + 1
+        net.session_manager.run(net.fetch_offline_async(step, max(stop, step + 1)))
+        index = step - net.offline_start
+    return net.offline_output[index]
+
+
 @nengo.builder.Builder.register(FpgaPesEnsembleNetwork)
 def build_FpgaPesEnsembleNetwork(model, network):
     """
@@ -742,7 +1871,7 @@ def build_FpgaPesEnsembleNetwork(model, network):
         return
 
     # Generate the ensemble and connection parameters and save them to file
-    extract_and_save_params(model, network)
+    param_model = extract_and_save_params(model, network)
 
     # Build the nengo network using the network's udp_socket function
     # Set up input/output signals
@@ -783,12 +1912,78 @@ def build_FpgaPesEnsembleNetwork(model, network):
         )
     )
 
-    # Build udp socket function with Nengo SimPyFunc
-    model.add_op(
-        SimPyFunc(
-            output=output_sig,
-            fn=partial(udp_comm_func, net=network, dt=model.dt),
-            t=model.time,
-            x=udp_socket_input_sig,
+    if network.mode == "offline":
+        # The output fetched from the board is played back
+        model.add_op(
+            SimPyFunc(
+                output=output_sig,
+                fn=partial(offline_comm_func, net=network, dt=model.dt),
+                t=model.time,
+                x=None,
+            )
         )
+    else:
+        comm_func = udp_comm_func
+        if network.mode == "realtime":
+            comm_func = realtime_comm_func
+            network.jitter_buffer = JitterBuffer(
+                network.output_dimensions,
+                maxlen=network.jitter_buffer_size,
+                delay=(
+                    2 * model.dt
+                    if network.jitter_delay is None
+                    else network.jitter_delay
+                ),
+            )
+
+        # Build udp socket function with Nengo SimPyFunc
+        model.add_op(
+            SimPyFunc(
+                output=output_sig,
+                fn=partial(comm_func, net=network, dt=model.dt),
+                t=model.time,
+                x=udp_socket_input_sig,
+            )
+        )
+
+    # The decoded output of the learned connection is the network output
+    model.sig[network.connection]["weighted"] = output_sig
+
+    # Set up the signals filled in by the telemetry stream
+    if network.telemetry is not None:
+        build_telemetry(model, network, param_model)
+
+    # Start up the board while the rest of the model is built (only if the
+    # current `nengo_fpga.Simulator` requested it, the session manager of an
+    # earlier simulator may be closed)
+    if network.start_on_build:
+        network.start_connect()
+
+
+def build_telemetry(model, network, param_model):
+    """Build the signals holding the telemetry streamed by the board."""
+    telemetry = network.telemetry
+    n_neurons = network.ensemble.n_neurons
+    network.telemetry_stream = TelemetryStream(
+        telemetry, n_neurons, network.output_dimensions
     )
+
+    activities_sig = None
+    if telemetry.neurons is not False:
+        activities_sig = Signal(np.zeros(n_neurons), name="telemetry_activities")
+        model.sig[network.ensemble.neurons]["out"] = activities_sig
+
+        # The decoded output of the ensemble is decoded on the host
+        if telemetry.all_neurons(n_neurons):
+            model.sig[network.ensemble]["out"] = activities_sig
+            model.params[network.ensemble] = param_model.params[network.ensemble]
+
+    decoders_sig = None
+    if telemetry.decoders:
+        decoders_sig = Signal(
+            np.zeros((network.output_dimensions, n_neurons)),
+            name="telemetry_decoders",
+        )
+        model.sig[network.connection]["weights"] = decoders_sig
+
+    model.add_op(SimTelemetry(network, activities_sig, decoders_sig))
@@ -0,0 +1,176 @@
+"""An ensemble whose neurons are split across several FPGA boards."""
+
+import nengo
+import numpy as np
+
+from nengo_fpga.networks.fpga_pes_ensemble_network import FpgaPesEnsembleNetwork
+from nengo_fpga.pool import is_pool
+
+
+class ShardedFpgaPesEnsembleNetwork(nengo.Network):
+    """
+    An ensemble with a PES-learned output connection, split across FPGA boards.
+
+    The neurons are split as evenly as possible into one
+    `.FpgaPesEnsembleNetwork` (shard) per board. Every shard receives the same
+    input and error signals, and the partial decoded outputs of the shards are
+    summed on the host.
+
+    Each shard decodes its share of the output (its connection transform is
+    scaled by the fraction of the neurons it holds), and its learning rate is
+    scaled by the same fraction, so that the PES updates of the shards (each
+    normalized by the number of neurons of the shard) add up to the update of a
+    single ensemble with all the neurons.
+
+    Parameters
+    ----------
+    fpga_names : list of str
+        The names of the FPGA boards (as found in the ``fpga_config`` file), one
+        per shard. Pools of boards (``"pool:<name>"``) can be listed once per
+        shard to be taken from the pool.
+    n_neurons : int
+        The total number of neurons.
+    dimensions : int
+        The number of representational dimensions.
+    learning_rate : float
+        A scalar indicating the rate at which the decoders will be adjusted.
+    function : callable or (n_eval_points, size_mid) array_like, optional
+        Function to compute across the learned connection.
+    transform : (size_out, size_mid) array_like, optional
+        Linear transform mapping the pre function output to the post input.
+    eval_points : (n_eval_points, size_in) array_like or int, optional
+        Points at which to evaluate ``function`` when computing decoders,
+        spanning the interval (-radius, radius) in each dimension.
+    socket_args, reconnect, telemetry, mode : optional
+        Passed to each `.FpgaPesEnsembleNetwork` shard.
+    label : str, optional (Default: None)
+        A descriptive label for the network.
+    seed : int, optional (Default: None)
+        The seed used for random number generation (shard ``i`` uses
+        ``seed + i``).
+    add_to_container : bool, optional (Default: None)
+        Determines if this network will be added to the current container.
+
+    Attributes
+    ----------
+    input : `nengo.Node`
+        Input of the ensemble, sent to every shard.
+    error : `nengo.Node`
+        Error signal of the learning rule, sent to every shard.
+    output : `nengo.Node`
+        Sum of the decoded outputs of the shards.
+    shards : list of `.FpgaPesEnsembleNetwork`
+        The shards of the ensemble, one per FPGA board.
+    neuron_slices : list of slice
+        The neurons of the (full) ensemble held by each shard.
+    """
+
+    def __init__(
+        self,
+        fpga_names,
+        n_neurons,
+        dimensions,
+        learning_rate,
+        function=nengo.Default,
+        transform=nengo.Default,
+        eval_points=nengo.Default,
+        socket_args=None,
+        reconnect=None,
+        telemetry=None,
+        mode="lockstep",
+        label=None,
+        seed=None,
+        add_to_container=None,
+    ):
+        fpga_names = list(fpga_names)
+        if len(fpga_names) == 0:
+            raise nengo.exceptions.ValidationError(
+                "Must name at least one FPGA board", "fpga_names", self
+            )
+        boards = [name for name in fpga_names if not is_pool(name)]
+        if len(set(boards)) != len(boards):
+            raise nengo.exceptions.ValidationError(
+                "Each FPGA board can only hold one shard", "fpga_names", self
+            )
+        if n_neurons < len(fpga_names):
+            raise nengo.exceptions.ValidationError(
+                f"Cannot split {n_neurons} neurons across {len(fpga_names)} boards",
+                "n_neurons",
+                self,
+            )
+
+        super().__init__(label, seed, add_to_container)
+
+        # Split the neurons as evenly as possible
+        n_shards = len(fpga_names)
+        sizes = [
+            n_neurons // n_shards + (i < n_neurons % n_shards) for i in range(n_shards)
+        ]
+        bounds = np.cumsum([0] + sizes)
+        self.neuron_slices = [
+            slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+
+        self.shards = []
+        with self:
+            for i, (fpga_name, neurons) in enumerate(
+                zip(fpga_names, self.neuron_slices)
+            ):
+                fraction = (neurons.stop - neurons.start) / n_neurons
+                self.shards.append(
+                    FpgaPesEnsembleNetwork(
+                        fpga_name,
+                        neurons.stop - neurons.start,
+                        dimensions,
+                        learning_rate * fraction,
+                        function=function,
+                        transform=(
+                            fraction
+                            if transform is nengo.Default
+                            else np.asarray(transform) * fraction
+                        ),
+                        eval_points=eval_points,
+                        socket_args=socket_args,
+                        reconnect=reconnect,
+                        telemetry=telemetry,
+                        mode=mode,
+                        label=f"{label} shard {i}" if label else f"shard {i}",
+                        seed=None if seed is None else seed + i,
+                    )
+                )
+
+            self.input_dimensions = self.shards[0].input_dimensions
+            self.output_dimensions = self.shards[0].output_dimensions
+
+            self.input = nengo.Node(size_in=self.input_dimensions, label="input")
+            self.error = nengo.Node(size_in=self.output_dimensions, label="error")
+            self.output = nengo.Node(size_in=self.output_dimensions, label="output")
+
+            for shard in self.shards:
+                nengo.Connection(self.input, shard.input, synapse=None)
+                nengo.Connection(self.error, shard.error, synapse=None)
+                nengo.Connection(shard.output, self.output, synapse=None)
+
+    def set_ensemble_params(self, **params):
+        """
+        Set parameters of the ensemble of every shard.
+
+        Array-like values with one row per neuron (e.g., ``encoders``) are split
+        between the shards, other values (e.g., distributions) are set on every
+        shard.
+        """
+        for shard, neurons in zip(self.shards, self.neuron_slices):
+            for name, value in params.items():
+                if (
+                    nengo.utils.numpy.is_array_like(value)
+                    and np.ndim(value) > 0
+                    and len(value) == self.n_neurons
+                ):
+                    value = np.asarray(value)[neurons]
+                setattr(shard.ensemble, name, value)
+
+    def set_connection_params(self, **params):
+        """Set parameters (e.g., ``solver``) of the connection of every shard."""
+        for shard in self.shards:
+            for name, value in params.items():
+                setattr(shard.connection, name, value)
@@ -0,0 +1,190 @@
+"""Pools of interchangeable FPGA boards shared between users."""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+
+from nengo_fpga.fpga_config import fpga_config
+
+logger = logging.getLogger(__name__)
+
+# Prefix of the names of the board pool sections in the ``fpga_config`` file
+POOL_PREFIX = "pool:"
+
+
+class BoardBusyError(RuntimeError):
+    """The FPGA resource lock of a board is held by another user."""
+
+
+def is_pool(fpga_name):
+    """True if ``fpga_name`` names a pool of boards rather than a board."""
+    return fpga_name.startswith(POOL_PREFIX)
+
+
+class BoardPool:
+    """
+    A pool of interchangeable FPGA boards, of which any free one can be used.
+
+    Pools are defined by ``[pool:<name>]`` sections of the ``fpga_config`` file,
+    listing the (comma separated) names of the board sections in the pool, and
+    optionally how long to wait for a free board::
+
+        [pool:lab]
+        boards = de1-a, de1-b, de1-c
+        backoff = 1
+        max_backoff = 30
+        max_wait = 600
+
+    The boards are tried in order and the first free one is used. If a lease
+    manager is given (see `nengo_fpga.lease`), boards leased by other processes
+    are skipped without connecting to them, and the pool waits (in turn with the
+    other processes) for one of its boards to be released. When all the boards
+    are busy, they are tried again after a delay that doubles (with some
+    random jitter) from ``backoff`` up to ``max_backoff`` seconds, until a board
+    is free or ``max_wait`` seconds have passed. Boards used by other networks
+    of the same process are skipped, so networks connecting concurrently to the
+    same pool are given different boards.
+
+    Parameters
+    ----------
+    name : str
+        The name of the pool section (``"pool:<name>"``).
+    """
+
+    # Boards of all pools in use by networks of this process (board -> owner)
+    _claims = {}
+    _leases = {}
+    _claims_lock = threading.Lock()
+
+    def __init__(self, name):
+        self.name = name
+        self.boards = [
+            board.strip()
+            for board in fpga_config.get(name, "boards", fallback="").split(",")
+            if board.strip()
+        ]
+        if len(self.boards) == 0:
+            raise ValueError(f"Board pool '{name}' does not list any boards")
+        missing = [b for b in self.boards if not fpga_config.has_section(b)]
+        if missing:
+            raise ValueError(
+                f"Boards {missing} of pool '{name}' are not in the FPGA config"
+            )
+
+        self.backoff = fpga_config.getfloat(name, "backoff", fallback=1.0)
+        self.max_backoff = fpga_config.getfloat(name, "max_backoff", fallback=30.0)
+        self.max_wait = fpga_config.getfloat(name, "max_wait", fallback=600.0)
+
+    def claim(self, board, owner):
+        """Mark ``board`` as used by ``owner``, return False if already in use."""
+        with self._claims_lock:
+            if self._claims.get(board, owner) is not owner:
+                return False
+            self._claims[board] = owner
+            return True
+
+    def release(self, board, owner):
+        """Release ``board`` if it is used by ``owner``."""
+        with self._claims_lock:
+            if self._claims.get(board) is not owner:
+                return
+            del self._claims[board]
+            lease = self._leases.pop(board, None)
+        if lease is not None:
+            lease.release()
+
+    def retry_delay(self, attempt):
+        """Delay (in seconds) before trying the boards again after ``attempt``."""
+        delay = min(self.max_backoff, self.backoff * 2**attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def acquire(self, connect, owner, leases=None):
+        """
+        Connect to the first free board of the pool.
+
+        Parameters
+        ----------
+        connect : coroutine function
+            Called as ``connect(board)`` to connect to a board, raises
+            `.BoardBusyError` if the board is busy.
+        owner : object
+            The user of the board (e.g., the FPGA network), until released.
+        leases : `nengo_fpga.lease.LeaseClient` or `nengo_fpga.lease.FileLeases`
+            If given, boards are leased before connecting to them (the lease is
+            released with the board).
+
+        Returns
+        -------
+        board : str
+            The name of the board connected to.
+        wait_time : float
+            The time (in seconds) spent waiting for a free board.
+        """
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            n_busy = 0
+            error = None
+            untried = list(self.boards)
+            while untried:
+                lease = None
+                if leases is None:
+                    board = untried.pop(0)
+                else:
+                    # Wait for one of the boards not leased by other processes
+                    timeout = self.max_wait - (time.monotonic() - start)
+                    lease = await leases.acquire(untried, timeout=max(timeout, 0))
+                    if lease is None:
+                        n_busy += len(untried)
+                        break
+                    board = lease.board
+                    untried.remove(board)
+
+                if not self.claim(board, owner):
+                    if lease is not None:
+                        lease.release()
+                    n_busy += 1
+                    continue
+                if lease is not None:
+                    self._leases[board] = lease
+
+                try:
+                    await connect(board)
+                except BoardBusyError:
+                    # Used by someone not taking leases
+                    logger.info("<%s> Board %s is busy", self.name, board)
+                    self.release(board, owner)
+                    n_busy += 1
+                except Exception as e:  # pylint: disable=broad-except
+                    logger.warning(
+                        "<%s> Could not connect to board %s: %s", self.name, board, e
+                    )
+                    self.release(board, owner)
+                    error = e
+                except BaseException:
+                    self.release(board, owner)
+                    raise
+                else:
+                    return board, time.monotonic() - start
+
+            # Only wait if some boards are busy (rather than unreachable)
+            if n_busy == 0:
+                raise RuntimeError(
+                    f"Could not connect to any board of pool '{self.name}'."
+                ) from error
+
+            waited = time.monotonic() - start
+            if waited >= self.max_wait:
+                raise BoardBusyError(
+                    f"No board of pool '{self.name}' became free within "
+                    f"{self.max_wait}s."
+                ) from error
+
+            delay = min(self.retry_delay(attempt), self.max_wait - waited)
+            logger.info(
+                "<%s> All boards are busy, trying again in %0.1fs", self.name, delay
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
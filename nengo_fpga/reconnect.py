@@ -0,0 +1,71 @@
+"""Policy used to recover from the transient loss of an FPGA board."""
+
+import nengo
+import numpy as np
+
+
+class ReconnectPolicy:
+    """
+    Describes how to recover when the connection to an FPGA board is lost.
+
+    While the board is reconnecting, the host keeps simulating and the output of
+    the FPGA network is filled in according to ``hold``.
+
+    Parameters
+    ----------
+    max_attempts : int, optional (Default: 3)
+        Number of reconnection attempts before giving up.
+    max_hold_steps : int, optional (Default: None)
+        Maximum number of simulation steps the host fills in while reconnecting
+        before giving up. If ``None``, the host waits for all the reconnection
+        attempts to finish.
+    hold : "last" or "zero" or callable, optional (Default: "last")
+        Output of the FPGA network while reconnecting. ``"last"`` holds the last
+        output received from the board, ``"zero"`` outputs zeros, and a callable
+        is called as ``hold(t, last_output)`` and must return the output.
+    loss_timeouts : int, optional (Default: 10)
+        Number of consecutive receive timeouts after which the board is
+        considered lost (in addition to SSH session errors and closed sockets).
+    backoff : float, optional (Default: 1)
+        Delay (in seconds) before the second reconnection attempt; the delay
+        grows linearly with each subsequent attempt.
+    snapshot_interval : float, optional (Default: 1)
+        Interval (in wall-clock seconds) at which the learned decoders are read
+        from the board over the control channel while it is connected, so that
+        the board resumes learning from them after reconnecting (the learning
+        since the last snapshot is lost). If ``None``, the decoders are only
+        captured by ``read_decoders`` and decoder telemetry.
+    """
+
+    def __init__(
+        self,
+        max_attempts=3,
+        max_hold_steps=None,
+        hold="last",
+        loss_timeouts=10,
+        backoff=1.0,
+        snapshot_interval=1.0,
+    ):
+        if not (callable(hold) or hold in ("last", "zero")):
+            raise nengo.exceptions.ValidationError(
+                "Must be 'last', 'zero' or callable", "hold", self
+            )
+
+        self.max_attempts = max_attempts
+        self.max_hold_steps = max_hold_steps
+        self.hold = hold
+        self.loss_timeouts = loss_timeouts
+        self.backoff = backoff
+        self.snapshot_interval = snapshot_interval
+
+    def hold_output(self, t, last_output):
+        """Output of the FPGA network at time ``t`` while reconnecting."""
+        if self.hold == "last":
+            return last_output
+        elif self.hold == "zero":
+            return np.zeros_like(last_output)
+        return self.hold(t, last_output)
+
+    def attempt_delay(self, attempt):
+        """Delay (in seconds) before reconnection attempt ``attempt`` (from 0)."""
+        return self.backoff * attempt
@@ -0,0 +1,167 @@
+"""Asyncio event loop used to manage the connections to FPGA boards."""
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from functools import partial
+
+logger = logging.getLogger(__name__)
+
+
+class SessionManager:
+    """
+    Run the board I/O of one or more FPGA networks on a single event loop.
+
+    The event loop lives in a dedicated background thread so that the
+    (synchronous) Nengo simulation is never blocked by board I/O. Blocking calls
+    (e.g., paramiko SSH and SFTP calls) are wrapped as futures using a bounded
+    thread pool owned by the manager. Closing the manager cancels all
+    outstanding tasks and joins every thread it created.
+
+    Parameters
+    ----------
+    max_workers : int, optional (Default: 8)
+        The maximum number of threads used to run blocking calls.
+    """
+
+    def __init__(self, max_workers=8):
+        self.max_workers = max_workers
+
+        self.loop = None
+        self._thread = None
+        self._executor = None
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()  # Marks the threads of the manager
+
+    @property
+    def running(self):
+        """True if the event loop thread is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the event loop thread if it is not already running."""
+        with self._lock:
+            if self.running:
+                return
+
+            self.loop = asyncio.new_event_loop()
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="nengo_fpga-io",
+                initializer=self._init_thread,
+            )
+            self.loop.set_default_executor(self._executor)
+
+            ready = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run_loop,
+                args=(ready,),
+                name="nengo_fpga-session",
+                daemon=True,
+            )
+            self._thread.start()
+            ready.wait()
+
+    def _init_thread(self):
+        self._local.owned = True
+
+    def in_own_thread(self):
+        """True if called from the event loop thread or the thread pool."""
+        return getattr(self._local, "owned", False)
+
+    def _run_loop(self, ready):
+        self._init_thread()
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(ready.set)
+        self.loop.run_forever()
+
+    async def _track(self, coro):
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            return await coro
+        finally:
+            self._tasks.discard(task)
+
+    def submit(self, coro):
+        """
+        Schedule a coroutine on the event loop.
+
+        Can be called from any thread (including the event loop thread). Returns a
+        `concurrent.futures.Future` that can be waited on or cancelled.
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self._track(coro), self.loop)
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the event loop and block until it completes."""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # Timed out or interrupted, do not leave the coroutine running
+            future.cancel()
+            raise
+
+    def gather(self, coros, timeout=None):
+        """
+        Run several coroutines concurrently and block until all have completed.
+
+        If any of the coroutines raises an exception, the remaining ones are
+        cancelled and the exception is re-raised.
+        """
+
+        async def _gather():
+            tasks = [asyncio.ensure_future(coro) for coro in coros]
+            try:
+                return await asyncio.gather(*tasks)
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+
+        return self.run(_gather(), timeout=timeout)
+
+    async def to_thread(self, fn, *args, **kwargs):
+        """Run a blocking function in the manager's thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(fn, *args, **kwargs))
+
+    def cancel_all(self):
+        """Cancel all outstanding tasks and wait for them to finish."""
+        if not self.running:
+            return
+
+        async def _cancel():
+            tasks = [t for t in self._tasks if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(_cancel(), self.loop).result()
+
+    def close(self):
+        """Cancel all tasks, then stop the event loop and all of its threads."""
+        if self.loop is None:
+            return
+
+        if self.in_own_thread():
+            raise RuntimeError(
+                "Cannot close the session manager from its own loop or threads."
+            )
+
+        self.cancel_all()
+        with self._lock:
+            if self.running:
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                self._thread.join()
+            self._executor.shutdown(wait=True)
+            self.loop.close()
+
+            self.loop = None
+            self._thread = None
+            self._executor = None
+        logger.debug("Session manager closed")
@@ -1,26 +1,116 @@
 """Modified Nengo Simulator to integrate FPGA interfaces."""
 
 import atexit
+import os
+import threading
+import weakref
 
 import nengo
 
 from .networks import FpgaPesEnsembleNetwork
+from .session import SessionManager
+from .utils.probe_stream import ProbeStream
+from .utils.timing import StepTimer
+
+# Simulators that have not been closed yet. Only weak references are kept, so
+# that simulators (and their signals and probe data) that are no longer used can
+# be freed in long-lived processes. The boards of simulators freed without being
+# closed are closed by a finalizer (see `_close_networks`).
+_open_simulators = weakref.WeakSet()
+
+
+@atexit.register
+def _terminate_open_simulators():
+    """Terminate the simulators still open at exit (e.g., after ctrl+C)."""
+    for sim in list(_open_simulators):
+        sim.terminate()
+
+
+def _close_networks(networks, session_manager):
+    """Close the connections (and remote processes) of the FPGA ``networks``."""
+    if session_manager.in_own_thread():
+        # The simulator was freed by a callback of its session manager, which
+        # cannot be closed from its own threads: close from a new thread
+        thread = threading.Thread(
+            target=_close_networks,
+            args=(networks, session_manager),
+            name="nengo_fpga-close",
+        )
+        session_manager.loop.call_soon_threadsafe(thread.start)
+        return
+
+    for net in networks:
+        net.close()
+        net.cleanup()
+    session_manager.close()
 
 
 class Simulator(nengo.simulator.Simulator):
-    """Modified Nengo Simulator to integrate FPGA interfaces."""
+    """
+    Modified Nengo Simulator to integrate FPGA interfaces.
 
-    def __init__(self, network, **kwargs):
+    Parameters
+    ----------
+    network : `nengo.Network`
+        The network to simulate.
+    real_time : bool or `nengo_fpga.utils.timing.StepTimer`, optional
+        If ``True``, simulation steps are paced to take ``dt`` seconds of
+        wall-clock time, and deadline misses are recorded in ``step_timer``. A
+        `nengo_fpga.utils.timing.StepTimer` can be given to set a different
+        period or histogram. Networks in ``"realtime"`` mode require pacing
+        (their boards run at wall-clock time). Default: ``True`` if the network
+        contains ``"realtime"`` FPGA networks, ``False`` otherwise
+    probe_dir : str, optional
+        If given, probe data is streamed to chunk files in this directory (one
+        ``probe_<i>`` subdirectory per probe, in the order of ``model.probes``)
+        instead of being kept in memory, and ``sim.data[probe]`` is a
+        `nengo_fpga.utils.probe_stream.ProbeStream`. Default: None
+    probe_chunk_size : int, optional
+        Number of samples per chunk file (and kept in memory) for each probe when
+        ``probe_dir`` is given. Default: 1000
+    **kwargs
+        Passed on to `nengo.Simulator`.
+    """
+
+    def __init__(
+        self, network, real_time=None, probe_dir=None, probe_chunk_size=1000, **kwargs
+    ):
         # Keep a record of the SSH connection details
         self.fpga_networks_list = []
 
-        # Iterate through all of the probes and generate a list of probe
-        # targets
-        probe_target_list = [p.target for p in network.all_probes]
+        # Optional streaming of the probe data to disk
+        self.probe_dir = probe_dir
+        self.probe_chunk_size = probe_chunk_size
+
+        # Optional wall-clock pacing of the simulation steps (the boards of
+        # realtime networks run at wall-clock time, the host must keep up)
+        realtime = any(
+            isinstance(net, FpgaPesEnsembleNetwork) and net.mode == "realtime"
+            for net in network.all_networks
+        )
+        if real_time is None:
+            real_time = realtime
+        if real_time is True:
+            real_time = StepTimer(kwargs.get("dt", 0.001))
+        elif not (real_time is False or isinstance(real_time, StepTimer)):
+            raise nengo.exceptions.ValidationError(
+                "Must be a bool or a StepTimer", "real_time", self
+            )
+        elif real_time is False and realtime:
+            raise nengo.exceptions.ValidationError(
+                "Networks in 'realtime' mode require real-time pacing",
+                "real_time",
+                self,
+            )
+        self.step_timer = real_time or None
+
+        # All board I/O (for every FPGA network) runs on a single event loop
+        self.session_manager = SessionManager()
 
         # Iterate through the given network and identify all of the
         # RemotePESEnembleNetworks that will require an SSH connection
-        for net in network.networks:
+        # (including those nested in subnetworks, e.g., sharded ensembles)
+        for net in network.all_networks:
             if (
                 isinstance(net, FpgaPesEnsembleNetwork)
                 and net not in self.fpga_networks_list
@@ -30,52 +120,149 @@ class Simulator(nengo.simulator.Simulator):
 
                 # Set the 'using_fpga_sim' flag in all FPGA networks
                 net.using_fpga_sim = True
+                net.session_manager = self.session_manager
 
-                # Check if FpgaPesEnsembleNetwork dummy ensemble or dummy
-                # connection are being probed. If they are throw an error.
-                for target in probe_target_list:
-                    if isinstance(target, nengo.Ensemble) and target is net.ensemble:
-                        raise nengo.exceptions.BuildError(
-                            "FPGA PES Ensembles are currently non-probable."
-                        )
-                    elif (
-                        isinstance(target, nengo.ensemble.Neurons)
-                        and target.ensemble is net.ensemble
-                    ):
-                        raise nengo.exceptions.BuildError(
-                            "FPGA PES Neurons are currently non-probable."
-                        )
-                    elif (
-                        isinstance(target, nengo.Connection)
-                        and target is net.connection
-                    ):
-                        raise nengo.exceptions.BuildError(
-                            "FPGA PES Connections are currently non-probable."
-                        )
+                # Check that the FpgaPesEnsembleNetwork dummy ensemble or dummy
+                # connection are only probed if the board streams the probed
+                # values (see `.FpgaPesEnsembleNetwork` telemetry)
+                for probe in network.all_probes:
+                    check_probe(net, probe)
 
         # NOTE: Originally, a connect function was used to iterate and open
         #       all necessary SSH connections to the FPGA networks. However,
         #       a connect function is not called because the reset function
         #       should be called before the simulation is run.
 
-        # Register OS signal handler to handle ctrl+C or any abnormal
-        # termination
-        atexit.register(self.terminate)
+        # Terminate the simulator at exit (e.g., on ctrl+C or any abnormal
+        # termination) if it has not been closed by then, and terminate the
+        # boards of a simulator that is garbage collected without being closed.
+        # The finalizer must not reference the simulator itself.
+        _open_simulators.add(self)
+        self._finalizer = weakref.finalize(
+            self, _close_networks, self.fpga_networks_list, self.session_manager
+        )
+        self._finalizer.atexit = False  # Open simulators are terminated above
 
-        # Call nengo.Simulator super constructor
-        super().__init__(network, **kwargs)
+        # Call nengo.Simulator super constructor. The boards are started by the
+        # builder, so stop them if the model cannot be built.
+        for net in self.fpga_networks_list:
+            net.start_on_build = True
+        try:
+            super().__init__(network, **kwargs)
+        except BaseException:
+            self._finalizer()
+            raise
+        finally:
+            for net in self.fpga_networks_list:
+                net.start_on_build = False
 
     def close(self):
         """Close all connections to the remote networks."""
-        for net in self.fpga_networks_list:
-            net.close()
+        _open_simulators.discard(self)
+        self._finalizer()
+        if self.probe_dir is not None and hasattr(self, "model"):
+            # Write the remaining probe data so that the chunk files are complete
+            for probe in self.model.probes:
+                self._sim_data[probe].flush()
         super().close()
 
     def reset(self, seed=None):
-        """Call the reset function for each remote network."""
+        """Reset each remote network, connecting to all boards concurrently."""
         for net in self.fpga_networks_list:
-            net.reset()
+            # Boards started while building the model are not restarted
+            if net.connect_future is None:
+                net.close()
+
+        if self.fpga_networks_list:
+            try:
+                self.session_manager.gather(
+                    [net.finish_connect_async() for net in self.fpga_networks_list]
+                )
+            except BaseException:
+                for net in self.fpga_networks_list:
+                    net.close()
+                raise
         super().reset(seed)
+        if self.step_timer is not None:
+            self.step_timer.reset()
+
+    def clear_probes(self):
+        """Clear all probe histories (and chunk files, if streamed to disk)."""
+        if self.probe_dir is None:
+            super().clear_probes()
+            return
+
+        for i, probe in enumerate(self.model.probes):
+            stream = self._sim_data.get(probe)
+            if isinstance(stream, ProbeStream):
+                stream.clear()
+            else:
+                self._sim_data[probe] = ProbeStream(
+                    os.path.join(self.probe_dir, f"probe_{i}"),
+                    chunk_size=self.probe_chunk_size,
+                )
+        self.data.reset()
+
+    def step(self):
+        """Advance the simulator by ``dt`` seconds (paced if ``real_time``)."""
+        if self.step_timer is None:
+            super().step()
+        else:
+            self.step_timer.begin()
+            super().step()
+            self.step_timer.end()
+
+    def run_steps(self, steps, progress_bar=None):
+        """
+        Simulate for the given number of ``dt`` steps.
+
+        The output of offline FPGA networks for these steps is fetched (from all
+        boards concurrently) before the simulation is run. With ``real_time``,
+        the pacing restarts with the run (time spent between runs is not counted
+        as deadline misses).
+        """
+        offline_nets = [net for net in self.fpga_networks_list if net.mode == "offline"]
+        if offline_nets:
+            self.session_manager.gather(
+                [
+                    net.fetch_offline_async(self.n_steps, self.n_steps + steps)
+                    for net in offline_nets
+                ]
+            )
+        if self.step_timer is not None:
+            self.step_timer.restart()
+        super().run_steps(steps, progress_bar=progress_bar)
+
+    @property
+    def board_health(self):
+        """Latest heartbeat (or ``None``) received from each FPGA board, by name."""
+        return {net.fpga_name: net.health for net in self.fpga_networks_list}
+
+    def degraded_boards(self, max_age=None, max_step_time=None, max_queue_depth=None):
+        """
+        Find FPGA boards whose health is degraded.
+
+        Only boards with heartbeats enabled (see the ``socket_args`` of
+        `.FpgaPesEnsembleNetwork`) are checked. The ``max_step_time`` defaults to
+        the simulation ``dt``. See `.FpgaPesEnsembleNetwork.health_status` for a
+        description of the parameters.
+
+        Returns a dictionary mapping the name of each degraded board to the reason
+        it is considered degraded.
+        """
+        if max_step_time is None:
+            max_step_time = self.dt
+
+        degraded = {}
+        for net in self.fpga_networks_list:
+            status = net.health_status(
+                max_age=max_age,
+                max_step_time=max_step_time,
+                max_queue_depth=max_queue_depth,
+            )
+            if status is not None:
+                degraded[net.fpga_name] = status
+        return degraded
 
     def terminate(self):
         """
@@ -85,5 +272,33 @@ class Simulator(nengo.simulator.Simulator):
         - Cleanup any existing temporary files
         """
         self.close()
-        for net in self.fpga_networks_list:
-            net.cleanup()
+
+
+def check_probe(net, probe):
+    """Raise a `nengo.exceptions.BuildError` if ``probe`` cannot be built."""
+    telemetry = net.telemetry
+    target = probe.obj
+    n_neurons = net.ensemble.n_neurons
+
+    if isinstance(target, nengo.Ensemble) and target is net.ensemble:
+        if telemetry is None or not telemetry.all_neurons(n_neurons):
+            raise nengo.exceptions.BuildError(
+                "FPGA PES Ensembles are only probeable with telemetry of all "
+                "the neurons."
+            )
+    elif isinstance(target, nengo.ensemble.Neurons) and target.ensemble is net.ensemble:
+        if telemetry is None or telemetry.neurons is False:
+            raise nengo.exceptions.BuildError(
+                "FPGA PES Neurons are only probeable with neuron telemetry."
+            )
+    elif isinstance(target, nengo.Connection) and target is net.connection:
+        if probe.attr == "weights":
+            if telemetry is None or not telemetry.decoders:
+                raise nengo.exceptions.BuildError(
+                    "FPGA PES Connection weights are only probeable with decoder "
+                    "telemetry."
+                )
+        elif probe.attr != "output":
+            raise nengo.exceptions.BuildError(
+                f"FPGA PES Connection attribute '{probe.attr}' is not probeable."
+            )
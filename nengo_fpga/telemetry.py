@@ -0,0 +1,270 @@
+"""
+Telemetry streamed by the FPGA board so that its ensemble can be probed.
+
+The board sends a telemetry packet every ``decimation`` steps to a separate UDP
+socket on the host (port ``udp_port + 2``). Each packet is a sequence of float64
+values ``[t, *activities]``. Every ``decoder_decimation`` steps, a snapshot of the
+decoders (``size_out * n_neurons`` values, row-major) is also sent, split in
+chunks of at most ``decoder_chunk_size`` values (as with the arrays of the control
+channel, see `nengo_fpga.control`): each chunk is sent in its own packet
+``[t, *activities, chunk_index, n_chunks, offset, *values]``. Snapshots with lost
+chunks are dropped.
+"""
+
+import logging
+import socket
+
+import nengo
+import numpy as np
+from nengo.builder.operator import Operator
+
+from nengo_fpga.control import MAX_PACKET_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Number of values of the header of the decoder chunks
+CHUNK_HEADER = 3
+
+
+class Telemetry:
+    """
+    Describes the telemetry streamed by an FPGA board.
+
+    Probes of the telemetered values hold the latest value received from the
+    board between telemetry packets.
+
+    Parameters
+    ----------
+    neurons : bool or array_like of int, optional (Default: True)
+        Neurons whose activities are streamed (``True`` for all the neurons,
+        ``False`` for none). Neurons that are not streamed read as zero. The
+        decoded output of the ensemble can only be probed if all the neurons are
+        streamed (it is decoded on the host).
+    decoders : bool, optional (Default: False)
+        Whether to stream snapshots of the (learned) decoders.
+    decimation : int, optional (Default: 10)
+        Number of simulation steps between telemetry packets.
+    decoder_decimation : int, optional (Default: 100)
+        Number of simulation steps between decoder snapshots.
+    """
+
+    def __init__(
+        self, neurons=True, decoders=False, decimation=10, decoder_decimation=100
+    ):
+        for name, value in (
+            ("decimation", decimation),
+            ("decoder_decimation", decoder_decimation),
+        ):
+            if int(value) != value or value < 1:
+                raise nengo.exceptions.ValidationError(
+                    "Must be a positive integer", name, self
+                )
+
+        self.neurons = neurons
+        self.decoders = decoders
+        self.decimation = int(decimation)
+        self.decoder_decimation = int(decoder_decimation)
+
+    def neuron_indices(self, n_neurons):
+        """Indices of the neurons whose activities are streamed."""
+        if self.neurons is True:
+            return np.arange(n_neurons)
+        elif self.neurons is False:
+            return np.arange(0)
+
+        indices = np.asarray(self.neurons, dtype=int).ravel()
+        if np.any(indices < 0) or np.any(indices >= n_neurons):
+            raise nengo.exceptions.ValidationError(
+                f"Neuron indices must be in [0, {n_neurons})", "neurons", self
+            )
+        return indices
+
+    def all_neurons(self, n_neurons):
+        """Whether the activities of all ``n_neurons`` neurons are streamed."""
+        return len(np.unique(self.neuron_indices(n_neurons))) == n_neurons
+
+    def chunk_size(self, n_neurons):
+        """Maximum number of decoder values sent in each telemetry packet."""
+        n_values = 1 + len(self.neuron_indices(n_neurons))
+        return MAX_PACKET_BYTES // 8 - n_values - CHUNK_HEADER
+
+    def args(self, n_neurons):
+        """Telemetry arguments uploaded to the board."""
+        return {
+            "decimation": self.decimation,
+            "neurons": self.neuron_indices(n_neurons),
+            "decoder_decimation": self.decoder_decimation if self.decoders else 0,
+            "decoder_chunk_size": self.chunk_size(n_neurons),
+        }
+
+
+class TelemetryStream:
+    """
+    Host-side receiver of the telemetry packets sent by a board.
+
+    Packets are read into a preallocated buffer without blocking the simulation.
+
+    Parameters
+    ----------
+    telemetry : `.Telemetry`
+        The telemetry streamed by the board.
+    n_neurons : int
+        Number of neurons of the FPGA ensemble.
+    size_out : int
+        Output dimensionality of the learned connection.
+    """
+
+    def __init__(self, telemetry, n_neurons, size_out):
+        self.neurons = telemetry.neuron_indices(n_neurons)
+        self.decoders_shape = (size_out, n_neurons) if telemetry.decoders else None
+
+        self.n_values = 1 + len(self.neurons)
+        self.max_values = self.n_values
+        self.snapshot = None
+        if self.decoders_shape is not None:
+            chunk_size = telemetry.chunk_size(n_neurons)
+            if chunk_size < 1:
+                raise nengo.exceptions.BuildError(
+                    f"Telemetry packets of {self.n_values} values leave no room "
+                    "for the decoders in a UDP packet; stream fewer neurons or no "
+                    "decoders."
+                )
+            self.max_values += CHUNK_HEADER + min(chunk_size, size_out * n_neurons)
+            self.snapshot = np.zeros(size_out * n_neurons)
+        if self.max_values * 8 > MAX_PACKET_BYTES:
+            raise nengo.exceptions.BuildError(
+                f"Telemetry packets of {self.max_values} values do not fit in a "
+                "single UDP packet; stream fewer neurons."
+            )
+
+        self.socket = None
+        self.buffer = np.zeros(self.max_values)
+        self.n_packets = 0
+        self.sim_time = None
+        self.decoders_time = None
+        self.snapshot_time = None
+        self.snapshot_chunks = set()
+
+    def open(self, host_ip, port):
+        """Create and bind the (non-blocking) telemetry socket."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind((host_ip, port))
+        self.open_socket(sock)
+
+    def open_socket(self, sock):
+        """Receive the telemetry on the (bound) socket ``sock``."""
+        self.socket = sock
+        self.socket.setblocking(False)
+
+    def close(self):
+        """Close the telemetry socket."""
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+    def drain(self, activities=None, decoders=None):
+        """
+        Read all pending packets, writing their values to the given arrays.
+
+        Returns True if a decoder snapshot was written to ``decoders``.
+        """
+        new_decoders = False
+        if self.socket is None:
+            return new_decoders
+
+        while True:
+            try:
+                n_bytes = self.socket.recv_into(self.buffer.data)
+            except (BlockingIOError, InterruptedError):
+                return new_decoders
+
+            n_values = n_bytes // 8
+            if n_values < self.n_values:
+                logger.debug("Dropping short telemetry packet (%d values)", n_values)
+                continue
+
+            self.n_packets += 1
+            self.sim_time = self.buffer[0]
+            if activities is not None:
+                activities[self.neurons] = self.buffer[1 : self.n_values]
+            if (
+                decoders is not None
+                and n_values > self.n_values + CHUNK_HEADER
+                and self.read_chunk(n_values)
+            ):
+                decoders[...] = self.snapshot.reshape(self.decoders_shape)
+                self.decoders_time = self.sim_time
+                new_decoders = True
+
+    def read_chunk(self, n_values):
+        """
+        Add the decoder chunk of the packet in the buffer to the snapshot.
+
+        Returns True once all the chunks of the snapshot have been received.
+        """
+        header = self.buffer[self.n_values : self.n_values + CHUNK_HEADER]
+        index, n_chunks, offset = (int(v) for v in header)
+        values = self.buffer[self.n_values + CHUNK_HEADER : n_values]
+        if offset + len(values) > len(self.snapshot):
+            logger.debug("Dropping invalid decoder chunk (offset %d)", offset)
+            return False
+
+        if self.sim_time != self.snapshot_time:
+            # First chunk of a new snapshot, the previous one is incomplete
+            self.snapshot_time = self.sim_time
+            self.snapshot_chunks.clear()
+        self.snapshot[offset : offset + len(values)] = values
+        self.snapshot_chunks.add(index)
+        if len(self.snapshot_chunks) < n_chunks:
+            return False
+
+        self.snapshot_chunks.clear()
+        return True
+
+
+class SimTelemetry(Operator):
+    """
+    Write the latest telemetry received from an FPGA board to signals.
+
+    Parameters
+    ----------
+    network : `.FpgaPesEnsembleNetwork`
+        The network whose ``telemetry_stream`` is read.
+    activities : Signal or None
+        Signal holding the neuron activities.
+    decoders : Signal or None
+        Signal holding the decoders of the learned connection.
+    tag : str, optional
+        A label associated with the operator, for debugging purposes.
+
+    Notes
+    -----
+    1. sets ``[activities, decoders]`` (if not ``None``)
+    2. incs ``[]``
+    3. reads ``[]``
+    4. updates ``[]``
+    """
+
+    def __init__(self, network, activities, decoders, tag=None):
+        super().__init__(tag=tag)
+        self.network = network
+        self.activities = activities
+        self.decoders = decoders
+
+        self.sets = [sig for sig in (activities, decoders) if sig is not None]
+        self.incs = []
+        self.reads = []
+        self.updates = []
+
+    def make_step(self, signals, dt, rng):
+        activities = None if self.activities is None else signals[self.activities]
+        decoders = None if self.decoders is None else signals[self.decoders]
+        network = self.network
+
+        def step_simtelemetry():
+            stream = network.telemetry_stream
+            if stream is not None and stream.drain(activities, decoders):
+                # Resume from the latest snapshot if the board reconnects
+                network.record_decoders(decoders, stream.decoders_time)
+
+        return step_simtelemetry
@@ -9,6 +9,7 @@ from nengo_fpga.tests.fixtures import (
     dummy_net,
     dummy_sim,
     gen_configs,
+    loopback_board,
     params,
 )
 
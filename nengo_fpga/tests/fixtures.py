@@ -1,15 +1,18 @@
 # pylint: disable=redefined-outer-name
 """Test fixtures used in the test suite."""
 import os
+import socket
+import weakref
 
 import nengo
 import numpy as np
 import pytest
 
 import nengo_fpga
-from nengo_fpga import fpga_config
+from nengo_fpga import fpga_config, simulator
 from nengo_fpga.id_extractor import IDExtractor
 from nengo_fpga.networks import FpgaPesEnsembleNetwork
+from nengo_fpga.session import SessionManager
 from nengo_fpga.simulator import Simulator
 
 
@@ -92,7 +95,7 @@ def config_contents():
 
     # We omit ssh_key and ssh_pwd as they will be tested separately
     contents = {
-        "host": {"ip": "1.2.3.4"},
+        "host": {"ip": "1.2.3.4", "leases": "none"},  # Leases tested separately
         "test-fpga": {
             "udp_port": "0",
             "ssh_port": "1",
@@ -124,6 +127,7 @@ def dummy_extractor(config_contents, gen_configs, mocker):  # noqa: W0521
 
     # Don't actually connect the socket in init
     mocker.patch("socket.socket.bind")
+    mocker.patch("socket.socket.getsockname", return_value=("1.2.3.4", 23456))
     mocker.patch("socket.socket.listen")
 
     return IDExtractor(fpga_name)
@@ -147,6 +151,61 @@ def dummy_net(config_contents, gen_configs):  # noqa: W0521
     return FpgaPesEnsembleNetwork(fpga_name, 1, 1, 0.001)
 
 
+@pytest.fixture
+def loopback_board(config_contents, gen_configs, mocker):
+    """
+    Setup a fake FPGA board answering on the loopback interface.
+
+    `attach` replaces the SSH session of a network with a thread playing the
+    board-side script: it sends the handshake, then answers every packet with
+    its time step and `output`, until it receives a termination packet.
+    """
+
+    config_contents["host"]["ip"] = "127.0.0.1"
+    config_contents["test-fpga"]["ip"] = "127.0.0.2"
+    fname = os.path.join(os.getcwd(), "test-config")
+    gen_configs.create_config(fname, contents=config_contents)
+    fpga_config.reload_config(fname)
+
+    class LoopbackBoard:
+        """Fake board-side script."""
+
+        def __init__(self):
+            self.output = 0.0
+            self.n_sessions = 0
+            self.packets = []  # Packets received from the host
+            self.terminated = False  # Whether the host terminated the session
+
+        def run(self, net):
+            """Answer the packets of ``net`` (in a thread)."""
+            packet_size = net.input_dimensions + net.output_dimensions + 1
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                sock.bind(net.send_addr)
+                sock.settimeout(5)
+                host_addr = (fpga_config.get("host", "ip"), net.udp_port)
+                sock.sendto(np.zeros(net.output_dimensions + 1).tobytes(), host_addr)
+                while True:
+                    packet = np.frombuffer(sock.recv(8 * packet_size))
+                    if packet[0] < 0:
+                        self.terminated = True
+                        break
+                    self.packets.append(packet)
+                    reply = np.full(net.output_dimensions + 1, self.output)
+                    reply[0] = packet[0]
+                    sock.sendto(reply.tobytes(), host_addr)
+
+        def attach(self, net):
+            """Run the fake board instead of the SSH session of ``net``."""
+
+            async def ssh_session():
+                self.n_sessions += 1
+                await net.session_manager.to_thread(self.run, net)
+
+            mocker.patch.object(net, "ssh_session", side_effect=ssh_session)
+
+    return LoopbackBoard()
+
+
 @pytest.fixture
 def dummy_sim(mocker):
     """Setup dummy network and simulator."""
@@ -154,12 +213,29 @@ def dummy_sim(mocker):
     class DummyNet:
         """Dummy network class with token functions."""
 
+        fpga_name = "dummy"
+        health = None
+        mode = "lockstep"
+        connect_future = None
+
+        def health_status(self, **kwargs):
+            """Dummy health_status function."""
+
         def close(self):
             """Dummy close function."""
 
         def reset(self):
             """Dummy reset function."""
 
+        async def connect_async(self):
+            """Dummy connect_async function."""
+
+        async def finish_connect_async(self):
+            """Dummy finish_connect_async function."""
+
+        async def fetch_offline_async(self, start, stop):
+            """Dummy fetch_offline_async function."""
+
         def cleanup(self):
             """Dummy cleanup function."""
 
@@ -170,6 +246,12 @@ def dummy_sim(mocker):
 
     sim = Simulator(my_net)  # Using `my_net` as a dummy arg. init is mocked
     sim.fpga_networks_list = [my_net, my_net]
+    sim.session_manager = SessionManager()
+    sim._finalizer = weakref.finalize(
+        sim, simulator._close_networks, sim.fpga_networks_list, sim.session_manager
+    )
+    sim.step_timer = None
+    sim.probe_dir = None
 
     # Simulator cleanup was complaining these weren't defined
     sim.closed = False
@@ -48,6 +48,14 @@ def test_reload_config(mocker):
 
     dummy_call = "fake_files"
     dummy_config = _FPGA_CONFIG()
+
+    # The config files are read on first use
+    read_mock.assert_not_called()
+    assert not dummy_config.loaded
+    dummy_config.has_section("host")
+    assert dummy_config.loaded
+    read_mock.assert_called_once_with(fpga_config_files)
+
     dummy_config.reload_config(dummy_call)
 
     read_mock.assert_has_calls(
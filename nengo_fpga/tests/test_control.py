@@ -0,0 +1,154 @@
+"""Tests for the board control channel."""
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from nengo_fpga.control import OP_DECODERS, OP_HEALTH, BoardHealth, ControlChannel
+
+
+@pytest.fixture
+def dummy_board():
+    """Board-side control server replying on localhost with a given function."""
+
+    class DummyBoard:
+        """Echo server replying to each request with ``reply_func(request)``."""
+
+        def __init__(self):
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.socket.bind(("127.0.0.1", 0))
+            self.socket.settimeout(0.05)
+            self.addr = self.socket.getsockname()
+            self.reply_func = None
+            self.requests = []
+            self.running = True
+            self.thread = threading.Thread(target=self.serve)
+            self.thread.start()
+
+        def serve(self):
+            """Reply to requests until stopped."""
+            while self.running:
+                try:
+                    data, addr = self.socket.recvfrom(1024)
+                except socket.timeout:
+                    continue
+                request = np.frombuffer(data)
+                self.requests.append(request)
+                for reply in self.reply_func(request):
+                    self.socket.sendto(np.asarray(reply, float).tobytes(), addr)
+
+        def stop(self):
+            """Stop the server thread."""
+            self.running = False
+            self.thread.join()
+            self.socket.close()
+
+    board = DummyBoard()
+    yield board
+    board.stop()
+
+
+def test_health(dummy_board):
+    """Request a heartbeat from the board."""
+
+    payload = [100.0, 1.5, 0.0008, 3, 45.0]
+    dummy_board.reply_func = lambda req: [list(req[:2]) + payload]
+
+    channel = ControlChannel("127.0.0.1", dummy_board.addr)
+    channel.open()
+    health = channel.health()
+    channel.close()
+
+    assert isinstance(health, BoardHealth)
+    assert health.board_time == payload[0]
+    assert health.sim_time == payload[1]
+    assert health.step_time == payload[2]
+    assert health.queue_depth == payload[3]
+    assert health.temperature == payload[4]
+    assert 0 <= health.latency < 1
+    assert 0 <= health.age < 1
+    assert np.all(dummy_board.requests[0] == [OP_HEALTH, 1])
+
+
+def test_health_no_temperature(dummy_board):
+    """Boards without a temperature sensor omit it from the reply."""
+
+    dummy_board.reply_func = lambda req: [list(req[:2]) + [100.0, 1.5, 0.001, 0]]
+
+    channel = ControlChannel("127.0.0.1", dummy_board.addr)
+    channel.open()
+    assert np.isnan(channel.health().temperature)
+    channel.close()
+
+
+def test_stale_replies(dummy_board):
+    """Replies to other requests are discarded."""
+
+    def reply_func(req):
+        """Reply to an older request, then to the actual request."""
+        return [[req[0], req[1] - 1, -1], [req[0] + 1, req[1], -2], [*req[:2], 5]]
+
+    dummy_board.reply_func = reply_func
+
+    channel = ControlChannel("127.0.0.1", dummy_board.addr)
+    channel.open()
+    assert channel.request(OP_HEALTH, 2.0) == [5]
+    assert np.all(dummy_board.requests[0] == [OP_HEALTH, 1, 2.0])
+    channel.close()
+
+
+def test_timeout(dummy_board):
+    """Requests without a reply time out."""
+
+    dummy_board.reply_func = lambda req: []
+
+    channel = ControlChannel("127.0.0.1", dummy_board.addr, timeout=0.05)
+    channel.open()
+    start = time.monotonic()
+    with pytest.raises(socket.timeout):
+        channel.health()
+    assert time.monotonic() - start < 1
+    channel.close()
+    channel.close()  # Closing twice is fine
+
+
+def test_request_array(dummy_board):
+    """Arrays are reassembled from chunks, lost chunks are requested again."""
+
+    array = np.arange(10.0)
+    chunk_size = 3
+    n_chunks = 4
+    lost = {1}
+
+    def reply_func(req):
+        """Reply with all chunks (or the requested one), losing chunk 1 once."""
+        indices = range(n_chunks) if len(req) == 2 else [int(req[2])]
+        replies = []
+        for i in indices:
+            if i in lost:
+                lost.remove(i)
+                continue
+            offset = i * chunk_size
+            values = array[offset : offset + chunk_size]
+            replies.append([*req[:2], i, n_chunks, offset, *values])
+        return replies[::-1]
+
+    dummy_board.reply_func = reply_func
+
+    channel = ControlChannel("127.0.0.1", dummy_board.addr, timeout=0.1)
+    channel.open()
+    assert np.all(channel.request_array(OP_DECODERS, len(array)) == array)
+    assert len(dummy_board.requests) == 2
+    assert np.all(dummy_board.requests[1] == [OP_DECODERS, 2, 1])
+
+    # Too many values
+    with pytest.raises(RuntimeError, match="expected 5"):
+        channel.request_array(OP_DECODERS, 5)
+
+    # No reply at all
+    dummy_board.reply_func = lambda req: []
+    with pytest.raises(socket.timeout, match="0 of None"):
+        channel.request_array(OP_DECODERS, len(array), max_retries=1)
+    channel.close()
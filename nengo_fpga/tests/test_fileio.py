@@ -0,0 +1,173 @@
+"""Tests for the argument and checkpoint file formats."""
+import io
+
+import numpy as np
+import pytest
+
+from nengo_fpga.utils import fileio
+
+
+def make_arg_data():
+    """Argument data with a mix of scalars, strings and (empty) arrays."""
+    return {
+        "sim_args": {"dt": 0.001},
+        "ens_args": {
+            "n_neurons": 3,
+            "neuron_type": "RectifiedLinear",
+            "bias": np.arange(3, dtype=np.float32),
+            "scaled_encoders": np.arange(6.0).reshape(3, 2),
+        },
+        "conn_args": {"weights": np.ones((2, 3))[:, ::2]},  # Not contiguous
+        "recur_args": {"weights": np.zeros((0, 3))},
+    }
+
+
+def check_arg_data(arg_data):
+    """Check the contents of data read back from ``make_arg_data``."""
+    # Scalars keep their shape (``==`` would broadcast 1-element arrays)
+    for value in (
+        arg_data["sim_args"]["dt"],
+        arg_data["ens_args"]["n_neurons"],
+        arg_data["ens_args"]["neuron_type"],
+    ):
+        assert value.shape == ()
+    assert arg_data["sim_args"]["dt"].item() == 0.001
+    assert arg_data["ens_args"]["n_neurons"].item() == 3
+    assert str(arg_data["ens_args"]["neuron_type"]) == "RectifiedLinear"
+    assert arg_data["ens_args"]["bias"].dtype == np.float32
+    assert np.all(arg_data["ens_args"]["bias"] == np.arange(3))
+    assert np.all(
+        arg_data["ens_args"]["scaled_encoders"] == np.arange(6.0).reshape(3, 2)
+    )
+    assert np.all(arg_data["conn_args"]["weights"] == np.ones((2, 2)))
+    assert arg_data["recur_args"]["weights"].shape == (0, 3)
+
+
+def test_arg_data_roundtrip(tmp_path):
+    """Argument data can be read back from file objects and memory maps."""
+
+    f = io.BytesIO()
+    fileio.write_arg_data(f, make_arg_data())
+    f.seek(0)
+    arg_data = fileio.read_arg_data(f)
+    check_arg_data(arg_data)
+    arg_data["ens_args"]["bias"][0] = 5  # Arrays are writable
+
+    filename = tmp_path / "args.bin"
+    filename.write_bytes(f.getvalue())
+    check_arg_data(fileio.read_arg_data(str(filename)))
+
+    arg_data = fileio.read_arg_data(filename, mmap_mode="r")
+    check_arg_data(arg_data)
+    assert isinstance(arg_data["conn_args"]["weights"].base, np.memmap)
+
+    # Arrays are aligned in the file
+    header_size = fileio._PREAMBLE.unpack(f.getvalue()[:16])[2]
+    assert (16 + header_size) % fileio.ARG_ALIGNMENT == 0
+    for args in arg_data.values():
+        for value in args.values():
+            assert value.ctypes.data % fileio.ARG_ALIGNMENT == 0
+
+
+def test_arg_data_errors():
+    """Invalid argument data and files are rejected."""
+
+    with pytest.raises(ValueError, match="object arrays"):
+        fileio.write_arg_data(io.BytesIO(), {"ens_args": {"x": [None, 1]}})
+
+    f = io.BytesIO()
+    fileio.write_arg_data(f, make_arg_data())
+    data = f.getvalue()
+
+    with pytest.raises(ValueError, match="truncated"):
+        fileio.read_arg_data(io.BytesIO(data[:8]))
+    with pytest.raises(ValueError, match="truncated"):
+        fileio.read_arg_data(io.BytesIO(data[:-64]))
+    with pytest.raises(ValueError, match="Not a nengo-fpga argument file"):
+        fileio.read_arg_data(io.BytesIO(b"x" * 8 + data[8:]))
+
+    newer = fileio._PREAMBLE.pack(
+        fileio.ARG_MAGIC, fileio.ARG_VERSION + 1, len(data) - 16
+    )
+    with pytest.raises(ValueError, match="newer than supported"):
+        fileio.read_arg_data(io.BytesIO(newer + data[16:]))
+
+    with pytest.raises(ValueError, match="unknown codec"):
+        fileio.read_arg_data(io.BytesIO(data.replace(b'"none"', b'"zzzz"', 1)))
+
+
+@pytest.mark.parametrize("codec", ["zlib", "zlib:1", "lz4", "zstd:5"])
+def test_arg_data_codecs(codec):
+    """Compressed argument data can be read back."""
+
+    if codec.startswith(("lz4", "zstd")):
+        pytest.importorskip({"lz4": "lz4.frame", "zstd": "zstandard"}[codec[:4]])
+
+    arg_data = make_arg_data()
+    arg_data["conn_args"]["zeros"] = np.zeros((100, 100))
+    arg_data["conn_args"]["noise"] = np.random.RandomState(0).uniform(size=100)
+
+    f = io.BytesIO()
+    fileio.write_arg_data(f, arg_data, codec=codec)
+    f.seek(0)
+    read_data = fileio.read_arg_data(f)
+    check_arg_data(read_data)
+    assert np.all(read_data["conn_args"]["zeros"] == 0)
+    assert np.all(read_data["conn_args"]["noise"] == arg_data["conn_args"]["noise"])
+    assert len(f.getvalue()) < 100 * 100 * 8
+
+    # Records that do not compress are stored uncompressed
+    header = f.getvalue().decode("latin1")
+    assert '"codec": "none", "size": 800' in header
+
+
+def test_get_compressor(mocker):
+    """Test parsing codec specifications and falling back to zlib."""
+
+    fileio.get_compressor.cache_clear()
+    assert fileio.get_compressor("none") == ("none", None)
+    assert fileio.get_compressor(" ZLIB:9 ")[0] == "zlib"
+
+    with pytest.raises(ValueError, match="Unknown codec"):
+        fileio.get_compressor("bz2")
+    with pytest.raises(ValueError, match="Invalid compression level"):
+        fileio.get_compressor("zlib:max")
+
+    mocker.patch.object(fileio, "_import_codec", side_effect=ImportError("lz4"))
+    warning_mock = mocker.patch.object(fileio.logger, "warning")
+    assert fileio.get_compressor("lz4:1")[0] == "zlib"
+    warning_mock.assert_called_once()
+    fileio.get_compressor.cache_clear()
+
+    # Records compressed with a codec that is not installed cannot be read
+    mocker.patch.object(
+        fileio, "_import_codec", side_effect=ImportError(name="zstandard")
+    )
+    data = io.BytesIO()
+    fileio.write_arg_data(data, {"args": {"x": np.zeros(100)}}, codec="zlib")
+    data = data.getvalue().replace(b'"zlib"', b'"zstd"')
+    with pytest.raises(ValueError, match="requires the zstandard package"):
+        fileio.read_arg_data(io.BytesIO(data))
+    fileio.get_compressor.cache_clear()
+
+
+def test_digest_arg_data():
+    """The digest only depends on the contents of the argument data."""
+
+    digest = fileio.digest_arg_data(make_arg_data())
+    assert fileio.digest_arg_data(make_arg_data()) == digest
+
+    arg_data = make_arg_data()
+    arg_data["sim_args"]["dt"] = 0.002
+    assert fileio.digest_arg_data(arg_data) != digest
+
+    arg_data = make_arg_data()
+    arg_data["ens_args"]["bias"] = arg_data["ens_args"]["bias"].astype(np.float64)
+    assert fileio.digest_arg_data(arg_data) != digest
+
+    arg_data = make_arg_data()
+    arg_data["sim_args"]["dt"] = [0.001]
+    assert fileio.digest_arg_data(arg_data) != digest
+
+    with pytest.raises(ValueError, match="object arrays"):
+        fileio.digest_arg_data({"ens_args": {"x": [None, 1]}})
@@ -1,11 +1,18 @@
 """Tests for the ID extraction process."""
+import csv
+import json
 import os
 import socket
+import threading
+import time
 
+import paramiko
 import pytest
 
 from nengo_fpga import fpga_config, id_extractor
 from nengo_fpga.id_extractor import IDExtractor
+from nengo_fpga.utils.id_cache import IDCache
+from nengo_fpga.utils.ssh import key_fingerprint
 
 
 def test_script(mocker):
@@ -26,7 +33,8 @@ def test_script(mocker):
 
     id_extractor.run()
 
-    main_mock.assert_called_with(args[1])
+    main_mock.assert_called_with(args[1], cache=mocker.ANY, refresh=False)
+    assert isinstance(main_mock.call_args[1]["cache"], IDCache)
 
 
 def test_missing_arg(mocker):
@@ -80,6 +88,214 @@ def test_main(mocker):
     os.remove(id_file)
 
 
+def test_script_scan(config_contents, gen_configs, tmp_path, mocker):
+    """Test the ID script run as __main__ on several boards."""
+
+    fname = os.path.join(os.getcwd(), "test-config")
+    config_contents["other-fpga"] = dict(config_contents["test-fpga"])
+    gen_configs.create_config(fname, contents=config_contents)
+    fpga_config.reload_config(fname)
+
+    mocker.patch.object(id_extractor, "__name__", "__main__")
+    main_mock = mocker.patch.object(id_extractor, "main")
+    scan_mock = mocker.patch.object(
+        id_extractor, "scan_main", return_value=[{"error": None}]
+    )
+
+    output = str(tmp_path / "ids.json")
+    mocker.patch("sys.argv", ["id_extractor.py", "--all", "--output", output])
+    id_extractor.run()
+    scan_mock.assert_called_once_with(
+        ["test-fpga", "other-fpga"], output, cache=mocker.ANY, refresh=False
+    )
+
+    mocker.patch(
+        "sys.argv", ["id_extractor.py", "other-fpga", "test-fpga", "--refresh"]
+    )
+    id_extractor.run()
+    scan_mock.assert_called_with(
+        ["other-fpga", "test-fpga"], "id_inventory.csv", cache=mocker.ANY, refresh=True
+    )
+    main_mock.assert_not_called()
+
+    # Failed scans and unknown boards are reported by the exit status
+    scan_mock.return_value = [{"error": "Could not connect"}]
+    with pytest.raises(SystemExit, match="1"):
+        id_extractor.run()
+    mocker.patch("sys.argv", ["id_extractor.py", "test-fpga", "not-a-board"])
+    with pytest.raises(SystemExit, match="1"):
+        id_extractor.run()
+    assert scan_mock.call_count == 3
+
+
+def test_board_names(config_contents, gen_configs):
+    """Pools and the host are not scanned."""
+
+    fname = os.path.join(os.getcwd(), "test-config")
+    config_contents["pool:lab"] = {"boards": "test-fpga"}
+    gen_configs.create_config(fname, contents=config_contents)
+    fpga_config.reload_config(fname)
+
+    assert id_extractor.board_names() == ["test-fpga"]
+
+
+def test_scan_board(dummy_extractor, mocker):
+    """Test extracting the ID of one board into an inventory record."""
+
+    mocker.patch.object(IDExtractor, "connect")
+    cleanup_mock = mocker.patch.object(IDExtractor, "cleanup")
+
+    def recv_id(self):
+        self.id_int = 0x0123456789ABCDEF
+
+    mocker.patch.object(IDExtractor, "recv_id", recv_id)
+    record = id_extractor.scan_board("test-fpga")
+    assert record["fpga_name"] == "test-fpga"
+    assert record["ip"] == "5.6.7.8"
+    assert record["id"] == "0X0123456789ABCDEF"
+    assert record["cached"] is False
+    assert record["error"] is None
+    assert record["time"] >= 0
+    cleanup_mock.assert_called_once()
+
+    mocker.patch.object(IDExtractor, "recv_id", side_effect=RuntimeError("no board"))
+    record = id_extractor.scan_board("test-fpga")
+    assert record["id"] is None
+    assert record["error"] == "no board"
+    assert cleanup_mock.call_count == 2
+
+
+def test_scan(config_contents, gen_configs, mocker):
+    """Boards are scanned concurrently, unless they use the same port."""
+
+    fname = os.path.join(os.getcwd(), "test-config")
+    for name in ("a", "b", "c"):
+        config_contents[name] = dict(config_contents["test-fpga"])
+    config_contents["b"]["udp_port"] = config_contents["c"]["udp_port"] = "20000"
+    gen_configs.create_config(fname, contents=config_contents)
+    fpga_config.reload_config(fname)
+
+    running = set()
+    overlaps = []
+    lock = threading.Lock()
+
+    def scan_board(fpga_name, cache, refresh):  # pylint: disable=unused-argument
+        with lock:
+            overlaps.append((fpga_name, set(running)))
+            running.add(fpga_name)
+        time.sleep(0.05)
+        with lock:
+            running.remove(fpga_name)
+        return {"fpga_name": fpga_name}
+
+    mocker.patch.object(id_extractor, "scan_board", scan_board)
+
+    records = id_extractor.scan(["c", "a", "test-fpga", "b"])
+    assert [record["fpga_name"] for record in records] == ["c", "a", "test-fpga", "b"]
+
+    # Boards sharing port 20000 never ran at the same time
+    for fpga_name, others in overlaps:
+        if fpga_name in ("b", "c"):
+            assert not {"b", "c"} & others
+    assert max(len(others) for _, others in overlaps) > 0
+
+
+def test_write_inventory(tmp_path):
+    """Inventories are written as CSV or JSON."""
+
+    records = [
+        {
+            "fpga_name": "a",
+            "ip": "1.2.3.4",
+            "id": "0X01",
+            "cached": True,
+            "time": 0.5,
+            "error": None,
+        },
+        {
+            "fpga_name": "b",
+            "ip": "1.2.3.5",
+            "id": None,
+            "cached": None,
+            "time": 25.0,
+            "error": "x",
+        },
+    ]
+
+    filename = str(tmp_path / "ids.json")
+    id_extractor.write_inventory(records, filename)
+    with open(filename, encoding="utf-8") as file:
+        assert json.load(file) == records
+
+    filename = str(tmp_path / "ids.csv")
+    id_extractor.write_inventory(records, filename)
+    with open(filename, encoding="utf-8", newline="") as file:
+        rows = list(csv.DictReader(file))
+    assert rows[0] == {
+        "fpga_name": "a",
+        "ip": "1.2.3.4",
+        "id": "0X01",
+        "cached": "True",
+        "time": "0.5",
+        "error": "",
+    }
+    assert rows[1]["error"] == "x"
+
+
+def test_extract_id(dummy_extractor, tmp_path, mocker):
+    """Known boards are answered from the cache while their host key is unchanged."""
+
+    cache = IDCache(str(tmp_path / "ids.json"))
+    mocker.patch.object(IDExtractor, "connect")
+    mocker.patch.object(IDExtractor, "cleanup")
+
+    def recv_id(self):
+        self.id_int = 0x1234
+        self.host_key_type = "ssh-ed25519"
+        self.host_key_fingerprint = "SHA256:a"
+
+    recv_mock = mocker.patch.object(IDExtractor, "recv_id", autospec=True)
+    recv_mock.side_effect = recv_id
+    fetch_mock = mocker.patch.object(
+        id_extractor, "fetch_host_fingerprint", return_value=("ssh-ed25519", "SHA256:a")
+    )
+
+    # Unknown boards are not identified before extracting their ID
+    assert id_extractor.extract_id("test-fpga", cache=cache) == (0x1234, False)
+    fetch_mock.assert_not_called()
+    assert cache.load()["5.6.7.8"]["key_type"] == "ssh-ed25519"
+    assert cache.load()["5.6.7.8"]["fingerprint"] == "SHA256:a"
+
+    # Known boards are identified by their host key of the recorded type
+    assert id_extractor.extract_id("test-fpga", cache=cache) == (0x1234, True)
+    fetch_mock.assert_called_once_with(
+        "5.6.7.8", "1", key_type="ssh-ed25519", timeout=5
+    )
+    assert recv_mock.call_count == 1
+
+    # Refreshing extracts the ID again
+    assert id_extractor.extract_id("test-fpga", cache=cache, refresh=True)[1] is False
+    assert recv_mock.call_count == 2
+
+    # A replaced board (with a new host key, or no key of the recorded type) is
+    # identified again
+    fetch_mock.return_value = ("ssh-ed25519", "SHA256:b")
+    assert id_extractor.cached_id("test-fpga", cache) is None
+    assert cache.load() == {}
+    assert id_extractor.extract_id("test-fpga", cache=cache)[1] is False
+    assert recv_mock.call_count == 3
+
+    fetch_mock.side_effect = paramiko.SSHException("no acceptable host key")
+    assert id_extractor.cached_id("test-fpga", cache) is None
+    assert cache.load() == {}
+
+    # Unreachable boards are not answered from the cache
+    cache.put("5.6.7.8", "ssh-ed25519", "SHA256:a", 0x1234)
+    fetch_mock.side_effect = OSError("unreachable")
+    assert id_extractor.cached_id("test-fpga", cache) is None
+    assert "5.6.7.8" in cache.load()
+
+
 def test_driver_no_config():
     """Test the ID extractor given an invalid fpga name."""
 
@@ -91,7 +307,7 @@ def test_driver_init(dummy_extractor):
     """Check a few token values on our dummy extractor init."""
     assert dummy_extractor.ssh_info_str == ""
     assert dummy_extractor.config_found
-    assert dummy_extractor.tcp_port > 0
+    assert dummy_extractor.tcp_port == 23456  # The bound port
 
 
 def test_cleanup(dummy_extractor, dummy_com, mocker):
@@ -164,7 +380,7 @@ def test_connect_ssh_client(ssh_method, config_contents, gen_configs, mocker):
         )
 
 
-def test_connect_thread_func(dummy_extractor, dummy_com, config_contents, mocker):
+def test_connect_thread_func(dummy_extractor, config_contents, mocker):
     """
     Test the IDExtractor's connect_thread_func function.
 
@@ -173,50 +389,61 @@ def test_connect_thread_func(dummy_extractor, dummy_com, config_contents, mocker
 
     # Don't use ssh connections
     ssh_client_mock = mocker.patch.object(dummy_extractor, "connect_ssh_client")
-
-    dummy_channel = dummy_com()
-    mocker.patch.object(
-        dummy_extractor.ssh_client, "invoke_shell", return_value=dummy_channel
+    transport_mock = mocker.patch.object(dummy_extractor.ssh_client, "get_transport")
+    transport_mock.return_value.host_key_type = "ssh-ed25519"
+    server_key = transport_mock.return_value.get_remote_server_key.return_value
+    server_key.asbytes.return_value = b"host key"
+
+    dummy_channel = mocker.Mock()
+    dummy_channel.recv_exit_status.return_value = 0
+    exec_mock = mocker.patch(
+        "nengo_fpga.id_extractor.exec_remote", return_value=(dummy_channel, 0.25)
     )
-    chan_send_mock = mocker.patch.object(dummy_channel, "send")
-    chan_recv_mock = mocker.patch.object(dummy_channel, "recv")
-    chan_close_mock = mocker.patch.object(dummy_channel, "close")
 
     # Mock some other class functions
-    process_mock = mocker.patch.object(dummy_extractor, "process_ssh_output")
     check_str_mock = mocker.patch.object(dummy_extractor, "check_ssh_str")
 
     # Test working case
-    # First pass we get input, then recv nothing to break on second pass
-    recv_list = ["something", ""]
-    chan_recv_mock.side_effect = recv_list
+    # First pass we get output, then recv nothing to break on second pass
+    dummy_channel.recv.side_effect = [b"something\n", b""]
     check_str_mock.return_value = (0, [])
-    dummy_extractor.ssh_info_str = "something\n"
 
     dummy_extractor.connect_thread_func()
 
     ssh_client_mock.assert_called_once_with(
         config_contents["test-fpga"]["ssh_user"], config_contents["test-fpga"]["ip"]
     )
-    chan_send_mock.assert_has_calls(
-        [mocker.call("sudo su\n"), mocker.call(dummy_extractor.ssh_string)]
+    exec_mock.assert_called_once_with(
+        dummy_extractor.ssh_client,
+        f"sudo -n {dummy_extractor.ssh_string}",
+        combine_stderr=True,
+    )
+    assert dummy_extractor.host_key_type == "ssh-ed25519"
+    assert dummy_extractor.host_key_fingerprint == key_fingerprint(server_key)
+    assert dummy_channel.recv.call_count == 2
+    dummy_channel.recv_stderr.assert_not_called()  # Combined with stdout
+    dummy_channel.close.assert_called_once()
+    dummy_channel.close.reset_mock()
+    check_str_mock.assert_called_once_with(
+        "something", [], 0, config_contents["test-fpga"]["ip"]
     )
-    assert chan_recv_mock.call_count == len(recv_list)
-    chan_close_mock.assert_called_once()
-    chan_close_mock.reset_mock()
-    process_mock.assert_called_once()
-    check_str_mock.assert_called_once()
 
-    # Test recv fatal error
+    # Test recv fatal error (on the standard error, combined with stdout)
     check_str_mock.return_value = (2, [])
-    recv_list = ["something", "another thing"]
-    chan_recv_mock.side_effect = recv_list
-    dummy_extractor.ssh_info_str = "something\n"
+    dummy_channel.recv.side_effect = [b"Traceback\n", b"another thing"]
 
-    with pytest.raises(RuntimeError):
+    with pytest.raises(RuntimeError, match="Received the following error"):
         dummy_extractor.connect_thread_func()
 
-    chan_close_mock.assert_called_once()
+    dummy_channel.close.assert_called_once()
+
+    # Test non-zero exit status
+    check_str_mock.return_value = (0, [])
+    dummy_channel.recv.side_effect = [b"sudo: a password is required\n", b""]
+    dummy_channel.recv_exit_status.return_value = 1
+
+    with pytest.raises(RuntimeError, match="exited with status 1"):
+        dummy_extractor.connect_thread_func()
 
 
 def test_connect(dummy_extractor, mocker):
@@ -239,13 +466,11 @@ def test_process_ssh_output(dummy_extractor):
     Almost identical to test in "test_networks"
     """
 
-    # Create a test string using carraige returns that should be replaced
-    strs = ["First", "Second", "Third", "Fourth", "Fifth"]
-    input_str = "{}\r\n{}\r\r{}\r{}\n{}".format(*strs)
-
-    dummy_extractor.process_ssh_output(input_str.encode("latin1"))
+    # Output of the exec channel is not mangled by a terminal
+    strs = ["First", "Second", "Third"]
+    dummy_extractor.process_ssh_output("First\nSec".encode("latin1"))
+    dummy_extractor.process_ssh_output("ond\nThird".encode("latin1"))
 
-    # New lines should all be '\n', so we should get our strs list back
     assert dummy_extractor.ssh_info_str.split("\n") == strs
 
 
@@ -308,7 +533,7 @@ def test_ssh_string(dummy_extractor, config_contents):
     assert args[2].split("=")[0] == "--host_ip"
     assert args[2].split("=")[1] == f"\"{config_contents['host']['ip']}\""
     assert args[3].split("=")[0] == "--tcp_port"
-    assert args[3].split("=")[1] == f"{dummy_extractor.tcp_port}\n"
+    assert args[3].split("=")[1] == f"{dummy_extractor.tcp_port}"
 
     # Test default case
     dummy_extractor.config_found = False
@@ -0,0 +1,49 @@
+"""Tests for the device ID cache."""
+import os
+import time
+
+from nengo_fpga.utils.id_cache import IDCache
+
+
+def test_id_cache(tmp_path):
+    """IDs are cached per IP and dropped when the host key changes."""
+
+    path = str(tmp_path / "cache" / "ids.json")
+    cache = IDCache(path)
+    assert cache.load() == {}
+    assert cache.get("1.2.3.4", "ssh-ed25519", "SHA256:a") is None
+
+    cache.put("1.2.3.4", "ssh-ed25519", "SHA256:a", 0x1234)
+    cache.put("1.2.3.5", "ssh-ed25519", "SHA256:b", 0x5678)
+
+    # Shared with other instances (and processes)
+    other = IDCache(path)
+    assert other.get("1.2.3.4", "ssh-ed25519", "SHA256:a") == 0x1234
+    assert other.get("1.2.3.5", "ssh-ed25519", "SHA256:b") == 0x5678
+
+    # Hits do not rewrite the cache
+    mtime = os.stat(path).st_mtime_ns
+    time.sleep(0.01)
+    assert cache.get("1.2.3.4", "ssh-ed25519", "SHA256:a") == 0x1234
+    assert os.stat(path).st_mtime_ns == mtime
+
+    # A new host key (or a key of another type) invalidates the entry
+    assert cache.get("1.2.3.5", "rsa-sha2-512", "SHA256:b") is None
+    assert cache.get("1.2.3.4", "ssh-ed25519", "SHA256:c") is None
+    assert cache.get("1.2.3.4", "ssh-ed25519", "SHA256:a") is None
+    assert cache.load() == {}
+
+    cache.clear()
+    assert cache.load() == {}
+
+
+def test_id_cache_corrupt(tmp_path):
+    """Unreadable caches are treated as empty."""
+
+    path = tmp_path / "ids.json"
+    path.write_text("not json")
+    cache = IDCache(str(path))
+    assert cache.get("1.2.3.4", "ssh-ed25519", "SHA256:a") is None
+
+    cache.put("1.2.3.4", "ssh-ed25519", "SHA256:a", 1)
+    assert cache.get("1.2.3.4", "ssh-ed25519", "SHA256:a") == 1
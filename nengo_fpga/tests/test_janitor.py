@@ -0,0 +1,86 @@
+"""Tests for the eviction of stale data files."""
+import os
+import time
+
+import pytest
+
+from nengo_fpga.utils import janitor
+
+HOUR = 3600
+
+
+def test_select_evictions():
+    """Files are evicted by age, then least recently modified first."""
+
+    now = 1e6
+    files = [
+        ("old", 10, now - 10 * HOUR),
+        ("recent", 10, now - 0.5 * HOUR),
+        ("a", 10, now - 3 * HOUR),
+        ("b", 10, now - 2 * HOUR),
+    ]
+
+    assert janitor.select_evictions(files, max_age=5 * HOUR, now=now) == ["old"]
+    assert janitor.select_evictions(files, max_age=5 * HOUR, max_size=20, now=now) == [
+        "old",
+        "a",
+    ]
+
+    # Recent files are never evicted
+    assert janitor.select_evictions(files, max_age=0, max_size=0, now=now) == [
+        "old",
+        "a",
+        "b",
+    ]
+
+
+def test_clean_local_dir(tmp_path):
+    """Only stale data files are removed."""
+
+    assert janitor.clean_local_dir(str(tmp_path / "missing")) == []
+
+    now = time.time()
+    for name, age in [("fpen_old.npz", 10), ("fpen_new.npz", 0), ("old.npz", 10)]:
+        path = tmp_path / name
+        path.write_bytes(b"0")
+        os.utime(path, (now - age * 86400, now - age * 86400))
+    (tmp_path / "fpen_dir").mkdir()
+
+    assert janitor.clean_local_dir(str(tmp_path)) == ["fpen_old.npz"]
+    assert sorted(os.listdir(tmp_path)) == ["fpen_dir", "fpen_new.npz", "old.npz"]
+
+
+def test_clean_remote_dir(mocker):
+    """Stale data files are removed through SFTP."""
+
+    now = time.time()
+
+    def attr(name, mtime, mode=0o100644):
+        """SFTP attributes of a file."""
+        return mocker.Mock(filename=name, st_size=1, st_mtime=mtime, st_mode=mode)
+
+    sftp_client = mocker.Mock()
+    sftp_client.listdir_attr.return_value = [
+        attr("fpen_old.bin", now - 30 * 86400),
+        attr("fpen_gone.bin", now - 30 * 86400),
+        attr("fpen_new.bin", now),
+        attr("other.bin", now - 30 * 86400),
+        attr("fpen_dir", now - 30 * 86400, mode=0o040755),
+    ]
+
+    def remove(path):
+        """Pretend another host already removed some files."""
+        if path.endswith("gone.bin"):
+            raise FileNotFoundError(path)
+
+    sftp_client.remove.side_effect = remove
+
+    assert janitor.clean_remote_dir(sftp_client, "/tmp") == [
+        "fpen_old.bin",
+        "fpen_gone.bin",
+    ]
+    sftp_client.listdir_attr.assert_called_once_with("/tmp")
+
+    sftp_client.listdir_attr.side_effect = PermissionError
+    with pytest.raises(PermissionError):
+        janitor.clean_remote_dir(sftp_client, "/tmp")
@@ -0,0 +1,67 @@
+"""Tests for the jitter buffer."""
+import numpy as np
+
+from nengo_fpga.utils.jitter import JitterBuffer
+
+
+def test_interpolation():
+    """Samples are interpolated at the delayed time."""
+
+    buffer = JitterBuffer(1, delay=0.1)
+    assert np.all(buffer.sample(0.0) == 0)  # Nothing received yet
+
+    buffer.push(0.0, [0.0])
+    assert np.allclose(buffer.sample(0.0), 0.0)  # Before the first sample
+    assert buffer.offset == 0
+
+    buffer.push(0.2, [2.0])
+    buffer.push(0.4, [6.0])
+    assert np.allclose(buffer.sample(0.2), 1.0)
+    assert np.allclose(buffer.sample(0.4), 4.0)
+    assert len(buffer) == 2  # Older samples are dropped once sampled past
+    assert buffer.n_underruns == 0
+
+    # Hold the last sample while waiting for the board
+    assert np.allclose(buffer.sample(0.6), 6.0)
+    assert buffer.n_underruns == 1
+
+
+def test_clock_offset():
+    """The board clock is aligned with the host time on the first sample."""
+
+    buffer = JitterBuffer(1, delay=0.1)
+
+    # The board started 5s earlier, and sent several samples before the host
+    # sampled the buffer
+    buffer.push(5.0, [0.0])
+    buffer.push(5.2, [2.0])
+    assert np.allclose(buffer.sample(0.2), 1.0)  # 0.1s behind the latest sample
+    assert np.isclose(buffer.offset, -5.0)
+
+    buffer.push(5.4, [6.0])
+    assert np.allclose(buffer.sample(0.4), 4.0)
+    assert buffer.n_underruns == 0
+
+    buffer.clear()
+    assert buffer.offset is None
+
+
+def test_late_and_full():
+    """Out of order samples are dropped, the buffer is bounded."""
+
+    buffer = JitterBuffer(2, maxlen=4)
+
+    buffer.push(1.0, [1, 1])
+    buffer.push(0.5, [0, 0])
+    buffer.push(1.0, [0, 0])
+    assert buffer.n_late == 2
+    assert len(buffer) == 1
+
+    for t in range(2, 6):
+        buffer.push(float(t), [t, t])
+    assert len(buffer) == 3
+    assert np.all(buffer.times[:3] == [3, 4, 5])
+
+    buffer.clear()
+    assert len(buffer) == 0
+    assert buffer.n_late == 0
@@ -0,0 +1,160 @@
+"""Tests for the board leases."""
+import asyncio
+import json
+import os
+import threading
+
+import pytest
+
+from nengo_fpga import fpga_config, lease
+from nengo_fpga.lease import FileLeases, LeaseBroker, LeaseClient
+from nengo_fpga.session import SessionManager
+
+pytestmark = pytest.mark.skipif(
+    lease.fcntl is None, reason="Unix sockets and file locks are not available"
+)
+
+
+def test_broker(tmp_path):
+    """Leases are granted in order, and end on release, timeout or expiry."""
+
+    path = str(tmp_path / "leases.sock")
+
+    async def status():
+        """Status of the broker."""
+        reader, writer = await asyncio.open_unix_connection(path)
+        writer.write(b'{"op": "status"}\n')
+        reply = json.loads(await reader.readline())
+        writer.close()
+        return reply
+
+    async def run():
+        broker = LeaseBroker(path)
+        await broker.start()
+        client = LeaseClient(path)
+
+        lease_a = await client.acquire(["a"])
+        lease_b = await client.acquire(["a", "b"])
+        assert (lease_a.board, lease_b.board) == ("a", "b")
+        assert await client.acquire(["a", "b"], timeout=0) is None
+        assert await client.acquire(["a"], timeout=0.01) is None
+
+        # Waiting clients are served in order
+        first = asyncio.ensure_future(client.acquire(["a"]))
+        second = asyncio.ensure_future(client.acquire(["a", "b"]))
+        await asyncio.sleep(0.05)
+        assert [w["boards"] for w in (await status())["waiting"]] == [
+            ["a"],
+            ["a", "b"],
+        ]
+        lease_a.release()
+        assert (await first).board == "a"
+        assert not second.done()
+        lease_b.release()
+        assert (await second).board == "b"
+        assert sorted((await status())["leases"]) == ["a", "b"]
+
+        # Clients that stop waiting (or exit) release their leases
+        second.result().release()
+        await asyncio.sleep(0.05)
+        assert sorted((await status())["leases"]) == ["a"]
+        assert (await status())["waiting"] == []
+
+        # Leases expire after their time-to-live
+        lease_c = await LeaseClient(path, ttl=0.05).acquire(["c"])
+        assert "c" in (await status())["leases"]
+        await asyncio.sleep(0.1)
+        assert "c" not in (await status())["leases"]
+        lease_c.release()
+
+        # Invalid requests are reported
+        reader, writer = await asyncio.open_unix_connection(path)
+        writer.write(b'{"op": "acquire", "boards": []}\n')
+        assert "Invalid request" in json.loads(await reader.readline())["error"]
+        writer.close()
+
+        await broker.close()
+        assert not os.path.exists(path)
+
+    asyncio.run(run())
+
+
+def test_broker_release_thread(tmp_path):
+    """Broker leases can be released from other threads."""
+
+    path = str(tmp_path / "leases.sock")
+    manager = SessionManager()
+    broker = LeaseBroker(path)
+    manager.run(broker.start())
+    try:
+        client = LeaseClient(path)
+        lease_a = manager.run(client.acquire(["a"]))
+        thread = threading.Thread(target=lease_a.release)
+        thread.start()
+        thread.join()
+        assert manager.run(client.acquire(["a"], timeout=1)).board == "a"
+
+        # The status is shown by the command line interface
+        lease.main(["--socket", path, "--status"])
+    finally:
+        manager.run(broker.close())
+        manager.close()
+
+
+def test_file_leases(tmp_path):
+    """File leases lock boards, even between networks of the same process."""
+
+    leases = FileLeases(str(tmp_path / "locks"), poll_interval=0.01)
+    lease_a = leases.try_acquire("a")
+    assert lease_a.board == "a"
+    assert leases.try_acquire("a") is None
+
+    lease_b = asyncio.run(leases.acquire(["a", "b"]))
+    assert lease_b.board == "b"
+    assert asyncio.run(leases.acquire(["a", "b"], timeout=0.05)) is None
+
+    lease_a.release()
+    lease_a.release()  # Releasing twice is fine
+    assert asyncio.run(leases.acquire(["a", "b"], timeout=0)).board == "a"
+    lease_b.release()
+
+    # The directory is shared with the group, and lock files of other users
+    # (that cannot be written) can still be locked
+    assert os.stat(leases.path).st_mode & 0o7777 == 0o2775
+    os.chmod(os.path.join(leases.path, "b.lock"), 0o444)
+    leases.try_acquire("b").release()
+
+
+@pytest.mark.xdist_group(name="fpga_config")
+def test_lease_manager(config_contents, gen_configs, tmp_path, mocker):
+    """Test selecting the lease manager from the config."""
+
+    fname = os.path.join(os.getcwd(), "test-config")
+    sock_path = tmp_path / "leases.sock"
+
+    def manager(**host):
+        """Lease manager with the given host options."""
+        config_contents["host"].update(host, lease_socket=str(sock_path))
+        gen_configs.create_config(fname, contents=config_contents)
+        fpga_config.reload_config(fname)
+        return lease.lease_manager()
+
+    assert manager(leases="none") is None
+    assert isinstance(manager(leases="file"), FileLeases)
+    assert manager(leases="file").path == lease.LEASE_DIR
+    assert manager(leases="file", lease_dir=str(tmp_path)).path == str(tmp_path)
+    assert isinstance(manager(leases="auto"), FileLeases)  # No broker running
+    with pytest.raises(ValueError, match="Unknown lease mode"):
+        manager(leases="always")
+
+    client = manager(leases="broker", lease_ttl="60")
+    assert isinstance(client, LeaseClient)
+    assert client.fallback is None and client.ttl == 60
+
+    # If a stale socket is found, file locks are used instead
+    sock_path.touch()
+    client = manager(leases="auto")
+    assert isinstance(client.fallback, FileLeases)
+    fallback_mock = mocker.patch.object(client.fallback, "acquire")
+    asyncio.run(client.acquire(["a"], timeout=1))
+    fallback_mock.assert_called_once_with(["a"], timeout=1)
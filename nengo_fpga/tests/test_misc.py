@@ -1,9 +1,13 @@
 """Tests for some misc incidental functions."""
+import os
+import subprocess
+import sys
 from importlib import reload
 
 import nengo
 import pytest
 
+import nengo_fpga
 from nengo_fpga.utils import paths
 
 
@@ -22,3 +26,52 @@ def test_windows_path(mocker):
     reload(paths)
 
     assert paths.config_dir.endswith(".nengo")
+
+
+def test_lazy_import(tmp_path):
+    """Importing nengo_fpga does not import paramiko nor read the config files."""
+
+    # A project config file (in the working directory) that would be read
+    (tmp_path / "fpga_config").write_text("[host]\nip = 1.2.3.4\n")
+
+    code = """
+import os
+import sys
+
+import nengo
+
+# Record the files opened from now on
+opened = []
+sys.addaudithook(
+    lambda event, args: opened.append(str(args[0])) if event == "open" else None
+)
+
+def config_read():
+    return any(os.path.basename(path) == "fpga_config" for path in opened)
+
+import nengo_fpga
+
+assert "paramiko" not in sys.modules
+assert not config_read()
+
+# Building a model simulated without a board does not need paramiko either
+with nengo.Network():
+    nengo_fpga.networks.FpgaPesEnsembleNetwork("not-a-board", 10, 1, 1e-4)
+assert config_read()
+assert "paramiko" not in sys.modules
+"""
+    # Run from the directory of the config file, importing this nengo_fpga
+    root = os.path.dirname(os.path.dirname(nengo_fpga.__file__))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [root] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else [])
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=False,
+        cwd=str(tmp_path),
+        env=env,
+    )
+    assert result.returncode == 0, result.stderr
@@ -1,19 +1,40 @@
 """Tests for the FPGA network classes."""
+import concurrent.futures
+import io
 import os
 import socket
+import threading
+import time
 
 import nengo
 import numpy as np
 import pytest
+from nengo.builder.operator import SimPyFunc
 from nengo.solvers import NoSolver
 
+import nengo_fpga
 from nengo_fpga import fpga_config
-from nengo_fpga.networks import FpgaPesEnsembleNetwork
+from nengo_fpga.control import BoardHealth
+from nengo_fpga.networks import (
+    FpgaPesEnsembleNetwork,
+    ShardedFpgaPesEnsembleNetwork,
+    fpga_pes_ensemble_network,
+)
 from nengo_fpga.networks.fpga_pes_ensemble_network import (
     extract_and_save_params,
+    offline_comm_func,
+    realtime_comm_func,
+    touch_remote_file,
     udp_comm_func,
+    upload_file,
     validate_net,
 )
+from nengo_fpga.pool import BoardBusyError
+from nengo_fpga.reconnect import ReconnectPolicy
+from nengo_fpga.session import SessionManager
+from nengo_fpga.telemetry import Telemetry, TelemetryStream
+from nengo_fpga.utils.fileio import digest_arg_data, read_arg_data
+from nengo_fpga.utils.jitter import JitterBuffer
 
 
 @pytest.mark.xdist_group(name="fpga_config")
@@ -66,7 +87,7 @@ def test_init(config_contents, gen_configs, mocker):
     nengo_net_spy.assert_called_once_with(dummy_net, label, seed, None)
     assert dummy_net.connect_timeout == socket_args["connect_timeout"]
     assert dummy_net.recv_timeout == socket_args["recv_timeout"]
-    assert dummy_net.udp_port > 0
+    assert dummy_net.udp_port == 0  # Free port bound when connecting
     assert dummy_net.send_addr[0] == config_contents[fpga_name]["ip"]
 
     assert dummy_net.input.size_in == dims_in
@@ -118,6 +139,80 @@ def test_init(config_contents, gen_configs, mocker):
     assert hasattr(dummy_net, "connection")
 
 
+@pytest.mark.xdist_group(name="fpga_config")
+def test_arg_codec(config_contents, gen_configs):
+    """The parameter upload codec is read from the config."""
+
+    fname = os.path.join(os.getcwd(), "test-config")
+    fpga_name = list(config_contents.keys())[1]
+
+    gen_configs.create_config(fname, contents=config_contents)
+    fpga_config.reload_config(fname)
+    assert FpgaPesEnsembleNetwork(fpga_name, 10, 1, 0.001).arg_codec == "none"
+
+    config_contents[fpga_name]["arg_codec"] = "zlib:1"
+    gen_configs.create_config(fname, contents=config_contents)
+    fpga_config.reload_config(fname)
+    dummy_net = FpgaPesEnsembleNetwork(fpga_name, 10, 1, 0.001)
+    assert dummy_net.arg_codec == "zlib:1"
+
+    dummy_net.arg_data = {"conn_args": {"weights": np.zeros((1, 10))}}
+    f = io.BytesIO()
+    dummy_net.write_arg_data(f)
+    assert b'"codec": "zlib"' in f.getvalue()
+
+    config_contents[fpga_name]["arg_codec"] = "rar"
+    gen_configs.create_config(fname, contents=config_contents)
+    fpga_config.reload_config(fname)
+    with pytest.raises(nengo.exceptions.ValidationError, match="Unknown codec"):
+        FpgaPesEnsembleNetwork(fpga_name, 10, 1, 0.001)
+
+
+@pytest.mark.xdist_group(name="fpga_config")
+def test_open_udp_socket(config_contents, gen_configs, mocker):
+    """The ports are bound (in the configured range) before starting the board."""
+
+    fname = os.path.join(os.getcwd(), "test-config")
+    fpga_name = list(config_contents.keys())[1]
+    config_contents["host"]["ip"] = "127.0.0.1"
+    config_contents[fpga_name]["port_range"] = "20000-20100"
+    gen_configs.create_config(fname, contents=config_contents)
+    fpga_config.reload_config(fname)
+
+    dummy_net = FpgaPesEnsembleNetwork(
+        fpga_name, 10, 1, 0.001, telemetry=Telemetry(), label="ports"
+    )
+    assert dummy_net.port_range == (20000, 20100)
+
+    allocate_spy = mocker.spy(fpga_pes_ensemble_network, "allocate_ports")
+    dummy_net.telemetry_stream = TelemetryStream(dummy_net.telemetry, 10, 1)
+    dummy_net.recv_buffer[0] = 5.0  # Stale packet of a previous connection
+    dummy_net.open_udp_socket()
+    try:
+        allocate_spy.assert_called_once_with(
+            "127.0.0.1", port=0, offsets=(0, 2), port_range=(20000, 20100)
+        )
+        assert 20000 <= dummy_net.udp_port <= 20098
+        assert dummy_net.udp_socket.getsockname()[1] == dummy_net.udp_port
+        assert dummy_net.telemetry_stream.socket.getsockname()[1] == (
+            dummy_net.telemetry_port
+        )
+        assert dummy_net.send_addr[1] == dummy_net.udp_port
+        assert dummy_net.control_addr[1] == dummy_net.udp_port + 1
+        assert f"--udp_port={dummy_net.udp_port}" in dummy_net.ssh_string
+        assert dummy_net.port_attempts == allocate_spy.spy_return.attempts - 1
+        assert np.all(dummy_net.recv_buffer == 0)
+    finally:
+        dummy_net.udp_socket.close()
+        dummy_net.telemetry_stream.close()
+
+    config_contents[fpga_name]["port_range"] = "20000"
+    gen_configs.create_config(fname, contents=config_contents)
+    fpga_config.reload_config(fname)
+    with pytest.raises(nengo.exceptions.ValidationError, match="port range"):
+        FpgaPesEnsembleNetwork(fpga_name, 10, 1, 0.001)
+
+
 @pytest.mark.xdist_group(name="fpga_config")
 def test_init_default(config_contents, gen_configs, mocker):
     """Test the FPGA network's init function."""
@@ -152,7 +247,7 @@ def test_init_default(config_contents, gen_configs, mocker):
     nengo_net_spy.assert_called_once_with(dummy_net, None, None, None)
     assert dummy_net.connect_timeout == 30
     assert dummy_net.recv_timeout == 0.1
-    assert dummy_net.udp_port > 0
+    assert dummy_net.udp_port == 0  # Free port bound when connecting
     assert dummy_net.send_addr[0] == config_contents[fpga_name]["ip"]
 
     assert dummy_net.input.size_in == dims_in
@@ -198,16 +293,15 @@ def test_output_dim(dummy_net, mocker):
 
 
 def test_data_filepath(dummy_net, mocker):
-    """Test local_data_filepath property."""
+    """Test local_results_filepath property."""
 
     # Arbitrary file path
     path = "path"
-    fname = "file.txt"
-
     dummy_net.arg_data_path = path
-    dummy_net.arg_data_file = fname
 
-    assert dummy_net.local_data_filepath == os.path.join(path, fname)
+    assert dummy_net.local_results_filepath == os.path.join(
+        path, f"fpen_results_{dummy_net.uid}.npz"
+    )
 
 
 @pytest.mark.xdist_group(name="fpga_config")
@@ -241,8 +335,6 @@ def test_close(dummy_net, dummy_com, mocker):
 
     terminate_mock.assert_not_called()
     ssh_close_mock.assert_not_called()
-    assert dummy_net.send_buffer is None
-    assert dummy_net.recv_buffer is None
 
     # Test no UDP socket
     dummy_net.config_found = True
@@ -250,13 +342,10 @@ def test_close(dummy_net, dummy_com, mocker):
 
     terminate_mock.assert_not_called()
     ssh_close_mock.assert_called_once()
-    assert np.all(dummy_net.send_buffer == 0)
-    assert np.all(dummy_net.recv_buffer == 0)
 
     # Reset for full test
     ssh_close_mock.reset_mock()
-    dummy_net.send_buffer = None
-    dummy_net.recv_buffer = None
+    dummy_net.recv_buffer[1] = 3  # Last output from the board
 
     # Test full
     dummy_net.udp_socket = dummy_com()
@@ -268,8 +357,7 @@ def test_close(dummy_net, dummy_com, mocker):
     udp_close_mock.assert_called_once()
     ssh_close_mock.assert_called_once()
     assert dummy_net.udp_socket is None
-    assert np.all(dummy_net.send_buffer == 0)
-    assert np.all(dummy_net.recv_buffer == 0)
+    assert dummy_net.recv_buffer[1] == 3  # Kept to hold the output
 
 
 @pytest.mark.xdist_group(name="fpga_config")
@@ -344,9 +432,9 @@ def test_connect_ssh_client(
 
 
 @pytest.mark.xdist_group(name="fpga_config")
-def test_connect_thread_func(dummy_net, dummy_com, config_contents, mocker):
+def test_ssh_session(dummy_net, dummy_com, config_contents, mocker):
     """
-    Test the FPGA network's connect_thread_func.
+    Test the FPGA network's ssh_session coroutine.
 
     Similar to the test in "test_id"
     """
@@ -356,67 +444,254 @@ def test_connect_thread_func(dummy_net, dummy_com, config_contents, mocker):
 
     dummy_sftp = dummy_com()
     mocker.patch.object(dummy_net.ssh_client, "open_sftp", return_value=dummy_sftp)
-    ssh_put_mock = mocker.patch.object(dummy_sftp, "put")
+    ssh_put_mock = mocker.patch(
+        "nengo_fpga.networks.fpga_pes_ensemble_network.upload_file"
+    )
     ssh_close_mock = mocker.patch.object(dummy_sftp, "close")
+    touch_mock = mocker.patch(
+        "nengo_fpga.networks.fpga_pes_ensemble_network.touch_remote_file",
+        return_value=False,
+    )
+    clean_mock = mocker.patch.object(dummy_net, "clean_remote_tmp")
 
-    dummy_channel = dummy_com()
-    mocker.patch.object(
-        dummy_net.ssh_client, "invoke_shell", return_value=dummy_channel
+    dummy_channel = mocker.Mock()
+    dummy_channel.recv_exit_status.return_value = 0
+    exec_mock = mocker.patch(
+        "nengo_fpga.networks.fpga_pes_ensemble_network.exec_remote",
+        return_value=(dummy_channel, 0.25),
     )
-    chan_send_mock = mocker.patch.object(dummy_channel, "send")
-    chan_recv_mock = mocker.patch.object(dummy_channel, "recv")
-    chan_close_mock = mocker.patch.object(dummy_channel, "close")
 
     # Mock some other class functions
     process_mock = mocker.patch.object(dummy_net, "process_ssh_output")
     check_str_mock = mocker.patch.object(dummy_net, "check_ssh_str")
     net_close_mock = mocker.patch.object(dummy_net, "close")
 
+    dummy_net.session_manager = SessionManager()
+
     # Test no config condition returns immediately
     dummy_net.config_found = False
-    dummy_net.connect_thread_func()
+    dummy_net.session_manager.run(dummy_net.ssh_session())
 
     ssh_client_mock.assert_not_called()
 
     # Test working case
     dummy_net.config_found = True
-    mocker.patch("os.path.exists", return_value=True)  # No real data file
+    dummy_net.arg_data = {}  # No real data
 
-    # First pass we get input, then recv nothing to break on second pass
-    recv_list = ["something", ""]
-    chan_recv_mock.side_effect = recv_list
+    # First pass we get output, then recv nothing to break on second pass
+    dummy_channel.recv.side_effect = [b"something", b""]
+    dummy_channel.recv_stderr.side_effect = [b""]
     check_str_mock.return_value = (0, [])
-    dummy_net.ssh_info_str = "something\n"
+    process_mock.return_value = ["something"]
 
-    dummy_net.connect_thread_func()
+    dummy_net.session_manager.run(dummy_net.ssh_session())
 
     ssh_client_mock.assert_called_once_with(
         config_contents["test-fpga"]["ssh_user"], config_contents["test-fpga"]["ip"]
     )
+    clean_mock.assert_called_once_with(dummy_sftp)
+    assert dummy_net.arg_data_file == f"fpen_args_{digest_arg_data({})[:16]}.bin"
     ssh_put_mock.assert_called_once_with(
-        dummy_net.local_data_filepath,
+        dummy_sftp,
         f"{config_contents['test-fpga']['remote_tmp']}/{dummy_net.arg_data_file}",
+        dummy_net.write_arg_data,
     )
     ssh_close_mock.assert_called_once()
-    chan_send_mock.assert_has_calls(
-        [mocker.call("sudo su\n"), mocker.call(dummy_net.ssh_string)]
+
+    # The script is run with sudo in the same command (non-root user)
+    exec_mock.assert_called_once_with(
+        dummy_net.ssh_client, f"sudo -n {dummy_net.ssh_string}"
     )
-    assert chan_recv_mock.call_count == len(recv_list)
-    chan_close_mock.assert_called_once()
-    process_mock.assert_called_once()
+    assert dummy_net.launch_time == 0.25
+    assert dummy_channel.recv.call_count == 2
+    dummy_channel.close.assert_called_once()
+    process_mock.assert_called_once_with(b"something", stderr=False)
     check_str_mock.assert_called_once()
-    net_close_mock.assert_not_called()
+    dummy_channel.close.reset_mock()
 
-    # Test recv fatal error
+    # Test recv fatal error, the error is raised but the network is not closed
+    # from the event loop
     check_str_mock.return_value = (2, [])
-    recv_list = ["something", "another thing"]
-    chan_recv_mock.side_effect = recv_list
-    dummy_net.ssh_info_str = "something\n"
+    dummy_channel.recv.side_effect = [b"something", b"another thing"]
+    dummy_channel.recv_stderr.side_effect = [b""]
 
-    with pytest.raises(RuntimeError):
-        dummy_net.connect_thread_func()
+    with pytest.raises(RuntimeError, match="Received the following error"):
+        dummy_net.session_manager.run(dummy_net.ssh_session())
 
-    net_close_mock.assert_called_once()
+    dummy_channel.close.assert_called_once()
+    net_close_mock.assert_not_called()
+
+    # Errors on the standard error are also detected
+    dummy_channel.recv.side_effect = [b""]
+    dummy_channel.recv_stderr.side_effect = [b"Traceback"]
+    with pytest.raises(RuntimeError, match="Received the following error"):
+        dummy_net.session_manager.run(dummy_net.ssh_session())
+    process_mock.assert_called_with(b"Traceback", stderr=True)
+
+    # Non-zero exit statuses are raised with the end of the standard error
+    check_str_mock.return_value = (0, [])
+    process_mock.return_value = ["sudo: a password is required"]
+    dummy_channel.recv.side_effect = [b""]
+    dummy_channel.recv_stderr.side_effect = [b"sudo: a password is required\n", b""]
+    dummy_channel.recv_exit_status.return_value = 1
+    with pytest.raises(RuntimeError, match="exited with status 1:\nsudo: a password"):
+        dummy_net.session_manager.run(dummy_net.ssh_session())
+    dummy_channel.recv_exit_status.return_value = 0
+
+    # Argument files already on the board are not uploaded again
+    touch_mock.return_value = True
+    ssh_put_mock.reset_mock()
+    dummy_channel.recv.side_effect = [b""]
+    dummy_channel.recv_stderr.side_effect = [b""]
+    dummy_net.session_manager.run(dummy_net.ssh_session())
+    ssh_put_mock.assert_not_called()
+    touch_mock.return_value = False
+
+    # Offline sessions also upload the trajectory
+    dummy_net.mode = "offline"
+    ssh_put_mock.reset_mock()
+    dummy_channel.recv.side_effect = [b""]
+    dummy_channel.recv_stderr.side_effect = [b""]
+    dummy_net.session_manager.run(dummy_net.ssh_session())
+
+    ssh_put_mock.assert_called_with(
+        dummy_sftp, dummy_net.remote_filepath("traj"), dummy_net.write_trajectory
+    )
+    assert ssh_put_mock.call_count == 2
+    dummy_net.session_manager.close()
+
+
+@pytest.mark.xdist_group(name="fpga_config")
+def test_ssh_session_worker(dummy_net, dummy_com, config_contents, mocker):
+    """Test running the model on a persistent board-side worker."""
+
+    ssh_client_mock = mocker.patch.object(dummy_net, "connect_ssh_client")
+    upload_mock = mocker.patch(
+        "nengo_fpga.networks.fpga_pes_ensemble_network.upload_file"
+    )
+    mocker.patch(
+        "nengo_fpga.networks.fpga_pes_ensemble_network.touch_remote_file",
+        return_value=False,
+    )
+    mocker.patch.object(dummy_net, "clean_remote_tmp")
+    check_str_mock = mocker.patch.object(
+        dummy_net, "check_ssh_str", return_value=(0, [])
+    )
+
+    class FakeWorker:
+        """Worker answering each run with the given events (from a thread)."""
+
+        def __init__(self):
+            self.ssh_client = mocker.Mock()
+            self.ssh_client.open_sftp.return_value = dummy_com()
+            self.runs = []
+            self.events = []
+            self.forgotten = []
+
+        def submit(self, args, listener):
+            self.runs.append(args)
+            threading.Thread(
+                target=lambda: [listener(*event) for event in self.events]
+            ).start()
+            return len(self.runs)
+
+        def forget(self, run_id):
+            self.forgotten.append(run_id)
+
+    worker = FakeWorker()
+    get_worker_mock = mocker.patch(
+        "nengo_fpga.networks.fpga_pes_ensemble_network.get_worker",
+        return_value=worker,
+    )
+
+    dummy_net.config_found = True
+    dummy_net.use_worker = True
+    dummy_net.arg_data = {}
+    dummy_net.session_manager = SessionManager()
+
+    # The run ends when the worker is done with it
+    worker.events = [("log", b"hello\n"), ("done", None)]
+    dummy_net.session_manager.run(dummy_net.ssh_session())
+
+    get_worker_mock.assert_called_once_with(dummy_net.fpga_name, dummy_net.start_worker)
+    ssh_client_mock.assert_not_called()
+    upload_mock.assert_called_once()
+    worker.ssh_client.open_sftp.assert_called_once()
+    assert dummy_net.transfer_client is worker.ssh_client
+    assert worker.runs == [dummy_net.remote_args]
+    assert worker.runs[0]["arg_data_file"] == (
+        f"{config_contents['test-fpga']['remote_tmp']}/{dummy_net.arg_data_file}"
+    )
+    check_str_mock.assert_called_once_with(
+        "hello", [], 0, config_contents["test-fpga"]["ip"]
+    )
+    assert worker.forgotten == [1]
+
+    # Remote errors and worker exits are raised
+    worker.events = [("error", "ValueError: oops")]
+    with pytest.raises(RuntimeError, match="ValueError: oops"):
+        dummy_net.session_manager.run(dummy_net.ssh_session())
+    worker.events = [("exit", None)]
+    with pytest.raises(RuntimeError, match="worker on FPGA board .* exited"):
+        dummy_net.session_manager.run(dummy_net.ssh_session())
+    assert worker.forgotten == [1, 2, 3]
+
+    # Closing the network keeps the worker running
+    dummy_net.close()
+    assert dummy_net.worker is None
+    worker.ssh_client.close.assert_not_called()
+    dummy_net.session_manager.close()
+
+
+@pytest.mark.xdist_group(name="fpga_config")
+def test_start_worker(dummy_net, config_contents, mocker):
+    """Test starting the board-side worker of a network."""
+
+    connect_mock = mocker.patch.object(dummy_net, "connect_ssh_client")
+    start_mock = mocker.patch("nengo_fpga.worker.RemoteWorker.start")
+
+    worker = dummy_net.start_worker()
+
+    assert connect_mock.call_args[0] == (
+        config_contents["test-fpga"]["ssh_user"],
+        config_contents["test-fpga"]["ip"],
+    )
+    assert connect_mock.call_args[1]["ssh_client"] is worker.ssh_client
+    assert worker.ssh_client is not dummy_net.ssh_client
+    assert worker.command == (
+        f"sudo -n python {config_contents['test-fpga']['remote_script']} --worker"
+    )
+    start_mock.assert_called_once_with(timeout=30.0)
+
+    # Workers are not started if they cannot be reached
+    connect_mock.side_effect = OSError("unreachable")
+    with pytest.raises(OSError, match="unreachable"):
+        dummy_net.start_worker()
+    assert start_mock.call_count == 1
+
+
+def test_check_ssh_session(dummy_net):
+    """Test the FPGA network's check_ssh_session function."""
+
+    # No session
+    dummy_net.check_ssh_session()
+
+    # Running or cancelled sessions do not raise
+    dummy_net.ssh_future = concurrent.futures.Future()
+    dummy_net.check_ssh_session()
+    dummy_net.ssh_future.cancel()
+    dummy_net.check_ssh_session()
+
+    # Sessions that finished without error do not raise
+    dummy_net.ssh_future = concurrent.futures.Future()
+    dummy_net.ssh_future.set_result(None)
+    dummy_net.check_ssh_session()
+
+    # Errors are raised
+    dummy_net.ssh_future = concurrent.futures.Future()
+    dummy_net.ssh_future.set_exception(RuntimeError("remote error"))
+    with pytest.raises(RuntimeError, match="remote error"):
+        dummy_net.check_ssh_session()
 
 
 @pytest.mark.xdist_group(name="fpga_config")
@@ -428,98 +703,149 @@ def test_connect(dummy_net, mocker):
     dummy_net.connect()
 
     assert dummy_net.udp_socket is None
+    assert dummy_net.session_manager is None
 
     # Setup for full test
     dummy_net.config_found = True
-    close_mock = mocker.patch.object(dummy_net, "close")
+    dummy_net.close()
+    close_spy = mocker.spy(dummy_net, "close")
 
-    # Don't actually create and start a thread
-    thread_mock = mocker.patch("threading.Thread")
+    # Don't actually run the ssh session
+    ssh_mock = mocker.patch.object(dummy_net, "ssh_session")
 
     # Don't use sockets
     mocker.patch("socket.socket.bind")
-
-    # Test Attribute error
-    recv_mock = mocker.patch("socket.socket.recv_into", side_effect=AttributeError())
-    with pytest.raises(SystemExit):
+    mocker.patch("socket.socket.getsockname", return_value=("1.2.3.4", 23456))
+    recv_mock = mocker.patch("socket.socket.recv_into")
+
+    # Test error in the ssh session
+    def recv_func_timeout(data):
+        """Dummy recv_into function that times out."""
+        time.sleep(0.001)
+        raise socket.timeout()
+
+    ssh_mock.side_effect = RuntimeError("remote error")
+    recv_mock.side_effect = recv_func_timeout
+    with pytest.raises(RuntimeError, match="remote error"):
         dummy_net.connect()
 
-    recv_mock.assert_called_once()
-    thread_mock.assert_called_once_with(target=dummy_net.connect_thread_func, args=())
+    ssh_mock.assert_called_once()
+    close_spy.assert_called_once()
+    assert dummy_net.session_manager is None  # Private session manager closed
+    assert dummy_net.udp_socket is None
+    ssh_mock.side_effect = None
     mocker.resetall()
 
     # Test socket timeout
+    dummy_net.connect_timeout = 1
     recv_mock.side_effect = socket.timeout()
-    with pytest.raises(RuntimeError):
+    with pytest.raises(RuntimeError, match="Did not receive connection"):
         dummy_net.connect()
 
-    close_mock.assert_called_once()
+    close_spy.assert_called_once()
     assert recv_mock.call_count == int(
         dummy_net.connect_timeout / dummy_net.recv_timeout
     )
-    thread_mock.assert_called_once_with(target=dummy_net.connect_thread_func, args=())
     mocker.resetall()
 
-    # Test receive -1 kill signal
-    dummy_net.recv_buffer = np.zeros(1)  # Init buffer
+    # Test termination signals
+    reasons = {
+        -1: "Simulation terminated",  # No specific reason
+        -11: "Unable to acquire FPGA resource lock!",
+        -21: "Unable to load FPGA driver!",
+    }
+    for signal, reason in reasons.items():
+
+        def recv_func(data, signal=signal):
+            """Dummy recv_into function to update recv buffer."""
+            data[0] = signal
+
+        recv_mock.side_effect = recv_func
+        with pytest.raises(RuntimeError) as e:
+            dummy_net.connect()
+
+        assert str(e.value).startswith(reason)
+        assert isinstance(e.value, BoardBusyError) == (signal == -11)
+        close_spy.assert_called_once()
+        recv_mock.assert_called_once()
+        ssh_mock.assert_called_once()
+        mocker.resetall()
 
-    def recv_func_kill(data):
+    # Test normal working condition
+    def recv_func_normal(data):
         """Dummy recv_into function to update recv buffer."""
-        data[0] = -1  # Return -1 kill signal
+        data[0] = 0  # Return valid data
 
-    recv_mock.side_effect = recv_func_kill
-    with pytest.raises(RuntimeError) as e:
-        dummy_net.connect()
+    recv_mock.side_effect = recv_func_normal
 
-    assert str(e.value).startswith("Simulation terminated")  # No specific reason
-    close_mock.assert_called_once()
-    recv_mock.assert_called_once()
-    thread_mock.assert_called_once_with(target=dummy_net.connect_thread_func, args=())
-    # start_mock.assert_called_once()
-    mocker.resetall()
+    dummy_net.connect()
 
-    # Test receive -11 unavailable resource lock signal
-    def recv_func_lock(data):
-        """Dummy recv_into function to update recv buffer."""
-        data[0] = -11  # Return -1 kill signal
+    close_spy.assert_not_called()
+    ssh_mock.assert_called_once()
+    assert dummy_net.udp_socket is not None
+    assert dummy_net.udp_port == 23456  # The port bound is sent to the board
+    assert dummy_net.session_manager.running
 
-    recv_mock.side_effect = recv_func_lock
-    with pytest.raises(RuntimeError) as e:
-        dummy_net.connect()
+    dummy_net.close()
+    assert dummy_net.session_manager is None
 
-    assert str(e.value).startswith("Unable to acquire FPGA resource lock!")
-    close_mock.assert_called_once()
-    recv_mock.assert_called_once()
-    thread_mock.assert_called_once_with(target=dummy_net.connect_thread_func, args=())
-    # start_mock.assert_called_once()
-    mocker.resetall()
 
-    # Test receive -21 driver failure signal
-    def recv_func_driver(data):
-        """Dummy recv_into function to update recv buffer."""
-        data[0] = -21  # Return -1 kill signal
+def test_upload_file(mocker):
+    """Files are streamed to the board through a pipelined SFTP handle."""
 
-    recv_mock.side_effect = recv_func_driver
-    with pytest.raises(RuntimeError) as e:
-        dummy_net.connect()
+    sftp_client = mocker.MagicMock()
+    f = sftp_client.open.return_value.__enter__.return_value
+    write = mocker.Mock()
 
-    assert str(e.value).startswith("Unable to load FPGA driver!")
-    close_mock.assert_called_once()
-    recv_mock.assert_called_once()
-    thread_mock.assert_called_once_with(target=dummy_net.connect_thread_func, args=())
-    # start_mock.assert_called_once()
-    mocker.resetall()
+    upload_file(sftp_client, "/remote/file", write)
 
-    # Test normal working condition
-    def recv_func_normal(data):
-        """Dummy recv_into function to update recv buffer."""
-        data[0] = 0  # Return valid data
+    # The file is written under a temporary name, then renamed
+    tmp_path = sftp_client.open.call_args[0][0]
+    assert tmp_path.startswith("/remote/file.") and tmp_path.endswith(".part")
+    sftp_client.open.assert_called_once_with(tmp_path, "wb")
+    f.set_pipelined.assert_called_once_with(True)
+    write.assert_called_once_with(f)
+    sftp_client.posix_rename.assert_called_once_with(tmp_path, "/remote/file")
+    sftp_client.remove.assert_not_called()
 
-    recv_mock.side_effect = recv_func_normal
+    # Interrupted uploads are removed
+    write.side_effect = KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        upload_file(sftp_client, "/remote/file", write)
+    sftp_client.remove.assert_called_once_with(sftp_client.open.call_args[0][0])
 
-    dummy_net.connect()
 
-    close_mock.assert_not_called()
+def test_clean_remote_tmp(dummy_net, config_contents, mocker):
+    """The board's remote_tmp is cleaned with the configured limits."""
+
+    clean_mock = mocker.patch("nengo_fpga.utils.janitor.clean_remote_dir")
+    sftp_client = mocker.Mock()
+    dummy_net.clean_remote_tmp(sftp_client)
+    clean_mock.assert_called_once_with(
+        sftp_client,
+        config_contents["test-fpga"]["remote_tmp"],
+        max_age=7 * 86400,
+        max_size=2**30,
+    )
+
+    # Failures are only logged
+    clean_mock.side_effect = PermissionError
+    warning_mock = mocker.patch(
+        "nengo_fpga.networks.fpga_pes_ensemble_network.logger.warning"
+    )
+    dummy_net.clean_remote_tmp(sftp_client)
+    warning_mock.assert_called_once()
+
+
+def test_touch_remote_file(mocker):
+    """Existing files are touched, missing files are reported."""
+
+    sftp_client = mocker.Mock()
+    assert touch_remote_file(sftp_client, "/remote/file")
+    sftp_client.utime.assert_called_once_with("/remote/file", None)
+
+    sftp_client.utime.side_effect = FileNotFoundError
+    assert not touch_remote_file(sftp_client, "/remote/file")
 
 
 def test_process_ssh_output(dummy_net):
@@ -533,10 +859,13 @@ def test_process_ssh_output(dummy_net):
     strs = ["First", "Second", "Third", "Fourth", "Fifth"]
     input_str = "{}\r\n{}\r\r{}\r{}\n{}".format(*strs)
 
-    dummy_net.process_ssh_output(input_str.encode("latin1"))
+    # The last line is not complete until a newline is received
+    lines = dummy_net.process_ssh_output(input_str.encode("latin1"))
+    assert lines == strs[:-1]
+    assert dummy_net.process_ssh_output(b"\r\n") == strs[-1:]
 
-    # New lines should all be '\n', so we should get our strs list back
-    assert dummy_net.ssh_info_str.split("\n") == strs
+    # Received lines are kept in the remote log
+    assert dummy_net.remote_log.tail() == strs
 
 
 def test_check_ssh_str(dummy_net):
@@ -582,6 +911,136 @@ def test_check_ssh_str(dummy_net):
         assert error_strs[-1] == s
 
 
+@pytest.mark.xdist_group(name="fpga_config")
+def test_monitor_health(dummy_net, dummy_com, mocker):
+    """Test the FPGA network's heartbeat polling."""
+
+    health = BoardHealth(time.time(), 1, 2, 0.0005, 0, 40.0, 0.001)
+    polled = threading.Event()
+
+    def health_func():
+        """Dummy heartbeat, signal once all replies have been used."""
+        if len(replies) == 1:
+            polled.set()
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    replies = [health, socket.timeout(), socket.timeout(), health]
+    dummy_net.heartbeat_interval = 0.001
+    dummy_net.control_channel = dummy_com()
+    dummy_net.control_channel.health = health_func
+    dummy_net.session_manager = SessionManager()
+
+    future = dummy_net.session_manager.submit(dummy_net.monitor_health())
+    polled.wait()
+    dummy_net.session_manager.close()
+
+    assert future.cancelled()
+    assert dummy_net.health == health
+    assert list(dummy_net.health_history) == [health, health]
+    assert dummy_net.missed_heartbeats == 0
+
+
+def test_health_status(dummy_net, mocker):
+    """Test the FPGA network's health status."""
+
+    # Heartbeats disabled
+    assert dummy_net.health_status() is None
+
+    dummy_net.heartbeat_interval = 0.5
+    dummy_net.health_future = mocker.Mock()
+    assert dummy_net.health_status() == "no heartbeat received"
+
+    # Healthy board
+    dummy_net.health = BoardHealth(time.time(), 1, 2, 0.0005, 3, 40.0, 0.001)
+    assert dummy_net.health_status() is None
+    assert dummy_net.health_status(max_step_time=0.001, max_queue_depth=3) is None
+
+    # Degraded board
+    assert dummy_net.health_status(max_step_time=0.0001).startswith("step time")
+    assert dummy_net.health_status(max_queue_depth=2) == "queue depth 3"
+
+    dummy_net.health = dummy_net.health._replace(host_time=time.time() - 10)
+    dummy_net.missed_heartbeats = 4
+    assert dummy_net.health_status() == "no heartbeat for 10.00s (4 missed)"
+    assert dummy_net.health_status(max_age=20) is None
+
+
+@pytest.mark.xdist_group(name="fpga_config")
+def test_connect_cancel(dummy_net, mocker):
+    """Cancelling a connection stops waiting for the handshake."""
+
+    mocker.patch.object(dummy_net, "ssh_session")
+    mocker.patch("socket.socket.bind")
+    mocker.patch("socket.socket.getsockname", return_value=("1.2.3.4", 23456))
+
+    def recv_func_timeout(data):
+        """Dummy recv_into function that times out."""
+        time.sleep(0.01)
+        raise socket.timeout()
+
+    recv_mock = mocker.patch("socket.socket.recv_into", side_effect=recv_func_timeout)
+    dummy_net.connect_timeout = 30
+    session_manager = SessionManager()
+    dummy_net.session_manager = session_manager
+
+    def wait_for_recv():
+        """Wait for the handshake to be awaited."""
+        for _ in range(100):
+            if recv_mock.call_count > 0:
+                return
+            time.sleep(0.01)
+
+    # The waiting thread stops when the connection is cancelled
+    dummy_net.start_connect()
+    wait_for_recv()
+    dummy_net.connect_future.cancel()
+    time.sleep(0.1)
+    n_calls = recv_mock.call_count
+    time.sleep(0.1)
+    assert recv_mock.call_count == n_calls
+    dummy_net.connect_future = None
+    dummy_net.disconnect()
+
+    # ... and when the network is closed
+    recv_mock.reset_mock()
+    dummy_net.start_connect()
+    wait_for_recv()
+    start = time.monotonic()
+    dummy_net.close()
+    session_manager.close()  # Waits for the thread pool
+    assert time.monotonic() - start < 1
+
+
+def test_connect_heartbeat(dummy_net, mocker):
+    """Test that connecting starts the heartbeat monitor."""
+
+    dummy_net.heartbeat_interval = 0.1
+    dummy_net.control_enabled = True
+    dummy_net.close()
+    mocker.patch.object(dummy_net, "ssh_session")
+    mocker.patch.object(dummy_net, "open_udp_socket")
+    mocker.patch.object(dummy_net, "wait_for_handshake")
+    monitor_mock = mocker.patch.object(dummy_net, "monitor_health")
+    mocker.patch("socket.socket.bind")
+
+    dummy_net.connect()
+
+    monitor_mock.assert_called_once()
+    assert dummy_net.control_channel.board_addr == dummy_net.control_addr
+    assert dummy_net.control_addr[1] == dummy_net.udp_port + 1
+    assert dummy_net.control_channel.timeout == dummy_net.heartbeat_timeout
+    assert "--control_port" in dummy_net.ssh_string
+
+    # Closing stops the monitor
+    health_future = dummy_net.health_future
+    dummy_net.close()
+    assert health_future.done()
+    assert dummy_net.control_channel is None
+
+
 @pytest.mark.xdist_group(name="fpga_config")
 def test_reset(dummy_net, mocker):
     """Test the FPGA network's reset function."""
@@ -632,9 +1091,14 @@ def test_ssh_string(dummy_net, config_contents):
     assert args[5].split("=")[0] == "--arg_data_file"
     assert (
         args[5].split("=")[1]
-        == f"'{config_contents['test-fpga']['remote_tmp']}/{arg_fname}'\n"
+        == f"'{config_contents['test-fpga']['remote_tmp']}/{arg_fname}'"
     )
 
+    # Telemetry port
+    dummy_net.telemetry = Telemetry()
+    args = dummy_net.ssh_string.split(" ")
+    assert args[6] == f"--telemetry_port={dummy_net.udp_port + 2}"
+
     # Test default case
     dummy_net.config_found = False
     assert dummy_net.ssh_string == ""
@@ -777,38 +1241,38 @@ def test_save_params(config_contents, gen_configs, mocker):
 
     extract_and_save_params(model, dummy_net)
 
-    # Check we write file
-    assert os.path.isfile(dummy_net.local_data_filepath)
+    # Check contents (as streamed to the board)
+    f = io.BytesIO()
+    dummy_net.write_arg_data(f)
+    f.seek(0)
+    arg_data = read_arg_data(f)
+    sim = arg_data["sim_args"]
+    ens = arg_data["ens_args"]
+    conn = arg_data["conn_args"]
+    recur = arg_data["recur_args"]
 
-    # Check contents
-    arg_data = np.load(
-        dummy_net.local_data_filepath, encoding="latin1", allow_pickle=True
-    )
-    sim = arg_data["sim_args"].item()
-    ens = arg_data["ens_args"].item()
-    conn = arg_data["conn_args"].item()
-    recur = arg_data["recur_args"].item()
+    assert sim["dt"] == dt
 
-    # Use try/except so we still cleanup on failure
-    try:
-        assert sim["dt"] == dt
+    assert ens["input_dimensions"] == dims_in
+    assert ens["output_dimensions"] == dims_out
+    assert ens["n_neurons"] == n_neurons
+    assert np.all(ens["bias"] == bias_val)
+    assert np.all(ens["scaled_encoders"] == enc_val)
+    assert ens["neuron_type"] == neuron
 
-        assert ens["input_dimensions"] == dims_in
-        assert ens["output_dimensions"] == dims_out
-        assert ens["n_neurons"] == n_neurons
-        assert np.all(ens["bias"] == bias_val)
-        assert np.all(ens["scaled_encoders"] == enc_val)
-        assert ens["neuron_type"] == neuron
+    assert np.all(conn["weights"] == dec_val)
 
-        assert np.all(conn["weights"] == dec_val)
+    assert np.all(recur["weights"] == rec_val)
+    assert recur["tau"] == tau
 
-        assert np.all(recur["weights"] == rec_val)
-        assert recur["tau"] == tau
-    except AssertionError:
-        os.remove(dummy_net.local_data_filepath)
-        raise
+    # Initial decoders override the built decoders
+    dummy_net.initial_decoders = np.ones((dims_out, n_neurons)) * 5
+    extract_and_save_params(model, dummy_net)
+    assert np.all(dummy_net.arg_data["conn_args"]["weights"] == 5)
 
-    os.remove(dummy_net.local_data_filepath)
+    dummy_net.initial_decoders = np.ones((n_neurons, dims_out))
+    with pytest.raises(nengo.exceptions.BuildError, match="Initial decoders"):
+        extract_and_save_params(model, dummy_net)
 
 
 def test_udp_comm_func(dummy_net, dummy_com, mocker):
@@ -870,6 +1334,505 @@ def test_udp_comm_func(dummy_net, dummy_com, mocker):
     assert val == x
 
 
+def test_realtime_comm_func(dummy_net, dummy_com, mocker):
+    """Test SimPyFunc jitter-buffered udp implementation."""
+
+    dummy_net.udp_socket = dummy_com()
+    send_mock = mocker.patch.object(dummy_net.udp_socket, "sendto")
+    recv_mock = mocker.patch.object(dummy_net.udp_socket, "recv_into")
+    close_mock = mocker.patch.object(dummy_net, "close")
+
+    dummy_net.send_buffer = np.zeros(2)
+    dummy_net.recv_buffer = np.zeros(2)
+    dummy_net.jitter_buffer = JitterBuffer(1, delay=0)
+    dt = 0.001
+
+    # The board clock is aligned with the host time on the first packet
+    packets = [(0.011, 1.0)]
+
+    def recv_func(data):
+        """Dummy function returning the queued packets."""
+        if not packets:
+            raise BlockingIOError()
+        np.frombuffer(data)[:] = packets.pop(0)
+
+    recv_mock.side_effect = recv_func
+    assert np.allclose(realtime_comm_func(0.001, 5, dummy_net, dt), 1.0)
+    assert np.isclose(dummy_net.jitter_buffer.offset, -0.01)
+
+    # Two samples received since the last step
+    packets.extend([(0.012, 2.0), (0.014, 4.0)])
+    assert np.allclose(realtime_comm_func(0.003, 5, dummy_net, dt), 3.0)
+    assert send_mock.call_count == 2
+    assert np.all(dummy_net.send_buffer == (0.003, 5))
+
+    # Host ahead of the board, hold the last sample and check the SSH session
+    check_mock = mocker.patch.object(dummy_net, "check_ssh_session")
+    send_mock.side_effect = BlockingIOError()  # Dropped packets are fine
+    assert np.allclose(realtime_comm_func(0.005, 5, dummy_net, dt), 4.0)
+    check_mock.assert_called_once()
+
+    check_mock.side_effect = RuntimeError("remote error")
+    with pytest.raises(RuntimeError, match="remote error"):
+        realtime_comm_func(0.006, 5, dummy_net, dt)
+    close_mock.assert_called_once()
+
+    # Terminate packet
+    packets.append((-1, 0))
+    with pytest.raises(RuntimeError, match="terminated by FPGA"):
+        realtime_comm_func(0.007, 5, dummy_net, dt)
+
+    # Closed socket
+    dummy_net.udp_socket = None
+    with pytest.raises(RuntimeError, match="Lost connection"):
+        realtime_comm_func(0.008, 5, dummy_net, dt)
+
+
+def test_udp_comm_func_closed(dummy_net):
+    """Test SimPyFunc udp implementation with a closed connection."""
+
+    dummy_net.close()  # No udp socket
+
+    with pytest.raises(RuntimeError, match="Lost connection"):
+        udp_comm_func(1, 2, dummy_net, 0.001)
+
+
+def test_udp_comm_func_reconnect(dummy_net, dummy_com, mocker):
+    """Test SimPyFunc udp implementation while reconnecting."""
+
+    dummy_net.reconnect = ReconnectPolicy(loss_timeouts=2, max_hold_steps=5)
+    dummy_net.session_manager = SessionManager()
+    dummy_net.close()  # No udp socket
+    dummy_net.recv_buffer[1] = 3  # Last output from the board
+
+    reconnected = threading.Event()
+
+    async def reconnect_func():
+        """Dummy reconnection, waits until the test lets it complete."""
+        await dummy_net.session_manager.to_thread(reconnected.wait)
+
+    mocker.patch.object(dummy_net, "reconnect_async", side_effect=reconnect_func)
+
+    # Closed socket triggers the reconnection, the last output is held
+    dt = 0.001
+    assert udp_comm_func(1, 2, dummy_net, dt) == [3]
+    assert dummy_net.reconnect_future is not None
+    assert udp_comm_func(1 + dt, 2, dummy_net, dt) == [3]
+    assert dummy_net.hold_steps == 2
+
+    # Once reconnected, communicate with the board again
+    reconnected.set()
+    dummy_net.reconnect_future.result()
+    dummy_net.udp_socket = dummy_com()
+    send_mock = mocker.patch.object(dummy_net.udp_socket, "sendto")
+    recv_mock = mocker.patch.object(dummy_net.udp_socket, "recv_into")
+
+    def recv_func(data):
+        """Dummy function to update recv_into data."""
+        np.frombuffer(data)[:] = [1 + 2 * dt, 4]
+
+    recv_mock.side_effect = recv_func
+
+    assert udp_comm_func(1 + 2 * dt, 2, dummy_net, dt) == [4]
+    assert dummy_net.reconnect_future is None
+    send_mock.assert_called_once()
+
+    # Consecutive timeouts trigger another reconnection
+    reconnected.clear()
+    recv_mock.side_effect = socket.timeout()
+    assert udp_comm_func(1 + 3 * dt, 2, dummy_net, dt) == [4]
+    assert dummy_net.reconnect_future is None
+    assert udp_comm_func(1 + 4 * dt, 2, dummy_net, dt) == [4]
+    assert dummy_net.reconnect_future is not None
+
+    # Give up if the board takes too long to reconnect
+    with pytest.raises(RuntimeError, match="did not reconnect within 5 steps"):
+        for i in range(5):
+            udp_comm_func(1 + (5 + i) * dt, 2, dummy_net, dt)
+
+    assert dummy_net.reconnect_future is None
+    reconnected.set()
+    dummy_net.session_manager.close()
+
+
+def test_udp_comm_func_reconnect_ssh_error(dummy_net, dummy_com, mocker):
+    """Errors in the SSH session trigger a reconnection."""
+
+    dummy_net.reconnect = ReconnectPolicy(hold="zero")
+    dummy_net.session_manager = SessionManager()
+    dummy_net.close()
+    dummy_net.recv_buffer[1] = 3  # Last output from the board
+
+    dummy_net.udp_socket = dummy_com()
+    mocker.patch.object(dummy_net.udp_socket, "recv_into", side_effect=socket.timeout)
+    mocker.patch.object(
+        dummy_net, "check_ssh_session", side_effect=RuntimeError("remote")
+    )
+    reconnect_mock = mocker.patch.object(
+        dummy_net, "reconnect_async", side_effect=RuntimeError("no board")
+    )
+
+    assert udp_comm_func(1, 2, dummy_net, 0.001) == [0]
+    reconnect_mock.assert_called_once()
+
+    # Failed reconnection terminates the simulation
+    assert isinstance(dummy_net.reconnect_future.exception(), RuntimeError)
+    with pytest.raises(RuntimeError, match="Lost connection"):
+        udp_comm_func(1.001, 2, dummy_net, 0.001)
+
+    dummy_net.session_manager.close()
+
+
+@pytest.mark.xdist_group(name="fpga_config")
+def test_reconnect_async(dummy_net, mocker):
+    """Test the FPGA network's reconnection attempts."""
+
+    dummy_net.reconnect = ReconnectPolicy(max_attempts=3, backoff=0)
+    dummy_net.session_manager = SessionManager()
+
+    disconnect_mock = mocker.patch.object(dummy_net, "disconnect")
+    connect_mock = mocker.patch.object(dummy_net, "connect_async")
+
+    # Successful on the second attempt
+    connect_mock.side_effect = [RuntimeError("busy"), None]
+    dummy_net.session_manager.run(dummy_net.reconnect_async())
+
+    assert connect_mock.await_count == 2
+    assert disconnect_mock.call_count == 2
+    assert dummy_net.n_reconnects == 1
+
+    # All attempts fail
+    connect_mock.reset_mock()
+    disconnect_mock.reset_mock()
+    connect_mock.side_effect = RuntimeError("busy")
+    with pytest.raises(RuntimeError, match="Unable to reconnect"):
+        dummy_net.session_manager.run(dummy_net.reconnect_async())
+
+    assert connect_mock.await_count == 3
+    assert disconnect_mock.call_count == 4
+    assert dummy_net.n_reconnects == 1
+    dummy_net.session_manager.close()
+
+
+def test_reconnect_async_decoders(dummy_net, mocker, caplog):
+    """Reconnecting uploads the decoders last captured from the board."""
+
+    dummy_net.reconnect = ReconnectPolicy(backoff=0)
+    dummy_net.session_manager = SessionManager()
+    dummy_net.arg_data = {"conn_args": {"weights": np.zeros((1, 1))}}
+
+    mocker.patch.object(dummy_net, "disconnect")
+    mocker.patch.object(dummy_net, "connect_async")
+
+    # Nothing captured, the board restarts from its initial decoders
+    dummy_net.session_manager.run(dummy_net.reconnect_async())
+    assert "No decoders were captured" in caplog.text
+    assert np.all(dummy_net.current_arg_data()["conn_args"]["weights"] == 0)
+
+    # Older snapshots do not replace newer ones
+    dummy_net.record_decoders(np.ones((1, 1)), 0.5)
+    dummy_net.record_decoders(np.full((1, 1), 2.0), 0.2)
+    dummy_net.session_manager.run(dummy_net.reconnect_async())
+    dummy_net.session_manager.close()
+
+    assert np.all(dummy_net.current_arg_data()["conn_args"]["weights"] == 1)
+    assert np.all(dummy_net.arg_data["conn_args"]["weights"] == 0)  # Not modified
+
+    # The next (non-reconnection) run starts from the initial decoders
+    dummy_net.close()
+    assert dummy_net.decoder_snapshot is None
+    assert np.all(dummy_net.current_arg_data()["conn_args"]["weights"] == 0)
+
+
+def test_capture_decoders(dummy_net, mocker):
+    """The decoders are periodically captured over the control channel."""
+
+    shape = (dummy_net.output_dimensions, dummy_net.ensemble.n_neurons)
+    dummy_net.reconnect = ReconnectPolicy(snapshot_interval=0.001)
+    dummy_net.session_manager = SessionManager()
+    dummy_net.control_channel = mocker.Mock()
+    dummy_net.control_channel.request_array.side_effect = [
+        socket.timeout(),  # Missed snapshots are retried
+        np.ones(np.prod(shape)),
+    ] + [np.full(np.prod(shape), 2.0)] * 1000
+    dummy_net.recv_buffer[0] = 0.25
+
+    future = dummy_net.session_manager.submit(dummy_net.capture_decoders())
+    deadline = time.time() + 5
+    while dummy_net.decoder_snapshot is None and time.time() < deadline:
+        time.sleep(0.001)
+    future.cancel()
+    dummy_net.session_manager.close()
+
+    decoders, t = dummy_net.decoder_snapshot
+    assert decoders.shape == shape
+    assert t == 0.25
+
+
+def test_checkpoint(dummy_net, tmp_path, mocker):
+    """Test reading, saving and loading decoder checkpoints."""
+
+    shape = (dummy_net.output_dimensions, dummy_net.ensemble.n_neurons)
+    decoders = np.arange(np.prod(shape), dtype=float)
+    filename = str(tmp_path / "checkpoint.npz")
+
+    # Needs the control channel
+    with pytest.raises(RuntimeError, match="control channel"):
+        dummy_net.read_decoders()
+
+    dummy_net.control_channel = mocker.Mock()
+    dummy_net.control_channel.request_array.return_value = decoders
+    dummy_net.save_checkpoint(filename)
+
+    assert np.all(dummy_net.last_decoders == decoders.reshape(shape))
+    assert dummy_net.initial_decoders is None
+
+    dummy_net.load_checkpoint(filename)
+    assert np.all(dummy_net.initial_decoders == decoders.reshape(shape))
+
+    # Shape mismatch
+    np.savez(filename, decoders=np.zeros((shape[0] + 1, shape[1])))
+    with pytest.raises(nengo.exceptions.ValidationError, match="expected"):
+        dummy_net.load_checkpoint(filename)
+
+
+def test_offline_args(dummy_net, config_contents):
+    """Test the run mode arguments of the FPGA network."""
+
+    fpga_name = list(config_contents.keys())[1]
+    assert dummy_net.mode == "lockstep"
+
+    with pytest.raises(nengo.exceptions.ValidationError):
+        FpgaPesEnsembleNetwork(fpga_name, 1, 1, 0.001, mode="invalid")
+    with pytest.raises(nengo.exceptions.ValidationError):
+        FpgaPesEnsembleNetwork(
+            fpga_name, 1, 1, 0.001, mode="offline", telemetry=Telemetry()
+        )
+    with pytest.raises(nengo.exceptions.ValidationError, match="Reconnection"):
+        FpgaPesEnsembleNetwork(fpga_name, 1, 1, 0.001, mode="realtime", reconnect=True)
+
+    net = FpgaPesEnsembleNetwork(fpga_name, 1, 2, 0.001, mode="offline")
+    net.set_trajectory(np.zeros((5, 2)), np.zeros((5, 2)))
+    assert net.trajectory[0].shape == (5, 2)
+    with pytest.raises(nengo.exceptions.ValidationError):
+        net.set_trajectory(np.zeros((5, 1)), np.zeros((5, 2)))
+    with pytest.raises(nengo.exceptions.ValidationError):
+        net.set_trajectory(np.zeros((5, 2)), np.zeros((4, 2)))
+
+    realtime_net = FpgaPesEnsembleNetwork(fpga_name, 1, 2, 0.001, mode="realtime")
+    assert realtime_net.ssh_string.endswith(" --realtime")
+
+    remote_tmp = config_contents["test-fpga"]["remote_tmp"]
+    assert net.remote_filepath("traj") == f"{remote_tmp}/fpen_traj_{net.uid}.npz"
+    args = net.ssh_string.split(" ")
+    assert args[-2] == f"--offline_file='{net.remote_filepath('traj')}'"
+    assert args[-1] == f"--results_file='{net.remote_filepath('results')}'"
+
+
+def test_fetch_offline_async(dummy_net, mocker):
+    """The board output is fetched in chunks, unless already fetched."""
+
+    dummy_net.mode = "offline"
+    dummy_net.session_manager = SessionManager()
+    chunk_mock = mocker.patch.object(
+        dummy_net,
+        "run_offline_chunk",
+        side_effect=lambda start, stop: np.arange(start, stop)[:, None],
+    )
+
+    # Not offline
+    dummy_net.mode = "lockstep"
+    dummy_net.session_manager.run(dummy_net.fetch_offline_async(0, 10))
+    chunk_mock.assert_not_called()
+
+    dummy_net.mode = "offline"
+    dummy_net.offline_chunk_steps = 4
+    dummy_net.session_manager.run(dummy_net.fetch_offline_async(0, 10))
+    chunk_mock.assert_has_calls(
+        [mocker.call(0, 4), mocker.call(4, 8), mocker.call(8, 10)]
+    )
+    assert np.all(dummy_net.offline_output[:, 0] == np.arange(10))
+
+    # Already fetched
+    chunk_mock.reset_mock()
+    dummy_net.session_manager.run(dummy_net.fetch_offline_async(2, 6))
+    chunk_mock.assert_not_called()
+
+    dummy_net.offline_chunk_steps = None
+    dummy_net.session_manager.run(dummy_net.fetch_offline_async(10, 20))
+    chunk_mock.assert_called_once_with(10, 20)
+    assert dummy_net.offline_start == 10
+
+    # Connecting resets the fetched output (and cleans the local cache)
+    clean_mock = mocker.patch("nengo_fpga.utils.janitor.clean_local_dir")
+    dummy_net.session_manager.run(dummy_net.connect_async())
+    assert len(dummy_net.offline_output) == 0
+    clean_mock.assert_called_once()
+    assert clean_mock.call_args[0] == (dummy_net.arg_data_path,)
+    dummy_net.session_manager.close()
+
+
+def test_run_offline_chunk(dummy_net, mocker):
+    """Test running a chunk of the trajectory on the board."""
+
+    dummy_net.mode = "offline"
+    dummy_net.session_manager = SessionManager()
+    dummy_net.arg_data = {
+        "sim_args": {"dt": 0.001},
+        "conn_args": {"weights": np.zeros((1, 1))},
+    }
+    ssh_mock = mocker.patch.object(dummy_net, "ssh_session")
+    fetch_mock = mocker.patch.object(dummy_net, "fetch_offline_results")
+    fetch_mock.return_value = {"output": np.ones((3, 1)), "decoders": np.ones((1, 1))}
+
+    run = dummy_net.session_manager.run
+    with pytest.raises(RuntimeError, match="No offline trajectory"):
+        run(dummy_net.run_offline_chunk(0, 3))
+
+    dummy_net.set_trajectory(np.arange(5)[:, None], -np.arange(5)[:, None])
+    with pytest.raises(RuntimeError, match="only has 5 steps"):
+        run(dummy_net.run_offline_chunk(0, 6))
+    ssh_mock.assert_not_called()
+
+    def written(write):
+        """Return a file holding the data written by ``write``."""
+        f = io.BytesIO()
+        write(f)
+        f.seek(0)
+        return f
+
+    assert np.all(run(dummy_net.run_offline_chunk(2, 5)) == 1)
+    ssh_mock.assert_called_once()
+    dummy_net.session_manager.close()
+
+    with np.load(written(dummy_net.write_trajectory)) as data:
+        assert np.all(data["input"][:, 0] == [2, 3, 4])
+        assert np.all(data["error"][:, 0] == [-2, -3, -4])
+        assert np.isclose(data["start_time"], 0.002)
+
+    # The next chunk resumes from the learned decoders
+    arg_data = read_arg_data(written(dummy_net.write_arg_data))
+    assert np.all(arg_data["conn_args"]["weights"] == 1)
+    assert np.all(dummy_net.arg_data["conn_args"]["weights"] == 0)
+
+
+@pytest.mark.xdist_group(name="fpga_config")
+def test_run_offline_chunk_lease(dummy_net, mocker):
+    """The board is leased while running a chunk offline."""
+
+    dummy_net.mode = "offline"
+    dummy_net.session_manager = SessionManager()
+    dummy_net.set_trajectory(np.zeros((3, 1)), np.zeros((3, 1)))
+    lease = mocker.Mock(board=dummy_net.fpga_name)
+    leases = mocker.Mock()
+    leases.acquire = mocker.AsyncMock(return_value=lease)
+    mocker.patch(
+        "nengo_fpga.networks.fpga_pes_ensemble_network.lease_manager",
+        return_value=leases,
+    )
+
+    async def ssh_session():
+        assert dummy_net.lease is lease
+
+    mocker.patch.object(dummy_net, "ssh_session", side_effect=ssh_session)
+    fetch_mock = mocker.patch.object(dummy_net, "fetch_offline_results")
+    fetch_mock.return_value = {"output": np.ones((3, 1)), "decoders": np.ones((1, 1))}
+
+    run = dummy_net.session_manager.run
+    run(dummy_net.run_offline_chunk(0, 3))
+    leases.acquire.assert_called_once_with([dummy_net.fpga_name], timeout=600)
+    lease.release.assert_called_once()
+    assert dummy_net.lease is None
+
+    # Released if the run fails
+    fetch_mock.side_effect = RuntimeError("board error")
+    with pytest.raises(RuntimeError, match="board error"):
+        run(dummy_net.run_offline_chunk(0, 3))
+    assert lease.release.call_count == 2
+
+    # The board is not run if it is leased by another process
+    leases.acquire.return_value = None
+    fetch_mock.reset_mock()
+    with pytest.raises(BoardBusyError, match="leased by another process"):
+        run(dummy_net.run_offline_chunk(0, 3))
+    fetch_mock.assert_not_called()
+    dummy_net.session_manager.close()
+
+
+def test_fetch_offline_results(dummy_net, dummy_com, tmp_path, mocker):
+    """Test downloading the results of an offline chunk."""
+
+    dummy_net.arg_data_path = str(tmp_path / "cache")
+    dummy_sftp = dummy_com()
+    mocker.patch.object(dummy_net.ssh_client, "open_sftp", return_value=dummy_sftp)
+    close_mock = mocker.patch.object(dummy_sftp, "close")
+    remove_mock = mocker.patch.object(dummy_sftp, "remove", create=True)
+
+    def get(remote_path, local_path):
+        """Pretend to download the results file."""
+        assert remote_path == dummy_net.remote_filepath("results")
+        assert local_path != dummy_net.local_results_filepath
+        with open(local_path, "wb") as f:
+            np.savez(f, output=np.ones((2, 1)), decoders=np.zeros((1, 1)))
+
+    mocker.patch.object(dummy_sftp, "get", side_effect=get, create=True)
+
+    results = dummy_net.fetch_offline_results()
+    assert np.all(results["output"] == 1)
+    assert np.all(results["decoders"] == 0)
+    close_mock.assert_called_once()
+    assert os.listdir(dummy_net.arg_data_path) == []
+
+    # The data files of the chunk are removed from the board
+    remove_mock.assert_has_calls(
+        [
+            mocker.call(dummy_net.remote_filepath("results")),
+            mocker.call(dummy_net.remote_filepath("traj")),
+        ]
+    )
+
+
+def test_offline_comm_func(dummy_net, mocker):
+    """The fetched output is played back, missing output is fetched."""
+
+    dt = 0.001
+    dummy_net.session_manager = SessionManager()
+    dummy_net.set_trajectory(np.zeros((10, 1)), np.zeros((10, 1)))
+    dummy_net.offline_start = 2
+    dummy_net.offline_output = np.arange(2, 5)[:, None]
+
+    def fetch(start, stop):
+        """Pretend to run the board."""
+        dummy_net.offline_start = start
+        dummy_net.offline_output = np.arange(start, stop)[:, None]
+
+    fetch_mock = mocker.patch.object(
+        dummy_net, "fetch_offline_async", side_effect=fetch
+    )
+
+    assert offline_comm_func(3 * dt, dummy_net, dt) == 2
+    assert offline_comm_func(5 * dt, dummy_net, dt) == 4
+    fetch_mock.assert_not_called()
+
+    # Fetch the rest of the trajectory
+    assert offline_comm_func(6 * dt, dummy_net, dt) == 5
+    fetch_mock.assert_called_once_with(5, 10)
+    dummy_net.session_manager.close()
+
+
+def test_reconnect_arg(dummy_net, config_contents):
+    """Test the reconnect argument of the FPGA network."""
+
+    fpga_name = list(config_contents.keys())[1]
+    assert dummy_net.reconnect is None
+
+    net = FpgaPesEnsembleNetwork(fpga_name, 1, 1, 0.001, reconnect=True)
+    assert isinstance(net.reconnect, ReconnectPolicy)
+
+    with pytest.raises(nengo.exceptions.ValidationError):
+        FpgaPesEnsembleNetwork(fpga_name, 1, 1, 0.001, reconnect="invalid")
+
+
 @pytest.mark.xdist_group(name="fpga_config")
 def test_builder(dummy_net, mocker):
     """Build a few networks to hit all the builder code."""
@@ -902,8 +1865,278 @@ def test_builder(dummy_net, mocker):
     nengo_build_spy.assert_called_once()
     nengo_build_spy.reset_mock()
 
-    # Use FPGA builder
+    # Use FPGA builder, the board is started once the network is built (only
+    # if requested by the simulator building the model)
     dummy_net.fpga_found = True
+    start_mock = mocker.patch.object(dummy_net, "start_connect")
     model = nengo.builder.Model()
     model.build(dummy_net)
     nengo_build_spy.assert_not_called()
+    start_mock.assert_not_called()
+
+    dummy_net.start_on_build = True
+    model = nengo.builder.Model()
+    model.build(dummy_net)
+    start_mock.assert_called_once()
+    dummy_net.start_on_build = False
+
+    # Real-time mode uses a jitter buffer (delayed by two steps by default)
+    dummy_net.mode = "realtime"
+    model = nengo.builder.Model(dt=0.002)
+    model.build(dummy_net)
+    assert dummy_net.jitter_buffer.delay == 0.004
+    assert dummy_net.jitter_buffer.maxlen == dummy_net.jitter_buffer_size
+    fn = [op.fn for op in model.operators if isinstance(op, SimPyFunc)][0]
+    assert fn.func is realtime_comm_func
+
+
+def test_sharded_init():
+    """Test splitting an ensemble into shards."""
+
+    with nengo.Network():
+        net = ShardedFpgaPesEnsembleNetwork(
+            ["a", "b", "c"],
+            n_neurons=10,
+            dimensions=2,
+            learning_rate=0.3,
+            function=lambda x: x[:1],
+            transform=[[2.0]],
+            socket_args={"connect_timeout": 1},
+            seed=3,
+        )
+
+    assert [shard.ensemble.n_neurons for shard in net.shards] == [4, 3, 3]
+    assert net.neuron_slices == [slice(0, 4), slice(4, 7), slice(7, 10)]
+    assert [shard.fpga_name for shard in net.shards] == ["a", "b", "c"]
+    assert [shard.seed for shard in net.shards] == [3, 4, 5]
+    assert np.allclose(
+        [shard.learning_rate for shard in net.shards], [0.12, 0.09, 0.09]
+    )
+    assert np.allclose(net.shards[0].connection.transform.init, [[0.8]])
+    assert all(shard.connect_timeout == 1 for shard in net.shards)
+    assert (net.input_dimensions, net.output_dimensions) == (2, 1)
+
+    # The shards are fed the same input and error, and their outputs are summed
+    for shard in net.shards:
+        for pre, post in [
+            (net.input, shard.input),
+            (net.error, shard.error),
+            (shard.output, net.output),
+        ]:
+            assert any(c.pre is pre and c.post is post for c in net.connections)
+
+    for fpga_names, n_neurons in [([], 10), (["a", "a"], 10), (["a", "b"], 1)]:
+        with pytest.raises(nengo.exceptions.ValidationError):
+            ShardedFpgaPesEnsembleNetwork(fpga_names, n_neurons, 1, 0.1)
+
+    # Pools can hold several shards
+    with nengo.Network():
+        ShardedFpgaPesEnsembleNetwork(["pool:lab", "pool:lab"], 2, 1, 0.1)
+
+
+def test_sharded_params():
+    """Test setting parameters of all the shards."""
+
+    with nengo.Network():
+        net = ShardedFpgaPesEnsembleNetwork(["a", "b"], 5, 2, 0.1)
+
+    encoders = np.arange(10.0).reshape(5, 2)
+    net.set_ensemble_params(
+        encoders=encoders, intercepts=nengo.dists.Uniform(0, 0.5), radius=2
+    )
+    net.set_connection_params(solver=NoSolver(np.zeros((3, 2))))
+
+    assert np.all(net.shards[0].ensemble.encoders == encoders[:3])
+    assert np.all(net.shards[1].ensemble.encoders == encoders[3:])
+    for shard in net.shards:
+        assert shard.ensemble.intercepts == nengo.dists.Uniform(0, 0.5)
+        assert shard.ensemble.radius == 2
+        assert isinstance(shard.connection.solver, NoSolver)
+
+
+def test_sharded_learning():
+    """Sharded ensembles compute and learn like a single ensemble."""
+
+    def make_net(n_shards):
+        with nengo.Network(seed=0) as net:
+            stim = nengo.Node(lambda t: np.sin(2 * np.pi * t))
+            net.ens = ShardedFpgaPesEnsembleNetwork(
+                [str(i) for i in range(n_shards)],
+                n_neurons=200,
+                dimensions=1,
+                learning_rate=1e-3,
+                function=lambda x: [0],
+                seed=0,
+            )
+            nengo.Connection(stim, net.ens.input)
+            nengo.Connection(net.ens.output, net.ens.error)
+            nengo.Connection(stim, net.ens.error, transform=-1)
+            net.probe = nengo.Probe(net.ens.output, synapse=0.01)
+        return net
+
+    outputs = []
+    for n_shards in [1, 4]:
+        net = make_net(n_shards)
+        with nengo.Simulator(net, progress_bar=False) as sim:
+            sim.run(1.0)
+        outputs.append(sim.data[net.probe])
+        target = np.sin(2 * np.pi * sim.trange())[:, None]
+
+        # The output learns to follow the input
+        assert np.sqrt(np.mean((outputs[-1][-200:] - target[-200:]) ** 2)) < 0.1
+
+    # Splitting the neurons does not change how fast the output learns
+    assert np.allclose(outputs[0][:200], outputs[1][:200], atol=0.1)
+
+
+@pytest.mark.xdist_group(name="fpga_config")
+def test_builder_connect(loopback_board):
+    """Boards connected by the builder communicate from the first step."""
+
+    with nengo.Network() as model:
+        stim = nengo.Node(0.5)
+        net = FpgaPesEnsembleNetwork("test-fpga", 10, 1, 1e-4)
+        nengo.Connection(stim, net.input)
+        probe = nengo.Probe(net.output)
+    loopback_board.attach(net)
+    loopback_board.output = 0.25
+
+    with nengo_fpga.Simulator(model) as sim:
+        sim.run_steps(5)
+
+    assert loopback_board.n_sessions == 1
+    assert np.allclose([packet[0] for packet in loopback_board.packets], sim.trange())
+    assert np.allclose(sim.data[probe][1:], 0.25)
+
+
+@pytest.mark.xdist_group(name="fpga_config")
+def test_builder_connect_stale(loopback_board):
+    """Boards are only started by the builds of the current nengo_fpga.Simulator."""
+
+    with nengo.Network() as model:
+        net = FpgaPesEnsembleNetwork("test-fpga", 10, 1, 1e-4)
+    loopback_board.attach(net)
+
+    with nengo_fpga.Simulator(model) as sim:
+        sim.run_steps(2)
+    assert loopback_board.n_sessions == 1
+    assert not net.start_on_build
+
+    # The network still refers to the (closed) session manager of the simulator
+    with nengo.Simulator(model, progress_bar=False):
+        pass
+    assert net.connect_future is None
+    assert loopback_board.n_sessions == 1
+
+
+@pytest.mark.xdist_group(name="fpga_config")
+def test_connect_pool(config_contents, gen_configs, mocker):
+    """Test connecting to the first free board of a pool."""
+
+    board = config_contents["test-fpga"]
+    config_contents.update(
+        {
+            "board-a": dict(board, ip="1.1.1.1"),
+            "board-b": dict(board, ip="2.2.2.2"),
+            "pool:lab": {"boards": "board-a, board-b"},
+        }
+    )
+    fname = os.path.join(os.getcwd(), "test-config")
+    gen_configs.create_config(fname, contents=config_contents)
+    fpga_config.reload_config(fname)
+
+    net = FpgaPesEnsembleNetwork("pool:lab", 1, 1, 0.001)
+    assert net.pool.boards == ["board-a", "board-b"]
+    assert net.fpga_name == "board-a"
+
+    async def connect_board():
+        """Board a is busy, board b is free."""
+        if net.fpga_name == "board-a":
+            raise BoardBusyError("busy")
+
+    mocker.patch.object(net, "connect_board_async", side_effect=connect_board)
+    disconnect_spy = mocker.spy(net, "disconnect")
+    net.connect()
+
+    assert net.fpga_name == "board-b"
+    assert net.send_addr[0] == "2.2.2.2"
+    assert net.pool_wait_time >= 0
+    disconnect_spy.assert_called_once()  # After the busy board
+    assert not net.pool.claim("board-b", object())
+
+    net.close()
+    assert net.pool.claim("board-b", object())
+    net.pool._claims.clear()
+
+    # Pools are not supported in offline mode
+    with pytest.raises(nengo.exceptions.ValidationError, match="offline"):
+        FpgaPesEnsembleNetwork("pool:lab", 1, 1, 0.001, mode="offline")
+
+
+@pytest.mark.xdist_group(name="fpga_config")
+def test_connect_lease(dummy_net, mocker):
+    """The board is leased before connecting, and released when closing."""
+
+    lease = mocker.Mock(board=dummy_net.fpga_name)
+    leases = mocker.Mock()
+    leases.acquire = mocker.AsyncMock(return_value=lease)
+    mocker.patch(
+        "nengo_fpga.networks.fpga_pes_ensemble_network.lease_manager",
+        return_value=leases,
+    )
+    connect_mock = mocker.patch.object(dummy_net, "connect_board_async")
+
+    dummy_net.connect()
+    leases.acquire.assert_called_once_with([dummy_net.fpga_name], timeout=600)
+    connect_mock.assert_called_once()
+    assert dummy_net.lease is lease
+
+    dummy_net.close()
+    lease.release.assert_called_once()
+    assert dummy_net.lease is None
+
+    # The board is not connected to if it is leased by another process
+    leases.acquire.return_value = None
+    connect_mock.reset_mock()
+    with pytest.raises(BoardBusyError, match="leased by another process"):
+        dummy_net.connect()
+    connect_mock.assert_not_called()
+
+
+def test_start_connect(dummy_net, mocker):
+    """Connections started in the background are finished later."""
+
+    started = threading.Event()
+    release = threading.Event()
+
+    async def connect():
+        """Connect to the board slowly."""
+        started.set()
+        await dummy_net.session_manager.to_thread(release.wait)
+
+    connect_mock = mocker.patch.object(dummy_net, "connect_async", side_effect=connect)
+    dummy_net.session_manager = SessionManager()
+
+    # The connection runs in the background until it is finished
+    dummy_net.start_connect()
+    dummy_net.start_connect()  # Only started once
+    assert started.wait(1)
+    assert not dummy_net.connect_future.done()
+    release.set()
+    dummy_net.session_manager.run(dummy_net.finish_connect_async())
+    assert connect_mock.call_count == 1
+    assert dummy_net.connect_future is None
+
+    # Without a background connection, connecting is done when finishing
+    dummy_net.session_manager.run(dummy_net.finish_connect_async())
+    assert connect_mock.call_count == 2
+
+    # Closing cancels the background connection
+    release.clear()
+    dummy_net.start_connect()
+    future = dummy_net.connect_future
+    dummy_net.close()
+    assert future.cancelled()
+    assert dummy_net.connect_future is None
+    release.set()
+    dummy_net.session_manager.close()
@@ -0,0 +1,179 @@
+"""Tests for the pools of FPGA boards."""
+import asyncio
+import os
+
+import pytest
+
+from nengo_fpga import fpga_config
+from nengo_fpga.pool import BoardBusyError, BoardPool, is_pool
+
+
+@pytest.fixture
+def pool(config_contents, gen_configs):
+    """A pool of three boards."""
+
+    board = config_contents["test-fpga"]
+    config_contents.update(
+        {
+            "a": board,
+            "b": board,
+            "c": board,
+            "pool:lab": {"boards": "a, b,c", "backoff": "2", "max_wait": "100"},
+            "pool:empty": {"boards": ""},
+            "pool:missing": {"boards": "a, z"},
+        }
+    )
+    fname = os.path.join(os.getcwd(), "test-config")
+    gen_configs.create_config(fname, contents=config_contents)
+    fpga_config.reload_config(fname)
+
+    yield BoardPool("pool:lab")
+    BoardPool._claims.clear()
+
+
+@pytest.mark.xdist_group(name="fpga_config")
+def test_pool_config(pool):
+    """Test reading pools from the config."""
+
+    assert is_pool("pool:lab")
+    assert not is_pool("lab")
+    assert pool.boards == ["a", "b", "c"]
+    assert (pool.backoff, pool.max_backoff, pool.max_wait) == (2, 30, 100)
+
+    with pytest.raises(ValueError, match="does not list any boards"):
+        BoardPool("pool:empty")
+    with pytest.raises(ValueError, match=r"\['z'\]"):
+        BoardPool("pool:missing")
+
+    for attempt in range(10):
+        delay = pool.retry_delay(attempt)
+        assert min(30, 2 * 2**attempt) / 2 <= delay <= min(30, 2 * 2**attempt)
+
+
+@pytest.mark.xdist_group(name="fpga_config")
+def test_acquire(pool, mocker):
+    """The first free board is used, busy boards are retried with backoff."""
+
+    sleep_mock = mocker.patch("asyncio.sleep")
+    mocker.patch.object(pool, "retry_delay", return_value=1.5)
+    busy = {"a", "b", "c"}
+    tried = []
+
+    async def connect(board):
+        """Connect to a board, the boards become free after two rounds."""
+        tried.append(board)
+        if len(tried) == 6:
+            busy.discard("b")
+        if board in busy:
+            raise BoardBusyError(board)
+
+    owner = object()
+    board, wait_time = asyncio.run(pool.acquire(connect, owner))
+    assert board == "b"
+    assert wait_time >= 0
+    assert tried == ["a", "b", "c", "a", "b", "c", "a", "b"]
+    assert [c.args for c in sleep_mock.call_args_list] == [(1.5,), (1.5,)]
+
+    # The board is claimed until it is released
+    assert pool._claims == {"b": owner}
+    assert not pool.claim("b", object())
+    pool.release("b", object())  # Only the owner can release it
+    assert not pool.claim("b", object())
+    pool.release("b", owner)
+    assert pool._claims == {}
+
+
+@pytest.mark.xdist_group(name="fpga_config")
+def test_acquire_errors(pool, mocker):
+    """Test giving up on busy and unreachable boards."""
+
+    mocker.patch("asyncio.sleep")
+
+    async def busy(board):
+        """All the boards are busy."""
+        raise BoardBusyError(board)
+
+    pool.max_wait = 0
+    with pytest.raises(BoardBusyError, match="became free within 0"):
+        asyncio.run(pool.acquire(busy, object()))
+
+    async def unreachable(board):
+        """All the boards are unreachable."""
+        raise OSError(board)
+
+    with pytest.raises(RuntimeError, match="Could not connect") as e:
+        asyncio.run(pool.acquire(unreachable, object()))
+    assert str(e.value.__cause__) == "c"
+
+    async def interrupted(board):
+        """Connecting is cancelled."""
+        raise KeyboardInterrupt()
+
+    with pytest.raises(KeyboardInterrupt):
+        asyncio.run(pool.acquire(interrupted, object()))
+    assert pool._claims == {}
+
+
+@pytest.mark.xdist_group(name="fpga_config")
+def test_acquire_concurrent(pool):
+    """Networks connecting concurrently are given different boards."""
+
+    async def connect(board):
+        """Take some time to connect."""
+        await asyncio.sleep(0.01)
+
+    async def acquire_all():
+        return await asyncio.gather(
+            *[pool.acquire(connect, object()) for _ in range(3)]
+        )
+
+    boards = [board for board, _ in asyncio.run(acquire_all())]
+    assert sorted(boards) == ["a", "b", "c"]
+
+
+@pytest.mark.xdist_group(name="fpga_config")
+def test_acquire_leases(pool, mocker):
+    """Boards leased by other processes are skipped without connecting."""
+
+    class Leases:
+        """Board b is leased by another process."""
+
+        def __init__(self):
+            self.leased = {"b"}
+            self.timeouts = []
+
+        async def acquire(self, boards, timeout=None):
+            """Lease the first free board."""
+            self.timeouts.append(timeout)
+            for board in boards:
+                if board not in self.leased:
+                    self.leased.add(board)
+                    lease = mocker.Mock(board=board)
+                    lease.release.side_effect = lambda b=board: self.leased.remove(b)
+                    return lease
+            return None
+
+    async def connect(board):
+        """Board a is used by someone not taking leases."""
+        tried.append(board)
+        if board == "a":
+            raise BoardBusyError(board)
+
+    leases = Leases()
+    tried = []
+    owner = object()
+    board, _ = asyncio.run(pool.acquire(connect, owner, leases=leases))
+    assert board == "c"
+    assert tried == ["a", "c"]
+    assert leases.leased == {"b", "c"}
+    assert 0 < leases.timeouts[0] <= pool.max_wait
+
+    # The lease is released with the board
+    pool.release("c", owner)
+    assert leases.leased == {"b"}
+
+    # Give up once no board is released within max_wait
+    leases.leased = {"a", "b", "c"}
+    pool.max_wait = 0
+    with pytest.raises(BoardBusyError):
+        asyncio.run(pool.acquire(connect, owner, leases=leases))
@@ -0,0 +1,73 @@
+"""Tests for the host port allocation."""
+import socket
+
+import pytest
+
+from nengo_fpga.utils import ports
+from nengo_fpga.utils.ports import allocate_ports, parse_port_range
+
+
+def test_parse_port_range():
+    """Port ranges are inclusive ``<first>-<last>`` ranges."""
+
+    assert parse_port_range("20000-20100") == (20000, 20100)
+    assert parse_port_range(" 20000 - 20000 ") == (20000, 20000)
+    assert parse_port_range(None) is None
+    assert parse_port_range("") is None
+    for value in ("20000", "a-b", "20100-20000", "0-10", "1-70000"):
+        with pytest.raises(ValueError, match="Invalid port range"):
+            parse_port_range(value)
+
+
+def test_allocate_free_ports():
+    """Free ports are bound, and the bound base port is returned."""
+
+    allocation = allocate_ports("127.0.0.1", offsets=(0, 2))
+    try:
+        assert allocation.attempts >= 1
+        assert [s.getsockname()[1] for s in allocation.sockets] == [
+            allocation.port,
+            allocation.port + 2,
+        ]
+
+        # Concurrent allocations never collide
+        other = allocate_ports("127.0.0.1", offsets=(0, 2))
+        assert other.port not in (allocation.port, allocation.port + 2)
+        for sock in other.sockets:
+            sock.close()
+
+        # Fixed ports are used as is, and fail if in use
+        with pytest.raises(RuntimeError, match="after 1 attempts"):
+            allocate_ports("127.0.0.1", port=allocation.port + 2)
+    finally:
+        for sock in allocation.sockets:
+            sock.close()
+
+    tcp = allocate_ports("127.0.0.1", sock_type=socket.SOCK_STREAM)
+    assert tcp.sockets[0].type == socket.SOCK_STREAM
+    tcp.sockets[0].close()
+
+
+def test_allocate_port_range(mocker):
+    """Ports in a range are probed until free, counting the attempts."""
+
+    taken = allocate_ports("127.0.0.1")
+    port = taken.port
+    try:
+        if port + 1 > 65535:
+            pytest.skip("Bound port at the end of the port range")
+        with pytest.raises(ValueError, match="too small"):
+            allocate_ports("127.0.0.1", offsets=(0, 2), port_range=(port, port + 1))
+
+        # The first base port tried collides with the taken port
+        mocker.patch.object(ports.random, "randint", side_effect=[port, port + 1])
+        allocation = allocate_ports("127.0.0.1", port_range=(port, port + 1))
+        assert allocation.port == port + 1
+        assert allocation.attempts == 2
+        allocation.sockets[0].close()
+
+        mocker.patch.object(ports.random, "randint", return_value=port)
+        with pytest.raises(RuntimeError, match="after 3 attempts"):
+            allocate_ports("127.0.0.1", port_range=(port, port), max_attempts=3)
+    finally:
+        taken.sockets[0].close()
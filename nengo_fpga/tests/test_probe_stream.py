@@ -0,0 +1,59 @@
+"""Tests for probe data streamed to disk."""
+import os
+
+import numpy as np
+import pytest
+
+from nengo_fpga.utils.probe_stream import ProbeStream
+
+
+def test_probe_stream(tmp_path):
+    """Samples are written in chunks and read back like an array."""
+
+    path = str(tmp_path / "probe")
+    stream = ProbeStream(path, chunk_size=4)
+    assert stream.shape == (0,)
+    assert np.asarray(stream).shape == (0,)
+
+    data = np.arange(30.0).reshape(10, 3)
+    for sample in data:
+        stream.append(sample)
+
+    # Only the last (partial) chunk is kept in memory
+    assert sorted(os.listdir(path)) == ["chunk_000000.npy", "chunk_000001.npy"]
+    assert stream.n_buffered == 2
+    assert stream.shape == (10, 3) and stream.ndim == 2
+    assert stream.dtype == np.float64
+    assert len(stream) == 10
+
+    assert np.all(np.asarray(stream) == data)
+    for key in [
+        3,
+        -1,
+        (5, 2),
+        slice(None),
+        slice(3, 9),
+        slice(1, None, 3),
+        slice(9, 2, -2),
+        (slice(2, 7), 1),
+        (slice(None), slice(0, 2)),
+        slice(20, 30),
+        [0, 5, 9],
+    ]:
+        assert np.all(stream[key] == data[key]), key
+    with pytest.raises(IndexError):
+        stream[10]  # pylint: disable=pointless-statement
+
+    stream.flush()
+    assert len(os.listdir(path)) == 3
+    assert np.all(np.asarray(stream) == data)
+
+    stream.clear()
+    assert len(stream) == 0
+    assert os.listdir(path) == []
+
+    # Leftover chunks in the directory are removed
+    stream.append(data[0])
+    stream.flush()
+    assert len(ProbeStream(path)) == 0
+    assert os.listdir(path) == []
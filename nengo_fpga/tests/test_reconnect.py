@@ -0,0 +1,28 @@
+"""Tests for the board reconnection policy."""
+import nengo
+import numpy as np
+import pytest
+
+from nengo_fpga.reconnect import ReconnectPolicy
+
+
+def test_hold_output():
+    """Test the different hold policies."""
+
+    last = np.array([1.0, 2.0])
+
+    assert np.all(ReconnectPolicy().hold_output(1, last) == last)
+    assert np.all(ReconnectPolicy(hold="zero").hold_output(1, last) == 0)
+
+    policy = ReconnectPolicy(hold=lambda t, x: x * t)
+    assert np.all(policy.hold_output(2, last) == 2 * last)
+
+    with pytest.raises(nengo.exceptions.ValidationError):
+        ReconnectPolicy(hold="invalid")
+
+
+def test_attempt_delay():
+    """Delay between attempts grows linearly."""
+
+    policy = ReconnectPolicy(backoff=0.5)
+    assert [policy.attempt_delay(i) for i in range(3)] == [0, 0.5, 1.0]
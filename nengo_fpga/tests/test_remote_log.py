@@ -0,0 +1,91 @@
+"""Tests for the remote (board-side) log handling."""
+import logging
+import threading
+
+from nengo_fpga.utils.remote_log import (
+    LineReader,
+    RemoteLog,
+    RemoteLogQueue,
+    remote_logger,
+)
+
+
+def test_line_reader():
+    """Lines are split on any line ending, across chunk boundaries."""
+
+    reader = LineReader()
+
+    assert reader.feed(b"first\r\nsec") == ["first"]
+    assert reader.feed(b"ond\r") == ["second"]
+    assert reader.feed(b"\nthird\r\r\nfourth\n\nfif") == ["third", "fourth"]
+    assert reader.flush() == ["fif"]
+    assert reader.flush() == []
+
+
+def test_line_reader_bounded():
+    """Overly long lines are split to keep the buffer bounded."""
+
+    reader = LineReader(max_line_length=4)
+
+    assert reader.feed(b"abcdefghij") == ["abcd", "efgh"]
+    assert reader.feed(b"\n") == ["ij"]
+
+
+def test_remote_log_ring_buffer():
+    """Only the most recent lines are kept."""
+
+    log = RemoteLog(maxlen=3)
+
+    assert log.feed(b"1\n2\n3\n4\n5") == ["1", "2", "3", "4"]
+    assert log.tail() == ["2", "3", "4"]
+    assert log.tail(1) == ["4"]
+
+    log.clear()
+    assert log.tail() == []
+    assert log.feed(b"\n") == []  # Incomplete line "5" was also cleared
+
+    # Lines of the standard error are split separately
+    assert log.feed(b"out") == []
+    assert log.feed(b"err\n", stderr=True) == ["err"]
+    assert log.feed(b"put\n") == ["output"]
+    assert log.tail() == ["err", "output"]
+
+
+def test_remote_log_queue(caplog):
+    """Remote records are forwarded by the listener thread."""
+
+    log_queue = RemoteLogQueue()
+    n_threads = threading.active_count()
+
+    log_queue.acquire()
+    log_queue.acquire()
+    assert not remote_logger.propagate
+    assert threading.active_count() == n_threads + 1
+
+    with caplog.at_level(logging.INFO, logger="nengo_fpga"):
+        remote_logger.info("remote line")
+
+        # Stopping the listener flushes the queue
+        log_queue.release()
+        assert threading.active_count() == n_threads + 1
+        log_queue.release()
+
+    assert threading.active_count() == n_threads
+    assert remote_logger.propagate
+    assert [r.getMessage() for r in caplog.records] == ["remote line"]
+
+
+def test_remote_log_queue_full(caplog):
+    """Records are dropped rather than blocking when the queue is full."""
+
+    log_queue = RemoteLogQueue(maxsize=2)
+    log_queue.acquire()
+    log_queue.listener.stop()  # Keep the records in the queue
+
+    with caplog.at_level(logging.INFO, logger="nengo_fpga"):
+        for i in range(5):
+            remote_logger.info("line %d", i)
+
+    assert log_queue.dropped == 3
+    log_queue.listener.start()
+    log_queue.release()
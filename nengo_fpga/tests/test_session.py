@@ -0,0 +1,134 @@
+"""Tests for the board session manager."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from nengo_fpga.session import SessionManager
+
+
+def test_run_and_close():
+    """Run coroutines and blocking calls on the loop, then check for leaks."""
+
+    n_threads = threading.active_count()
+    manager = SessionManager(max_workers=2)
+    assert not manager.running
+
+    async def blocking_sum(a, b):
+        """Run a blocking call in the thread pool."""
+        return await manager.to_thread(sum, [a, b])
+
+    assert manager.run(blocking_sum(1, 2)) == 3
+    assert manager.running
+
+    manager.close()
+    assert not manager.running
+    assert threading.active_count() == n_threads
+
+    # Closing twice is fine, and the manager restarts on demand
+    manager.close()
+    assert manager.run(blocking_sum(3, 4)) == 7
+    manager.close()
+    assert threading.active_count() == n_threads
+
+
+def test_gather_concurrent():
+    """Coroutines run through gather run concurrently."""
+
+    manager = SessionManager(max_workers=4)
+    delay = 0.2
+
+    async def wait(i):
+        """Blocking sleep in the thread pool."""
+        await manager.to_thread(time.sleep, delay)
+        return i
+
+    start = time.time()
+    assert manager.gather([wait(i) for i in range(4)]) == [0, 1, 2, 3]
+    assert time.time() - start < 2 * delay
+
+    manager.close()
+
+
+def test_gather_error_cancels():
+    """An error in one coroutine cancels the others."""
+
+    manager = SessionManager()
+    cancelled = []
+
+    async def fail():
+        """Fail immediately."""
+        raise RuntimeError("board error")
+
+    async def wait_forever():
+        """Wait until cancelled."""
+        try:
+            await asyncio.sleep(100)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    with pytest.raises(RuntimeError, match="board error"):
+        manager.gather([wait_forever(), fail()])
+
+    assert cancelled == [True]
+    manager.close()
+
+
+def test_close_cancels_tasks():
+    """Closing the manager cancels outstanding tasks."""
+
+    manager = SessionManager()
+    started = threading.Event()
+
+    async def wait_forever():
+        """Wait until cancelled."""
+        started.set()
+        await asyncio.sleep(100)
+
+    future = manager.submit(wait_forever())
+    started.wait()
+    manager.close()
+
+    assert future.cancelled()
+
+
+def test_run_timeout():
+    """Coroutines that time out are cancelled."""
+
+    manager = SessionManager()
+
+    with pytest.raises(TimeoutError):
+        manager.run(asyncio.sleep(100), timeout=0.01)
+
+    manager.close()
+    assert not manager._tasks
+
+
+def test_close_from_loop():
+    """The manager cannot be closed from its own event loop (or thread pool)."""
+
+    manager = SessionManager()
+    assert not manager.in_own_thread()
+
+    async def close():
+        """Try to close the manager from inside the loop."""
+        assert manager.in_own_thread()
+        manager.close()
+
+    with pytest.raises(RuntimeError, match="own loop"):
+        manager.run(close())
+
+    async def close_in_thread():
+        """Try to close the manager from its thread pool."""
+        await manager.to_thread(close_sync)
+
+    def close_sync():
+        assert manager.in_own_thread()
+        manager.close()
+
+    with pytest.raises(RuntimeError, match="own loop"):
+        manager.run(close_in_thread())
+
+    manager.close()
@@ -1,9 +1,20 @@
 """Tests for NengoFPGA Simulator."""
+import gc
+import os
+import time
+import warnings
+import weakref
+
 import nengo
+import numpy as np
 import pytest
 
-from nengo_fpga.networks import FpgaPesEnsembleNetwork
+from nengo_fpga import simulator
+from nengo_fpga.networks import FpgaPesEnsembleNetwork, ShardedFpgaPesEnsembleNetwork
 from nengo_fpga.simulator import Simulator
+from nengo_fpga.telemetry import Telemetry
+from nengo_fpga.utils.probe_stream import ProbeStream
+from nengo_fpga.utils.timing import StepTimer
 
 
 def test_init(mocker):
@@ -31,9 +42,28 @@ def test_init(mocker):
     assert sim2.fpga_networks_list == [net.fpga_net]
     super_mock.assert_called_once_with(nengo_net)
 
-
-@pytest.mark.parametrize("probe", ["ensemble", "neurons", "connection"])
-def test_probe_list(mocker, probe):
+    # FPGA networks in subnetworks (e.g., shards) are found
+    with nengo.Network() as outer:
+        sharded = ShardedFpgaPesEnsembleNetwork(["a", "b"], 2, 1, 0.001)
+
+    sim3 = Simulator(outer)
+    assert sim3.fpga_networks_list == sharded.shards
+    assert all(shard.using_fpga_sim for shard in sharded.shards)
+
+
+@pytest.mark.parametrize(
+    "probe, telemetry",
+    [
+        ("ensemble", None),
+        ("ensemble", Telemetry(neurons=[0])),
+        ("neurons", None),
+        ("neurons", Telemetry(neurons=False)),
+        ("weights", None),
+        ("weights", Telemetry()),
+        ("input", Telemetry()),
+    ],
+)
+def test_probe_list(mocker, probe, telemetry):
     """Test probe checks in init."""
 
     # Don't actually create a simulator
@@ -41,14 +71,15 @@ def test_probe_list(mocker, probe):
 
     # Create a dummy net with a given illegal probe
     with nengo.Network() as net:
-        fpga_net = FpgaPesEnsembleNetwork("test", 1, 1, 0.001)
+        fpga_net = FpgaPesEnsembleNetwork("test", 2, 1, 0.001, telemetry=telemetry)
 
         probe_map = {
-            "ensemble": fpga_net.ensemble,
-            "neurons": fpga_net.ensemble.neurons,
-            "connection": fpga_net.connection,
+            "ensemble": (fpga_net.ensemble,),
+            "neurons": (fpga_net.ensemble.neurons,),
+            "weights": (fpga_net.connection, "weights"),
+            "input": (fpga_net.connection, "input"),
         }
-        nengo.Probe(probe_map[probe])
+        nengo.Probe(*probe_map[probe])
 
     with pytest.raises(nengo.exceptions.BuildError):
         Simulator(net)
@@ -56,6 +87,50 @@ def test_probe_list(mocker, probe):
     assert super_mock.call_count == 0
 
 
+@pytest.mark.parametrize(
+    "probe, telemetry",
+    [
+        ("ensemble", Telemetry()),
+        ("neurons", Telemetry(neurons=[0])),
+        ("weights", Telemetry(neurons=False, decoders=True)),
+        ("output", None),
+    ],
+)
+def test_probe_list_telemetry(mocker, probe, telemetry):
+    """Probes are allowed if the board streams the probed values."""
+
+    super_mock = mocker.patch("nengo.simulator.Simulator.__init__")
+
+    with nengo.Network() as net:
+        fpga_net = FpgaPesEnsembleNetwork("test", 2, 1, 0.001, telemetry=telemetry)
+
+        probe_map = {
+            "ensemble": (fpga_net.ensemble,),
+            "neurons": (fpga_net.ensemble.neurons,),
+            "weights": (fpga_net.connection, "weights"),
+            "output": (fpga_net.connection,),
+        }
+        nengo.Probe(*probe_map[probe])
+
+    Simulator(net)
+    super_mock.assert_called_once()
+
+
+def test_init_build_error(mocker):
+    """Boards started while building are stopped if the build fails."""
+
+    mocker.patch(
+        "nengo.simulator.Simulator.__init__", side_effect=RuntimeError("build")
+    )
+    with nengo.Network() as net:
+        fpga_net = FpgaPesEnsembleNetwork("test", 1, 1, 0.001)
+    close_mock = mocker.patch.object(fpga_net, "close")
+
+    with pytest.raises(RuntimeError, match="build"):
+        Simulator(net)
+    close_mock.assert_called_once()
+
+
 def test_nengo_sim():
     """Test using the nengo simulator with an fpga network."""
 
@@ -77,12 +152,16 @@ def test_close(dummy_sim, mocker):
 
     # Mock out local and super calls
     close_mock = mocker.patch.object(net, "close")
+    cleanup_mock = mocker.patch.object(net, "cleanup")
     super_close_mock = mocker.patch("nengo.simulator.Simulator.close")
 
+    simulator._open_simulators.add(sim)
     sim.close()
 
     assert close_mock.call_count == 2
+    assert cleanup_mock.call_count == 2
     super_close_mock.assert_called_once()
+    assert sim not in simulator._open_simulators
 
 
 def test_reset(dummy_sim, mocker):
@@ -93,15 +172,125 @@ def test_reset(dummy_sim, mocker):
     sim = dummy_sim[1]
 
     # Mock out local and super calls
-    reset_mock = mocker.patch.object(net, "reset")
+    close_mock = mocker.patch.object(net, "close")
+    connect_mock = mocker.patch.object(net, "finish_connect_async")
     super_reset_mock = mocker.patch("nengo.simulator.Simulator.reset")
 
     seed = 5
     sim.reset(seed)  # Call with args
 
-    assert reset_mock.call_count == 2
+    assert close_mock.call_count == 2
+    assert connect_mock.await_count == 2
     super_reset_mock.assert_called_once_with(seed)
 
+    # Boards started while building the model are not restarted
+    close_mock.reset_mock()
+    net.connect_future = object()
+    sim.reset(seed)
+    close_mock.assert_not_called()
+    assert connect_mock.await_count == 4
+    net.connect_future = None
+
+    # A failed connection closes all networks and is re-raised
+    close_mock.reset_mock()
+    connect_mock.side_effect = RuntimeError("no board")
+
+    with pytest.raises(RuntimeError, match="no board"):
+        sim.reset(seed)
+
+    assert close_mock.call_count == 4
+    assert super_reset_mock.call_count == 2
+    sim.session_manager.close()
+
+
+def test_run_steps(dummy_sim, mocker):
+    """Offline outputs are fetched before running the steps."""
+
+    net = dummy_sim[0]
+    sim = dummy_sim[1]
+
+    fetch_mock = mocker.patch.object(net, "fetch_offline_async")
+    super_run_mock = mocker.patch("nengo.simulator.Simulator.run_steps")
+    mocker.patch.object(Simulator, "n_steps", 5)
+
+    sim.run_steps(10)
+    fetch_mock.assert_not_called()
+    super_run_mock.assert_called_once_with(10, progress_bar=None)
+
+    net.mode = "offline"
+    sim.run_steps(10)
+    fetch_mock.assert_has_calls([mocker.call(5, 15)] * 2)
+    sim.session_manager.close()
+
+
+def test_run_steps_paced(dummy_sim, mocker):
+    """Time spent between paced runs is not counted as deadline misses."""
+
+    sim = dummy_sim[1]
+    mocker.patch("nengo.simulator.Simulator.step")
+    mocker.patch.object(Simulator, "n_steps", 0)
+
+    def run_steps(steps, progress_bar=None):
+        """Dummy run_steps, stepping the simulator."""
+        for _ in range(steps):
+            sim.step()
+
+    mocker.patch("nengo.simulator.Simulator.run_steps", side_effect=run_steps)
+
+    # Long enough periods that scheduling jitter does not cause misses
+    sim.step_timer = StepTimer(0.02)
+    sim.run_steps(2)
+    time.sleep(0.1)
+    sim.run_steps(2)
+    assert sim.step_timer.n_steps == 4
+    assert sim.step_timer.n_misses == 0
+    sim.session_manager.close()
+
+
+def test_real_time_arg(mocker):
+    """Test the real_time argument of the simulator."""
+
+    mocker.patch("nengo.simulator.Simulator.__init__")
+    net = nengo.Network()
+
+    assert Simulator(net).step_timer is None
+    assert Simulator(net, real_time=True, dt=0.002).step_timer.period == 0.002
+
+    timer = StepTimer(0.01)
+    assert Simulator(net, real_time=timer).step_timer is timer
+
+    with pytest.raises(nengo.exceptions.ValidationError):
+        Simulator(net, real_time=0.01)
+
+    # Realtime networks are paced by default, and require pacing
+    with net:
+        FpgaPesEnsembleNetwork("not-a-board", 10, 1, 1e-4, mode="realtime")
+    assert Simulator(net, dt=0.002).step_timer.period == 0.002
+    with pytest.raises(nengo.exceptions.ValidationError, match="require real-time"):
+        Simulator(net, real_time=False)
+
+
+def test_step_paced(dummy_sim, mocker):
+    """Steps are timed when running in real time."""
+
+    sim = dummy_sim[1]
+    super_step_mock = mocker.patch("nengo.simulator.Simulator.step")
+    super_reset_mock = mocker.patch("nengo.simulator.Simulator.reset")
+
+    sim.step()
+    super_step_mock.assert_called_once()
+
+    sim.step_timer = StepTimer(0.001)
+    sim.step()
+    sim.step()
+    assert sim.step_timer.n_steps == 2
+    assert super_step_mock.call_count == 3
+
+    sim.reset()
+    super_reset_mock.assert_called_once()
+    assert sim.step_timer.n_steps == 0
+    sim.session_manager.close()
+
 
 def test_terminate(dummy_sim, mocker):
     """Test the Simulator's terminate function."""
@@ -111,10 +300,192 @@ def test_terminate(dummy_sim, mocker):
     sim = dummy_sim[1]
 
     # Mock out calls
-    cleanup_mock = mocker.patch.object(net, "cleanup")
     close_mock = mocker.patch.object(sim, "close")
 
     sim.terminate()
 
-    assert cleanup_mock.call_count == 2
     close_mock.assert_called_once()
+
+
+def test_exit_hook(mocker):
+    """Simulators still open at exit are terminated."""
+
+    mocker.patch.object(simulator, "_open_simulators", weakref.WeakSet())
+    terminate_mock = mocker.patch.object(Simulator, "terminate")
+
+    with nengo.Network() as net:
+        nengo.Node([1])
+    sim = Simulator(net, progress_bar=False)
+    closed_sim = Simulator(net, progress_bar=False)
+    closed_sim.close()
+
+    simulator._terminate_open_simulators()
+    terminate_mock.assert_called_once_with()
+    assert list(simulator._open_simulators) == [sim]
+    sim.close()
+
+
+def test_no_leak(mocker):
+    """Simulators are freed once they are no longer used, even if not closed."""
+
+    # Collect the garbage of previous tests, so that it is not collected (and
+    # any "not closed" warning raised) while the simulators are being built
+    gc.collect()
+
+    # Count the simulators whose networks are closed (a mock would keep them)
+    n_closed = [0]
+    close_networks = simulator._close_networks
+
+    def count_close(networks, session_manager):
+        n_closed[0] += 1
+        close_networks(networks, session_manager)
+
+    mocker.patch.object(simulator, "_close_networks", count_close)
+
+    with nengo.Network() as net:
+        node = nengo.Node([1])
+        nengo.Probe(node)
+
+    sims = []
+
+    def run(n_sims):
+        """Construct (and close, half of the time) ``n_sims`` simulators."""
+        for i in range(n_sims):
+            sim = Simulator(net, progress_bar=False)
+            sim.step()
+            if i % 2 == 0:
+                sim.close()
+            # Otherwise not closed, but not used anymore
+            sims.append(weakref.ref(sim))
+
+    def n_objects():
+        """Number of objects tracked by the garbage collector (but ``sims``)."""
+        gc.collect()
+        return len(gc.get_objects()) - len(sims)
+
+    # Simulators that are not closed warn when they are freed (the warnings are
+    # not recorded, so that they do not count as leaked objects)
+    with pytest.warns(ResourceWarning, match="deallocated while open"):
+        run(2)
+        gc.collect()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", ResourceWarning)
+        run(10)
+        start_objects = n_objects()
+        run(1000)
+
+        # Memory does not grow with the number of simulators
+        assert n_objects() - start_objects < 100
+    assert all(sim() is None for sim in sims)
+    assert len(simulator._open_simulators) == 0
+
+    # The networks of the simulators that were not closed are closed when the
+    # simulators are freed
+    assert n_closed[0] == len(sims)
+
+
+def test_gc_on_loop_thread(mocker):
+    """Simulators freed by a callback of their session manager are closed."""
+
+    close_spy = mocker.spy(simulator, "_close_networks")
+    with nengo.Network() as net:
+        nengo.Node([1])
+    sims = [Simulator(net, progress_bar=False)]
+    session_manager = sims[0].session_manager
+
+    async def free():
+        """Drop the last reference to the simulator on the loop thread."""
+        sims.clear()
+        gc.collect()
+
+    with pytest.warns(ResourceWarning, match="deallocated while open"):
+        session_manager.run(free())
+
+    # Closed from another thread
+    for _ in range(100):
+        if session_manager.loop is None:
+            break
+        time.sleep(0.01)
+    assert session_manager.loop is None
+    assert close_spy.call_count == 2
+
+
+@pytest.mark.xdist_group(name="fpga_config")
+def test_gc_terminates_boards(loopback_board):
+    """The boards of simulators freed without being closed are terminated."""
+
+    with nengo.Network() as model:
+        net = FpgaPesEnsembleNetwork("test-fpga", 10, 1, 1e-4)
+    loopback_board.attach(net)
+
+    sim = Simulator(model, progress_bar=False)
+    sim.run_steps(3)
+    session_manager = sim.session_manager
+    assert net.udp_socket is not None
+    assert not loopback_board.terminated
+
+    with pytest.warns(ResourceWarning, match="deallocated while open"):
+        del sim
+        gc.collect()
+
+    assert loopback_board.terminated
+    assert net.udp_socket is None
+    assert session_manager.loop is None
+
+
+def test_probe_dir(tmp_path):
+    """Probe data can be streamed to chunk files on disk."""
+
+    with nengo.Network() as net:
+        node = nengo.Node(lambda t: [t, -t])
+        probes = [nengo.Probe(node), nengo.Probe(node, sample_every=0.01)]
+
+    probe_dir = str(tmp_path / "probes")
+    with Simulator(net, progress_bar=False) as ref_sim:
+        ref_sim.run_steps(250)
+    with Simulator(
+        net, progress_bar=False, probe_dir=probe_dir, probe_chunk_size=100
+    ) as sim:
+        sim.run_steps(250)
+
+        assert isinstance(sim.data[probes[0]], ProbeStream)
+        assert sim.data[probes[0]].n_buffered == 50
+        for probe in probes:
+            assert np.all(np.asarray(sim.data[probe]) == ref_sim.data[probe])
+            assert np.all(sim.data[probe][-5:, 1] == ref_sim.data[probe][-5:, 1])
+
+        sim.reset()
+        assert len(sim.data[probes[0]]) == 0
+        sim.run_steps(150)
+
+    # All the data is on disk once the simulator is closed
+    assert sorted(os.listdir(probe_dir)) == ["probe_0", "probe_1"]
+    assert sorted(os.listdir(os.path.join(probe_dir, "probe_0"))) == [
+        "chunk_000000.npy",
+        "chunk_000001.npy",
+    ]
+    assert np.allclose(
+        np.load(os.path.join(probe_dir, "probe_0", "chunk_000001.npy"))[:, 0],
+        np.arange(101, 151) * 0.001,
+    )
+
+
+def test_board_health(dummy_sim, mocker):
+    """Test the Simulator's board health functions."""
+
+    # Grab test objects from fixture
+    net = dummy_sim[0]
+    sim = dummy_sim[1]
+
+    assert sim.board_health == {net.fpga_name: None}
+
+    # Healthy boards
+    status_mock = mocker.patch.object(net, "health_status", return_value=None)
+    assert sim.degraded_boards(max_step_time=0.001) == {}
+    status_mock.assert_called_with(
+        max_age=None, max_step_time=0.001, max_queue_depth=None
+    )
+
+    # Degraded board
+    status_mock.return_value = "no heartbeat"
+    assert sim.degraded_boards(max_step_time=0.001) == {net.fpga_name: "no heartbeat"}
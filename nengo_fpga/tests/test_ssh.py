@@ -0,0 +1,109 @@
+"""Tests for the SSH helpers."""
+import base64
+import hashlib
+import socket
+import threading
+
+import paramiko
+import pytest
+
+from nengo_fpga.utils import ssh
+from nengo_fpga.utils.ssh import (
+    exec_remote,
+    fetch_host_fingerprint,
+    key_fingerprint,
+    sudo_command,
+)
+
+
+def test_sudo_command():
+    """Non-root users run the command with non-interactive sudo."""
+
+    assert sudo_command("python script.py", "root") == "python script.py"
+    assert sudo_command("python script.py", "xilinx") == "sudo -n python script.py"
+
+
+def test_exec_remote(mocker):
+    """Commands are run on a new exec channel, closed if the command fails."""
+
+    ssh_client = mocker.Mock()
+    channel = ssh_client.get_transport.return_value.open_session.return_value
+
+    assert exec_remote(ssh_client, "cmd")[0] is channel
+    channel.exec_command.assert_called_once_with("cmd")
+    channel.get_pty.assert_not_called()
+    channel.set_combine_stderr.assert_not_called()
+    channel.close.assert_not_called()
+
+    # The standard error can be combined with the standard output
+    manager = mocker.Mock()
+    manager.attach_mock(channel.set_combine_stderr, "combine")
+    manager.attach_mock(channel.exec_command, "exec")
+    exec_remote(ssh_client, "cmd", combine_stderr=True)
+    assert manager.mock_calls[-2:] == [
+        mocker.call.combine(True),
+        mocker.call.exec("cmd"),
+    ]
+
+    channel.exec_command.side_effect = OSError("Channel closed")
+    with pytest.raises(OSError, match="Channel closed"):
+        exec_remote(ssh_client, "cmd")
+    channel.close.assert_called_once()
+
+
+@pytest.fixture
+def ssh_server(mocker):
+    """Serve SSH key exchanges with the given host keys (set ``keys``)."""
+
+    class Server:
+        """Host keys of the server, and its transports."""
+
+        def __init__(self):
+            self.keys = []
+            self.transports = []
+
+        def connect(self, address, timeout=None):
+            """Connect to a new server transport over a socket pair."""
+            server_sock, client_sock = socket.socketpair()
+            transport = paramiko.Transport(server_sock)
+            for key in self.keys:
+                transport.add_server_key(key)
+            self.transports.append(transport)
+            threading.Thread(
+                target=transport.start_server,
+                kwargs={"server": paramiko.ServerInterface()},
+                daemon=True,
+            ).start()
+            return client_sock
+
+    server = Server()
+    mocker.patch.object(ssh.socket, "create_connection", side_effect=server.connect)
+    yield server
+    for transport in server.transports:
+        transport.close()
+
+
+def test_host_fingerprints(ssh_server):
+    """Host keys of the requested type are fetched with a key exchange."""
+
+    rsa_key = paramiko.RSAKey.generate(1024)
+    ecdsa_key = paramiko.ECDSAKey.generate()
+    fingerprint = key_fingerprint(rsa_key)
+    assert fingerprint == "SHA256:" + base64.b64encode(
+        hashlib.sha256(rsa_key.asbytes()).digest()
+    ).decode("ascii").rstrip("=")
+
+    # Hosts with several key types present their preferred key by default
+    ssh_server.keys = [rsa_key, ecdsa_key]
+    assert fetch_host_fingerprint("1.2.3.4", "22", timeout=1) == (
+        "ecdsa-sha2-nistp256",
+        key_fingerprint(ecdsa_key),
+    )
+    assert fetch_host_fingerprint(
+        "1.2.3.4", 22, key_type="rsa-sha2-512", timeout=1
+    ) == ("rsa-sha2-512", fingerprint)
+
+    # A host without a key of the requested type cannot be identified
+    ssh_server.keys = [ecdsa_key]
+    with pytest.raises(paramiko.SSHException):
+        fetch_host_fingerprint("1.2.3.4", 22, key_type="rsa-sha2-512", timeout=1)
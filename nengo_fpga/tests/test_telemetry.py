@@ -0,0 +1,167 @@
+"""Tests for the board telemetry stream."""
+import os
+import socket
+import time
+
+import nengo
+import numpy as np
+import pytest
+
+from nengo_fpga import fpga_config
+from nengo_fpga.networks import FpgaPesEnsembleNetwork
+from nengo_fpga.simulator import Simulator
+from nengo_fpga.telemetry import Telemetry, TelemetryStream
+
+
+def send_packets(stream, packets):
+    """Send ``packets`` to the telemetry ``stream`` and wait for them to arrive."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for packet in packets:
+            sock.sendto(
+                np.asarray(packet, float).tobytes(), stream.socket.getsockname()
+            )
+    time.sleep(0.05)
+
+
+def test_telemetry_args():
+    """Test the telemetry description."""
+
+    assert np.all(Telemetry().neuron_indices(3) == [0, 1, 2])
+    assert Telemetry().all_neurons(3)
+    assert len(Telemetry(neurons=False).neuron_indices(3)) == 0
+    assert not Telemetry(neurons=[0, 2]).all_neurons(3)
+
+    args = Telemetry(neurons=[2, 0], decimation=5).args(3)
+    assert np.all(args["neurons"] == [2, 0])
+    assert args["decimation"] == 5
+    assert args["decoder_decimation"] == 0
+    assert Telemetry(decoders=True).args(3)["decoder_decimation"] == 100
+    assert args["decoder_chunk_size"] == 65507 // 8 - 3 - 3
+
+    with pytest.raises(nengo.exceptions.ValidationError):
+        Telemetry(neurons=[3]).neuron_indices(3)
+    with pytest.raises(nengo.exceptions.ValidationError):
+        Telemetry(decimation=0)
+    with pytest.raises(nengo.exceptions.ValidationError):
+        Telemetry(decoder_decimation=1.5)
+
+
+def test_stream_drain():
+    """Packets are read without blocking into the given arrays."""
+
+    stream = TelemetryStream(Telemetry(neurons=[2, 0], decoders=True), 3, 2)
+    activities = np.zeros(3)
+    decoders = np.zeros((2, 3))
+
+    # Not open
+    stream.drain(activities, decoders)
+    assert stream.n_packets == 0
+
+    stream.open("127.0.0.1", 0)
+    stream.drain(activities, decoders)
+    assert stream.n_packets == 0
+
+    send_packets(stream, [[0.1, 1, 2], [0.2, 3, 4, 0, 1, 0, *range(6)], [0.3]])
+    assert stream.drain(activities, decoders)  # Received a decoder snapshot
+    assert stream.n_packets == 2
+    assert stream.sim_time == 0.2
+    assert stream.decoders_time == 0.2
+    assert np.all(activities == [4, 0, 3])
+    assert np.all(decoders == np.arange(6).reshape(2, 3))
+    stream.close()
+    stream.close()  # Closing twice is fine
+
+    # Activities too large for UDP
+    with pytest.raises(nengo.exceptions.BuildError, match="fewer neurons"):
+        TelemetryStream(Telemetry(), 10000, 1)
+    with pytest.raises(nengo.exceptions.BuildError, match="no room"):
+        TelemetryStream(Telemetry(decoders=True), 8186, 1)
+
+
+def test_stream_chunks():
+    """Decoder snapshots too large for a packet are received in chunks."""
+
+    telemetry = Telemetry(neurons=False, decoders=True)
+    stream = TelemetryStream(telemetry, 5000, 2)
+    chunk_size = telemetry.chunk_size(5000)
+    assert chunk_size < 10000
+    assert stream.max_values * 8 <= 65507
+    decoders = np.zeros((2, 5000))
+    stream.open("127.0.0.1", 0)
+
+    def chunks(t, snapshot):
+        """Packets of the chunks of ``snapshot``."""
+        offsets = range(0, len(snapshot), chunk_size)
+        return [
+            [t, i, len(offsets), offset, *snapshot[offset : offset + chunk_size]]
+            for i, offset in enumerate(offsets)
+        ]
+
+    # Chunks can arrive out of order
+    snapshot = np.arange(10000.0)
+    packets = chunks(0.1, snapshot)
+    assert len(packets) == 2
+    send_packets(stream, packets[1:])
+    assert not stream.drain(None, decoders)
+    send_packets(stream, packets[:1])
+    assert stream.drain(None, decoders)
+    assert np.all(decoders == snapshot.reshape(2, 5000))
+    assert stream.decoders_time == 0.1
+
+    # Snapshots with lost chunks are dropped
+    send_packets(stream, chunks(0.2, -snapshot)[:1] + chunks(0.3, 2 * snapshot)[1:])
+    assert not stream.drain(None, decoders)
+    assert np.all(decoders == snapshot.reshape(2, 5000))
+    send_packets(stream, chunks(0.3, 2 * snapshot)[:1])
+    assert stream.drain(None, decoders)
+    assert np.all(decoders == 2 * snapshot.reshape(2, 5000))
+    assert stream.decoders_time == 0.3
+    stream.close()
+
+
+@pytest.mark.xdist_group(name="fpga_config")
+def test_telemetry_probes(config_contents, gen_configs, mocker):
+    """Telemetry is written to the probed signals."""
+
+    fname = os.path.join(os.getcwd(), "test-config")
+    fpga_name = list(config_contents.keys())[1]
+    gen_configs.create_config(fname, contents=config_contents)
+    fpga_config.reload_config(fname)
+
+    # Don't talk to the board
+    mocker.patch(
+        "nengo_fpga.networks.fpga_pes_ensemble_network.udp_comm_func",
+        side_effect=lambda t, x, net, dt: np.zeros(net.output_dimensions),
+    )
+
+    with nengo.Network() as net:
+        fpga_net = FpgaPesEnsembleNetwork(
+            fpga_name, 3, 1, 0.001, telemetry=Telemetry(decoders=True)
+        )
+        p_ens = nengo.Probe(fpga_net.ensemble)
+        p_neurons = nengo.Probe(fpga_net.ensemble.neurons)
+        p_weights = nengo.Probe(fpga_net.connection, "weights")
+        p_conn = nengo.Probe(fpga_net.connection)
+
+    async def connect_async():
+        fpga_net.telemetry_stream.open("127.0.0.1", 0)
+
+    mocker.patch.object(fpga_net, "connect_async", side_effect=connect_async)
+
+    with Simulator(net) as sim:
+        send_packets(fpga_net.telemetry_stream, [[0.0, 1, 2, 3, 0, 1, 0, *range(3)]])
+        sim.step()
+        sim.step()  # Values are held between packets
+
+        assert np.all(sim.data[p_neurons] == [[1, 2, 3]] * 2)
+        assert np.all(sim.data[p_weights] == [np.arange(3).reshape(1, 3)] * 2)
+
+        # The board resumes from the snapshot if it reconnects
+        decoders, t = fpga_net.decoder_snapshot
+        assert np.all(decoders == np.arange(3).reshape(1, 3))
+        assert t == 0.0
+        assert np.all(sim.data[p_conn] == 0)
+
+        # The decoded output is decoded on the host
+        assert sim.data[p_ens].shape == (2, 1)
+        assert np.all(sim.data[p_ens] != 0)
@@ -0,0 +1,72 @@
+"""Tests for the wall-clock pacing of simulation steps."""
+import time
+
+import numpy as np
+
+from nengo_fpga.utils.timing import StepTimer
+
+
+def test_pacing():
+    """Steps finishing early wait for their deadline."""
+
+    # Long enough periods that scheduling jitter does not cause misses
+    period = 0.02
+    timer = StepTimer(period, n_bins=10)
+
+    start = time.perf_counter()
+    for _ in range(5):
+        timer.begin()
+        timer.end()
+    elapsed = time.perf_counter() - start
+
+    assert elapsed >= 5 * period
+    assert timer.n_steps == 5
+    assert timer.n_misses == 0
+    assert timer.miss_rate == 0
+    assert timer.counts[0] == 5  # All steps were (much) faster than the period
+
+
+def test_deadline_misses():
+    """Late steps are recorded and the schedule restarts after them."""
+
+    period = 0.002
+    timer = StepTimer(period, n_bins=4)
+    assert timer.miss_rate == 0
+
+    timer.begin()
+    time.sleep(0.01)
+    timer.end()
+
+    assert timer.n_misses == 1
+    assert timer.misses[0][0] == 0
+    assert timer.max_overrun >= 0.01 - period
+    assert timer.total_overrun == timer.max_overrun
+    assert timer.counts[-1] == 1  # Longer than the histogram range
+
+    # The next step has a full period before its deadline
+    timer.begin()
+    timer.end()
+    assert timer.n_misses == 1
+    assert timer.miss_rate == 0.5
+    assert np.sum(timer.counts) == 2
+
+    timer.reset()
+    assert timer.n_steps == 0
+    assert len(timer.misses) == 0
+    assert np.sum(timer.counts) == 0
+
+
+def test_restart():
+    """Restarting the schedule keeps the statistics but forgives the idle time."""
+
+    period = 0.002
+    timer = StepTimer(period)
+    timer.begin()
+    timer.end()
+
+    time.sleep(0.05)  # Pause (e.g., between two runs)
+    timer.restart()
+    timer.begin()
+    timer.end()
+    assert timer.n_steps == 2
+    assert timer.n_misses == 0
@@ -0,0 +1,204 @@
+"""Tests for the persistent board-side workers."""
+import json
+import queue
+import threading
+
+import pytest
+
+from nengo_fpga import worker as worker_module
+from nengo_fpga.worker import PREFIX, RemoteWorker, get_worker
+
+
+class FakeStreams:
+    """Standard streams of a remote worker, written to by the test."""
+
+    def __init__(self):
+        self.lines = queue.Queue()
+        self.written = []
+
+    def event(self, **event):
+        """Output a worker event line."""
+        self.lines.put(PREFIX + json.dumps(event).encode() + b"\n")
+
+    def exit(self):
+        """Make the worker exit (end of its output)."""
+        self.lines.put(None)
+
+    # stdout
+    def __iter__(self):
+        return iter(self.lines.get, None)
+
+    # stdin
+    def write(self, data):
+        self.written.append(json.loads(data))
+        if self.written[-1].get("exit"):
+            self.exit()
+
+    def flush(self):
+        pass
+
+
+@pytest.fixture
+def streams(mocker):
+    """Fake SSH client whose standard streams are `FakeStreams`."""
+    streams = FakeStreams()
+    streams.ssh_client = mocker.Mock()
+    streams.ssh_client.exec_command.return_value = (streams, streams, None)
+    return streams
+
+
+def test_worker_run(streams):
+    """Runs are submitted as JSON lines, their output is sent to the listener."""
+
+    worker = RemoteWorker("test-fpga", streams.ssh_client, "python script --worker")
+    streams.event(event="ready")
+    worker.start(timeout=1)
+    assert worker.alive
+    streams.ssh_client.exec_command.assert_called_once_with("python script --worker")
+
+    received = []
+    done = threading.Event()
+
+    def listener(kind, payload):
+        received.append((kind, payload))
+        if kind in ("done", "error"):
+            done.set()
+
+    run_id = worker.submit({"udp_port": 1234, "realtime": True}, listener)
+    assert streams.written == [
+        {"run": run_id, "args": {"udp_port": 1234, "realtime": True}}
+    ]
+
+    streams.event(event="started", run=run_id)
+    streams.lines.put(b"hello\n")
+    streams.lines.put(b"world")
+    streams.event(event="done", run=run_id)
+    assert done.wait(1)
+    assert received == [("log", b"hello\n"), ("log", b"world\n"), ("done", None)]
+
+    # Errors are reported with the error message
+    received.clear()
+    done.clear()
+    run_id = worker.submit({}, listener)
+    streams.event(event="started", run=run_id)
+    streams.event(event="error", run=run_id, error="ValueError: oops")
+    assert done.wait(1)
+    assert received == [("error", "ValueError: oops")]
+
+    worker.close()
+    assert not worker.alive
+    assert streams.written[-1] == {"exit": True}
+    streams.ssh_client.close.assert_called_once()
+
+
+def test_worker_forget(streams, caplog):
+    """Output of forgotten runs is logged, runs are ended when the worker exits."""
+
+    worker = RemoteWorker("test-fpga", streams.ssh_client, "cmd")
+    streams.event(event="ready")
+    worker.start(timeout=1)
+
+    received = []
+    exited = threading.Event()
+
+    def listener(kind, payload):
+        received.append((kind, payload))
+        if kind == "exit":
+            exited.set()
+
+    run_a = worker.submit({}, listener)
+    run_b = worker.submit({}, listener)
+    worker.forget(run_a)
+
+    with caplog.at_level("INFO"):
+        streams.event(event="started", run=run_a)
+        streams.lines.put(b"ignored\n")
+        streams.event(event="done", run=run_a)
+        streams.exit()
+        assert exited.wait(1)
+    assert received == [("exit", None)]
+    assert "<test-fpga> ignored" in caplog.text
+    assert run_b not in worker.listeners
+    worker._reader.join(1)
+    assert not worker.alive
+
+
+def test_worker_start_errors(streams):
+    """Workers that do not start in time or exit on startup raise an error."""
+
+    worker = RemoteWorker("test-fpga", streams.ssh_client, "cmd")
+    with pytest.raises(RuntimeError, match="did not start within"):
+        worker.start(timeout=0.01)
+    streams.ssh_client.close.assert_called_once()
+
+    worker = RemoteWorker("test-fpga", streams.ssh_client, "cmd")
+    streams.lines = queue.Queue()
+    streams.exit()
+    with pytest.raises(RuntimeError, match="exited on startup"):
+        worker.start(timeout=1)
+
+
+def test_get_worker(streams, mocker):
+    """Workers are reused while they are running."""
+
+    mocker.patch.object(worker_module, "_workers", {})
+
+    def start():
+        worker = RemoteWorker("test-fpga", streams.ssh_client, "cmd")
+        streams.lines = queue.Queue()
+        streams.event(event="ready")
+        worker.start(timeout=1)
+        return worker
+
+    start_mock = mocker.Mock(side_effect=start)
+    worker = get_worker("test-fpga", start_mock)
+    assert get_worker("test-fpga", start_mock) is worker
+    start_mock.assert_called_once()
+
+    # Exited workers are restarted
+    streams.exit()
+    worker._reader.join(1)
+    new_worker = get_worker("test-fpga", start_mock)
+    assert new_worker is not worker
+    assert start_mock.call_count == 2
+
+    worker_module.shutdown_workers()
+    assert not new_worker.alive
+    assert worker_module._workers == {}
+
+
+def test_get_worker_concurrent(mocker):
+    """Workers of different boards start concurrently, once per board."""
+
+    mocker.patch.object(worker_module, "_workers", {})
+    mocker.patch.object(worker_module, "_worker_locks", {})
+    b_started = threading.Event()
+    starts = []
+
+    def start(fpga_name):
+        """Dummy start, board "a" only starts once board "b" has started."""
+        starts.append(fpga_name)
+        if fpga_name == "a":
+            assert b_started.wait(1), "Board b was blocked by board a"
+        else:
+            b_started.set()
+        worker = mocker.Mock(alive=True)
+        worker.fpga_name = fpga_name
+        return worker
+
+    workers = {}
+
+    def get(fpga_name):
+        workers.setdefault(fpga_name, []).append(
+            get_worker(fpga_name, lambda: start(fpga_name))
+        )
+
+    threads = [threading.Thread(target=get, args=(name,)) for name in "aab"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(2)
+
+    assert sorted(starts) == ["a", "b"]
+    assert workers["a"][0] is workers["a"][1]
+    assert workers["b"][0].fpga_name == "b"
@@ -1,3 +1,3 @@
 """Provides utility functions and path information."""
 
-from . import fileio, paths
+from . import fileio, janitor, jitter, paths, probe_stream, remote_log, timing
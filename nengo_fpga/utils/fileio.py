@@ -1,57 +1,294 @@
-"""Provides helper functions dealing with file I/O."""
+"""
+Provides helper functions dealing with file I/O.
+
+Argument files (the ensemble and connection parameters uploaded to the board) are
+flat binary files that can be loaded without unpickling, and (if uncompressed)
+memory-mapped directly on the board. An argument file consists of
+
+1. a 16-byte preamble: the magic string ``b"NFPGAARG"``, followed by the format
+   version and the size of the header (in bytes), both little-endian uint32,
+2. a UTF-8 JSON header ``{"records": [...]}``, padded with spaces so that the
+   data section starts at a multiple of `ARG_ALIGNMENT` bytes. Each record is a
+   dictionary with the keys ``name`` (``"<section>.<key>"``), ``dtype`` (a NumPy
+   dtype string, e.g. ``"<f8"``), ``shape``, ``offset`` (in bytes, from the
+   start of the data section), ``nbytes`` (size of the array), ``codec`` (one of
+   `ARG_CODECS`) and ``size`` (size of the stored, possibly compressed, bytes),
+3. the data section: the raw (C-ordered) bytes of each array, compressed with the
+   record's codec, each starting at a multiple of `ARG_ALIGNMENT` bytes.
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import os
+import struct
+import time
+import zlib
 
 import numpy
-from numpy.compat import isfileobj, pickle
-from numpy.lib.format import (
-    _check_version,
-    _write_array_header,
-    header_data_from_array_1_0,
-)
-
-
-def write_array(
-    fp, array, version=None, allow_pickle=True, pickle_kwargs=None
-):  # pragma: no cover
-    """This is basically the NumPy numpy.lib.format.write_array function with the only
-    change being pickle protocol 2 is used to dump the data (instead of 3 in the most
-    recent release of NumPy)"""
-    _check_version(version)
-    _write_array_header(fp, header_data_from_array_1_0(array), version)
-
-    if array.itemsize == 0:
-        buffersize = 0
-    else:
-        # Set buffer size to 16 MiB to hide the Python loop overhead.
-        buffersize = max(16 * 1024**2 // array.itemsize, 1)
-
-    if array.dtype.hasobject:
-        # We contain Python objects so we cannot write out the data
-        # directly.  Instead, we will pickle it out
-        if not allow_pickle:
-            raise ValueError("Object arrays cannot be saved when allow_pickle=False")
-        if pickle_kwargs is None:
-            pickle_kwargs = {}
-
-        pickle.dump(array, fp, protocol=2, **pickle_kwargs)
-    elif array.flags.f_contiguous and not array.flags.c_contiguous:
-        if isfileobj(fp):
-            array.T.tofile(fp)
+
+logger = logging.getLogger(__name__)
+
+ARG_MAGIC = b"NFPGAARG"
+ARG_VERSION = 1
+ARG_ALIGNMENT = 64
+
+ARG_CODECS = ("none", "zlib", "lz4", "zstd")
+
+_PREAMBLE = struct.Struct("<8sII")
+
+
+def _import_codec(name):
+    """Import the (optional) module implementing codec ``name``."""
+    if name == "lz4":
+        import lz4.frame  # pylint: disable=import-outside-toplevel
+
+        return lz4.frame
+    import zstandard  # pylint: disable=import-outside-toplevel
+
+    return zstandard
+
+
+@functools.lru_cache(maxsize=None)
+def get_compressor(codec):
+    """
+    Parse a codec specification, return the codec name and compression function.
+
+    ``codec`` is a codec name, optionally followed by a compression level (e.g.,
+    ``"zlib:1"``). ``lz4`` and ``zstd`` require the ``lz4`` and ``zstandard``
+    packages respectively; if they are not installed, ``zlib`` is used instead.
+    The compression function is ``None`` for the ``"none"`` codec.
+    """
+    name, _, level = str(codec).strip().lower().partition(":")
+    if name not in ARG_CODECS:
+        raise ValueError(
+            f"Unknown codec '{codec}', must be one of {', '.join(ARG_CODECS)}"
+        )
+    try:
+        level = int(level) if level else None
+    except ValueError as e:
+        raise ValueError(f"Invalid compression level in codec '{codec}'") from e
+
+    if name in ("lz4", "zstd"):
+        try:
+            module = _import_codec(name)
+        except ImportError:
+            logger.warning("Codec '%s' is not available, falling back to 'zlib'", name)
+            name, level = "zlib", None
         else:
-            for chunk in numpy.nditer(
-                array,
-                flags=["external_loop", "buffered", "zerosize_ok"],
-                buffersize=buffersize,
-                order="F",
-            ):
-                fp.write(chunk.tobytes("C"))
+            if name == "lz4":
+                return name, functools.partial(
+                    module.compress, compression_level=level or 0
+                )
+            return name, module.ZstdCompressor(level=level or 3).compress
+
+    if name == "zlib":
+        return name, functools.partial(
+            zlib.compress, level=6 if level is None else level
+        )
+    return name, None
+
+
+def _decompress(codec, data):
+    """Decompress ``data`` stored with ``codec``."""
+    if codec == "zlib":
+        return zlib.decompress(data)
+    try:
+        module = _import_codec(codec)
+    except ImportError as e:
+        raise ValueError(
+            f"Reading '{codec}' records requires the {e.name} package"
+        ) from e
+    if codec == "lz4":
+        return module.decompress(data)
+    return module.ZstdDecompressor().decompress(data)
+
+
+def _aligned(n):
+    """Round ``n`` up to a multiple of `ARG_ALIGNMENT`."""
+    return -(-n // ARG_ALIGNMENT) * ARG_ALIGNMENT
+
+
+def write_arg_data(f, arg_data, codec="none"):
+    """
+    Write argument data to the writable (binary) file object ``f``.
+
+    ``arg_data`` maps section names (e.g., ``"ens_args"``) to dictionaries of
+    arrays and scalars. Each value is stored as a raw array record named
+    ``"<section>.<key>"`` (see the module docstring for the format). The file is
+    written sequentially, so ``f`` does not need to be seekable.
+
+    Records are compressed with ``codec`` (see `get_compressor`), except for
+    those that do not get any smaller, which are stored uncompressed.
+    """
+    codec, compress = get_compressor(codec)
+
+    chunks = []
+    records = []
+    offset = 0
+    compress_time = 0.0
+    for section, args in arg_data.items():
+        for key, value in args.items():
+            array = numpy.asarray(value, order="C")
+            if array.dtype.hasobject:
+                raise ValueError(
+                    f"Cannot write '{section}.{key}': object arrays are not supported"
+                )
+            chunk = array.reshape(-1).view(numpy.uint8).data
+            record_codec = "none"
+            if compress is not None and array.nbytes > 0:
+                start = time.perf_counter()
+                compressed = compress(chunk)
+                compress_time += time.perf_counter() - start
+                if len(compressed) < array.nbytes:
+                    chunk, record_codec = compressed, codec
+
+            chunks.append(chunk)
+            records.append(
+                {
+                    "name": f"{section}.{key}",
+                    "dtype": array.dtype.str,
+                    "shape": array.shape,
+                    "offset": offset,
+                    "nbytes": array.nbytes,
+                    "codec": record_codec,
+                    "size": len(chunk),
+                }
+            )
+            offset = _aligned(offset + len(chunk))
+
+    if compress is not None:
+        logger.info(
+            "Compressed %d bytes of argument data to %d bytes with '%s' in %.3f s",
+            sum(record["nbytes"] for record in records),
+            sum(record["size"] for record in records),
+            codec,
+            compress_time,
+        )
+
+    header = json.dumps({"records": records}).encode("utf-8")
+    header += b" " * (
+        _aligned(_PREAMBLE.size + len(header)) - _PREAMBLE.size - len(header)
+    )
+    f.write(_PREAMBLE.pack(ARG_MAGIC, ARG_VERSION, len(header)))
+    f.write(header)
+
+    position = 0
+    for chunk, record in zip(chunks, records):
+        f.write(b"\0" * (record["offset"] - position))
+        f.write(chunk)
+        position = record["offset"] + record["size"]
+
+
+def digest_arg_data(arg_data):
+    """
+    Return a hash (hex digest) of the contents of argument data.
+
+    The hash does not depend on the codec used to write the data, so it can be
+    used to name argument files after their contents.
+    """
+    digest = hashlib.sha256(str(ARG_VERSION).encode("utf-8"))
+    for section, args in arg_data.items():
+        for key, value in args.items():
+            array = numpy.asarray(value, order="C")
+            if array.dtype.hasobject:
+                raise ValueError(
+                    f"Cannot hash '{section}.{key}': object arrays are not supported"
+                )
+            digest.update(
+                json.dumps([f"{section}.{key}", array.dtype.str, array.shape]).encode(
+                    "utf-8"
+                )
+            )
+            digest.update(array.reshape(-1).view(numpy.uint8).data)
+    return digest.hexdigest()
+
+
+def read_arg_data(f, mmap_mode=None):
+    """
+    Read argument data written by `write_arg_data`.
+
+    Parameters
+    ----------
+    f : str or file object
+        Path to the argument file, or a readable (binary) file object.
+    mmap_mode : {None, "r", "c"}, optional (Default: None)
+        If given (and ``f`` is a path), the file is memory-mapped in this mode
+        and the uncompressed arrays are views of the mapping rather than copies
+        (use ``"c"`` for writable, copy-on-write arrays).
+
+    Returns
+    -------
+    dict
+        Dictionary mapping section names to dictionaries of arrays.
+    """
+    if mmap_mode is not None and isinstance(f, (str, os.PathLike)):
+        buffer = numpy.memmap(f, dtype=numpy.uint8, mode=mmap_mode)
+    elif isinstance(f, (str, os.PathLike)):
+        with open(f, "rb") as fh:
+            buffer = numpy.frombuffer(bytearray(fh.read()), dtype=numpy.uint8)
     else:
-        if isfileobj(fp):
-            array.tofile(fp)
-        else:
-            for chunk in numpy.nditer(
-                array,
-                flags=["external_loop", "buffered", "zerosize_ok"],
-                buffersize=buffersize,
-                order="C",
-            ):
-                fp.write(chunk.tobytes("C"))
+        buffer = numpy.frombuffer(bytearray(f.read()), dtype=numpy.uint8)
+
+    if len(buffer) < _PREAMBLE.size:
+        raise ValueError("Argument file is truncated")
+    magic, version, header_size = _PREAMBLE.unpack(buffer[: _PREAMBLE.size])
+    if magic != ARG_MAGIC:
+        raise ValueError("Not a nengo-fpga argument file")
+    if version > ARG_VERSION:
+        raise ValueError(
+            f"Argument file version {version} is newer than supported ({ARG_VERSION})"
+        )
+    data_start = _PREAMBLE.size + header_size
+    header = json.loads(bytes(buffer[_PREAMBLE.size : data_start]))
+
+    arg_data = {}
+    decompress_time = 0.0
+    for record in header["records"]:
+        dtype = numpy.dtype(record["dtype"])
+        if dtype.hasobject:
+            raise ValueError(f"Record '{record['name']}' has an object dtype")
+        if record["codec"] not in ARG_CODECS:
+            raise ValueError(
+                f"Record '{record['name']}' has unknown codec '{record['codec']}'"
+            )
+
+        start = data_start + record["offset"]
+        size = record.get("size", record["nbytes"])
+        if start + size > len(buffer):
+            raise ValueError("Argument file is truncated")
+        data = buffer[start : start + size]
+        if record["codec"] != "none":
+            tic = time.perf_counter()
+            data = numpy.frombuffer(
+                bytearray(_decompress(record["codec"], data)), dtype=numpy.uint8
+            )
+            decompress_time += time.perf_counter() - tic
+        array = data.view(dtype).reshape(record["shape"])
+
+        section, key = record["name"].split(".", 1)
+        arg_data.setdefault(section, {})[key] = array
+
+    if decompress_time > 0:
+        logger.info("Decompressed argument data in %.3f s", decompress_time)
+    return arg_data
+
+
+def save_checkpoint(filename, decoders, **metadata):
+    """
+    Save a decoder checkpoint (and any scalar ``metadata``) to ``filename``.
+
+    The checkpoint is first written to a temporary file so that an existing
+    checkpoint is never left half-written.
+    """
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, "wb") as f:
+        numpy.savez(f, decoders=decoders, **metadata)
+    os.replace(tmp_filename, filename)
+
+
+def load_checkpoint(filename):
+    """Load a decoder checkpoint, return a dictionary of its contents."""
+    with numpy.load(filename, allow_pickle=False) as data:
+        return {key: data[key] for key in data.files}
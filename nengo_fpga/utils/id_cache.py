@@ -0,0 +1,101 @@
+"""
+Caches the device IDs of the FPGA boards.
+
+Device IDs are burnt into the boards, so once extracted they can be reused
+without running the ID script again. Each ID is recorded with the IP of the
+board and the type and fingerprint of the board's SSH host key, and is only
+reused while the board at that IP presents the same host key of that type: a new
+host key means the board was replaced (or reinstalled), and its cached ID is
+dropped.
+"""
+
+import json
+import os
+import threading
+import time
+
+from nengo_fpga.utils.paths import cache_dir
+
+# Default location of the ID cache
+ID_CACHE_FILE = os.path.join(cache_dir, "device_ids.json")
+
+
+class IDCache:
+    """
+    Device IDs of FPGA boards, keyed by IP and SSH host key fingerprint.
+
+    The cache is a JSON file mapping the IP of each board to its host key type
+    and fingerprint, device ID and the time the ID was extracted. It is read on
+    every lookup and rewritten atomically on every update, so it can be shared
+    between processes.
+
+    Parameters
+    ----------
+    path : str, optional (Default: `ID_CACHE_FILE`)
+        Path of the cache file.
+    """
+
+    def __init__(self, path=ID_CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Return the cache entries (``{ip: entry}``), empty if unreadable."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def save(self, entries):
+        """Atomically replace the cache entries."""
+        os.makedirs(os.path.dirname(self.path) or os.curdir, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def get(self, ip, key_type, fingerprint):
+        """
+        Return the cached ID (int) of the board at ``ip``, or None.
+
+        If the ``fingerprint`` of the board's host key of type ``key_type``
+        changed, its entry is dropped.
+        """
+        with self._lock:
+            entries = self.load()
+            entry = entries.get(ip)
+            if entry is None:
+                return None
+            if (
+                entry.get("key_type") != key_type
+                or entry.get("fingerprint") != fingerprint
+            ):
+                del entries[ip]
+                self.save(entries)
+                return None
+            return entry.get("id")
+
+    def put(self, ip, key_type, fingerprint, id_int):
+        """
+        Record the ID of the board at ``ip``.
+
+        The board is identified by the ``fingerprint`` of its host key of type
+        ``key_type`` (the type negotiated when the ID was extracted).
+        """
+        with self._lock:
+            entries = self.load()
+            entries[ip] = {
+                "key_type": key_type,
+                "fingerprint": fingerprint,
+                "id": id_int,
+                "time": time.time(),
+            }
+            self.save(entries)
+
+    def clear(self):
+        """Remove all the cached IDs."""
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
@@ -0,0 +1,110 @@
+"""
+Evicts stale data files from the local cache and the boards' ``remote_tmp``.
+
+Data files (argument, trajectory and results files) are all named ``fpen_*``.
+Files may be left behind by killed processes, or shared between runs (argument
+files are named after their contents), so they are evicted by age and total size
+rather than removed when a run ends.
+"""
+
+import logging
+import os
+import stat
+import time
+
+logger = logging.getLogger(__name__)
+
+# Default eviction limits
+MAX_AGE = 7 * 24 * 3600  # seconds
+MAX_SIZE = 1 << 30  # bytes
+
+# Files more recent than this are never evicted (they may be in use)
+MIN_AGE = 3600  # seconds
+
+# Prefix of the data files managed by the janitor
+PREFIX = "fpen_"
+
+
+def select_evictions(files, max_age=MAX_AGE, max_size=MAX_SIZE, now=None):
+    """
+    Select the files to evict.
+
+    Files older than ``max_age`` seconds are evicted, then the least recently
+    modified files are evicted until the remaining files take at most
+    ``max_size`` bytes. Files modified less than `MIN_AGE` seconds ago are kept.
+
+    Parameters
+    ----------
+    files : iterable of (str, int, float)
+        ``(name, size, mtime)`` of the candidate files.
+    max_age : float, optional (Default: `MAX_AGE`)
+        Maximum age of the files (in seconds).
+    max_size : int, optional (Default: `MAX_SIZE`)
+        Maximum total size of the files (in bytes).
+    now : float, optional (Default: None)
+        Current time, defaults to ``time.time()``.
+
+    Returns
+    -------
+    list of str
+        Names of the files to evict.
+    """
+    if now is None:
+        now = time.time()
+
+    evicted = []
+    kept = []
+    for name, size, mtime in sorted(files, key=lambda f: f[2]):
+        if now - mtime > max(max_age, MIN_AGE):
+            evicted.append(name)
+        else:
+            kept.append((name, size, mtime))
+
+    total_size = sum(size for _, size, _ in kept)
+    for name, size, mtime in kept:
+        if total_size <= max_size or now - mtime < MIN_AGE:
+            break
+        evicted.append(name)
+        total_size -= size
+    return evicted
+
+
+def clean_local_dir(path, max_age=MAX_AGE, max_size=MAX_SIZE):
+    """Evict stale data files from the local directory ``path``."""
+    try:
+        entries = [entry for entry in os.scandir(path) if entry.is_file()]
+    except FileNotFoundError:
+        return []
+
+    files = [
+        (entry.name, entry.stat().st_size, entry.stat().st_mtime)
+        for entry in entries
+        if entry.name.startswith(PREFIX)
+    ]
+    evicted = select_evictions(files, max_age=max_age, max_size=max_size)
+    for name in evicted:
+        try:
+            os.remove(os.path.join(path, name))
+        except FileNotFoundError:
+            pass  # Already evicted (e.g., by another process)
+    if evicted:
+        logger.info("Evicted %d stale data files from %s", len(evicted), path)
+    return evicted
+
+
+def clean_remote_dir(sftp_client, path, max_age=MAX_AGE, max_size=MAX_SIZE):
+    """Evict stale data files from the directory ``path`` of a board."""
+    files = [
+        (attr.filename, attr.st_size, attr.st_mtime)
+        for attr in sftp_client.listdir_attr(path)
+        if attr.filename.startswith(PREFIX) and stat.S_ISREG(attr.st_mode)
+    ]
+    evicted = select_evictions(files, max_age=max_age, max_size=max_size)
+    for name in evicted:
+        try:
+            sftp_client.remove(f"{path}/{name}")
+        except FileNotFoundError:
+            pass  # Already evicted (e.g., by another host)
+    if evicted:
+        logger.info("Evicted %d stale data files from %s", len(evicted), path)
+    return evicted
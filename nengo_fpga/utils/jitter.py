@@ -0,0 +1,111 @@
+"""Provides a jitter buffer for samples received from free-running boards."""
+
+import numpy as np
+
+
+class JitterBuffer:
+    """
+    Buffer of timestamped samples, resampled at the host simulation time.
+
+    The samples are timestamped by the board's clock, which is aligned with the
+    host simulation time when the buffer is first sampled after receiving
+    samples: the most recent sample then is taken to be current, and the clock
+    offset is kept until the buffer is cleared. Samples are sampled ``delay``
+    seconds behind the aligned board clock (the playout delay) and linearly
+    interpolated between the two closest samples, so that late or bursty
+    packets (e.g., while the host is paused) do not show up as glitches in the
+    output. If no sample is recent enough, the most recent sample is held.
+
+    The host must be paced to the board's clock (i.e., simulate in real time,
+    see `nengo_fpga.utils.timing.StepTimer`): a host running faster than the
+    board underruns, and a host running slower lags further and further behind.
+
+    Parameters
+    ----------
+    size_out : int
+        Dimensionality of the samples.
+    maxlen : int, optional (Default: 1024)
+        Maximum number of buffered samples, the oldest samples are dropped when
+        the buffer is full.
+    delay : float, optional (Default: 0)
+        Playout delay (in seconds).
+
+    Attributes
+    ----------
+    offset : float or None
+        Host simulation time minus board time, ``None`` until aligned.
+    n_late : int
+        Number of samples dropped because they were older than the most recent
+        sample (e.g., reordered packets).
+    n_underruns : int
+        Number of times no sample was recent enough to be interpolated.
+    """
+
+    def __init__(self, size_out, maxlen=1024, delay=0.0):
+        self.maxlen = maxlen
+        self.delay = delay
+
+        self.times = np.zeros(maxlen)
+        self.values = np.zeros((maxlen, size_out))
+        self.output = np.zeros(size_out)
+        self.n = 0
+        self.offset = None
+
+        self.n_late = 0
+        self.n_underruns = 0
+
+    def __len__(self):
+        return self.n
+
+    def clear(self):
+        """Drop all the buffered samples and reset the counters."""
+        self.n = 0
+        self.offset = None
+        self.output[...] = 0
+        self.n_late = 0
+        self.n_underruns = 0
+
+    def push(self, t, value):
+        """Add a sample taken at board time ``t``."""
+        if self.n > 0 and t <= self.times[self.n - 1]:
+            self.n_late += 1
+            return
+        if self.n == self.maxlen:
+            self._discard(max(self.n // 2, 1))
+
+        self.times[self.n] = t
+        self.values[self.n] = value
+        self.n += 1
+
+    def sample(self, t):
+        """Return the (interpolated) value at host time ``t - delay``."""
+        n = self.n
+        if n == 0:
+            return self.output
+        if self.offset is None:
+            self.offset = t - self.times[n - 1]
+
+        t = t - self.offset - self.delay
+        i = np.searchsorted(self.times[:n], t)
+        if i == n:
+            self.n_underruns += 1
+            self.output[...] = self.values[n - 1]
+        elif i == 0:
+            self.output[...] = self.values[0]
+        else:
+            t0, t1 = self.times[i - 1], self.times[i]
+            alpha = (t - t0) / (t1 - t0)
+            self.output[...] = self.values[i - 1] + alpha * (
+                self.values[i] - self.values[i - 1]
+            )
+
+            # Earlier samples are no longer needed (sample times are increasing)
+            self._discard(i - 1)
+        return self.output
+
+    def _discard(self, k):
+        """Drop the ``k`` oldest samples."""
+        if k > 0:
+            self.times[: self.n - k] = self.times[k : self.n]
+            self.values[: self.n - k] = self.values[k : self.n]
+            self.n -= k
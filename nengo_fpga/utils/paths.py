@@ -7,8 +7,10 @@ import nengo
 
 if sys.platform.startswith("win"):
     config_dir = os.path.expanduser(os.path.join("~", ".nengo"))
+    cache_dir = os.path.join(config_dir, "cache", "nengo_fpga")
 else:
     config_dir = os.path.expanduser(os.path.join("~", ".config", "nengo"))
+    cache_dir = os.path.expanduser(os.path.join("~", ".cache", "nengo_fpga"))
 
 install_dir = os.path.abspath(
     os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)
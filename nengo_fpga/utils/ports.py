@@ -0,0 +1,140 @@
+"""
+Allocates the host ports used to communicate with the FPGA boards.
+
+Ports are allocated by binding them: the port numbers sent to the board-side
+scripts are the ones actually bound, so concurrent processes never pick the
+same port (which would otherwise only be noticed after the board was started).
+"""
+
+import collections
+import logging
+import random
+import socket
+
+logger = logging.getLogger(__name__)
+
+# Number of ports tried before giving up
+MAX_ATTEMPTS = 64
+
+PortAllocation = collections.namedtuple(
+    "PortAllocation", ("port", "sockets", "attempts")
+)
+PortAllocation.__doc__ = """\
+Sockets bound by `allocate_ports`.
+
+Attributes
+----------
+port : int
+    The base port (bound by the first socket).
+sockets : list of `socket.socket`
+    The bound sockets, one per port offset.
+attempts : int
+    The number of base ports tried (1 if there was no collision).
+"""
+
+
+def parse_port_range(value):
+    """
+    Parse a ``"<first>-<last>"`` port range (inclusive).
+
+    Returns ``(first, last)``, or None if ``value`` is empty.
+    """
+    if value is None or value.strip() == "":
+        return None
+    try:
+        first, last = (int(port) for port in value.split("-"))
+    except ValueError as e:
+        raise ValueError(
+            f"Invalid port range '{value}', must be '<first>-<last>'"
+        ) from e
+    if not 0 < first <= last <= 65535:
+        raise ValueError(f"Invalid port range '{value}'")
+    return first, last
+
+
+def _bind(host_ip, port, sock_type, reuse):
+    sock = socket.socket(socket.AF_INET, sock_type)
+    try:
+        if reuse:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host_ip, port))
+    except BaseException:
+        sock.close()
+        raise
+    return sock
+
+
+def allocate_ports(
+    host_ip,
+    port=0,
+    offsets=(0,),
+    port_range=None,
+    sock_type=socket.SOCK_DGRAM,
+    max_attempts=MAX_ATTEMPTS,
+):
+    """
+    Bind sockets to ports ``base + offset`` for each of ``offsets``.
+
+    Parameters
+    ----------
+    host_ip : str
+        Address the sockets are bound to.
+    port : int, optional (Default: 0)
+        The base port. If non-zero, only this base port is tried (and the
+        sockets are bound with ``SO_REUSEADDR`` so that the port can be reused
+        right after it was closed). If zero, the base port is chosen in
+        ``port_range``, or by the operating system (by binding port 0) if no
+        range is given, and other base ports are tried on collisions.
+    offsets : sequence of int, optional (Default: (0,))
+        Offsets from the base port of the ports to bind (starting with 0).
+    port_range : (int, int), optional (Default: None)
+        Range (inclusive) of the ports to choose from.
+    sock_type : int, optional (Default: ``socket.SOCK_DGRAM``)
+        Type of the sockets.
+    max_attempts : int, optional (Default: `MAX_ATTEMPTS`)
+        Number of base ports tried before giving up.
+
+    Returns
+    -------
+    `.PortAllocation`
+    """
+    fixed = port != 0
+    if fixed:
+        max_attempts = 1
+    elif port_range is not None and port_range[1] - port_range[0] < max(offsets):
+        raise ValueError(f"Port range {port_range} is too small")
+
+    error = None
+    for attempt in range(1, max_attempts + 1):
+        if fixed:
+            base = port
+        elif port_range is not None:
+            base = random.randint(port_range[0], port_range[1] - max(offsets))
+        else:
+            base = 0
+
+        sockets = []
+        try:
+            for offset in offsets:
+                if base + offset > 65535:
+                    raise OSError(f"Port {base + offset} is out of range")
+                sockets.append(_bind(host_ip, base + offset, sock_type, fixed))
+                if base == 0:
+                    # Learn the port chosen by the operating system
+                    base = sockets[0].getsockname()[1]
+        except OSError as e:
+            for sock in sockets:
+                sock.close()
+            logger.debug("Could not bind port %d+%s: %s", base, offsets, e)
+            error = e
+            continue
+
+        if attempt > 1:
+            logger.info("Bound port %d after %d attempts", base, attempt)
+        return PortAllocation(base, sockets, attempt)
+
+    raise RuntimeError(
+        f"Could not bind ports {list(offsets)} from "
+        f"{port if fixed else 'any free port'} on {host_ip} after "
+        f"{max_attempts} attempts: {error}"
+    ) from error
@@ -0,0 +1,151 @@
+"""Provides probe data streamed to chunk files on disk."""
+
+import glob
+import numbers
+import os
+
+import numpy as np
+
+
+class ProbeStream:
+    """
+    Probe data streamed to chunk files on disk, with a bounded memory footprint.
+
+    Samples are buffered in memory and written to a new ``chunk_<i>.npy`` file in
+    ``path`` every ``chunk_size`` samples. Reading the data (e.g., through
+    ``sim.data[probe]``) memory-maps the chunk files, so only the requested
+    samples are loaded. Indexing along the first (time) axis with integers or
+    slices only loads the chunks holding the requested samples, while converting
+    the stream to an array (``np.asarray(stream)``) loads all of them.
+
+    Parameters
+    ----------
+    path : str
+        Directory where the chunk files are written (existing chunk files are
+        removed).
+    chunk_size : int, optional (Default: 1000)
+        Number of samples per chunk file.
+    """
+
+    def __init__(self, path, chunk_size=1000):
+        self.path = path
+        self.chunk_size = chunk_size
+
+        self.buffer = None
+        self.n_buffered = 0
+        self.chunk_lengths = []
+
+        os.makedirs(path, exist_ok=True)
+        self.clear()
+
+    def __len__(self):
+        return sum(self.chunk_lengths) + self.n_buffered
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.path!r}, shape={self.shape})"
+
+    @property
+    def shape(self):
+        """Shape of the probe data, ``(n_samples, *sample_shape)``."""
+        return (len(self),) + (() if self.buffer is None else self.buffer.shape[1:])
+
+    @property
+    def dtype(self):
+        """Data type of the probe data."""
+        return np.dtype(float) if self.buffer is None else self.buffer.dtype
+
+    @property
+    def ndim(self):
+        """Number of dimensions of the probe data."""
+        return len(self.shape)
+
+    def chunk_filename(self, index):
+        """Path of the chunk file ``index``."""
+        return os.path.join(self.path, f"chunk_{index:06d}.npy")
+
+    def append(self, sample):
+        """Add a sample (called by the simulator every probed step)."""
+        if self.buffer is None:
+            sample = np.asarray(sample)
+            self.buffer = np.empty((self.chunk_size,) + sample.shape, sample.dtype)
+
+        self.buffer[self.n_buffered] = sample
+        self.n_buffered += 1
+        if self.n_buffered == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered samples to a new chunk file."""
+        if self.n_buffered == 0:
+            return
+
+        filename = self.chunk_filename(len(self.chunk_lengths))
+        tmp_filename = f"{filename}.tmp"
+        with open(tmp_filename, "wb") as f:
+            np.save(f, self.buffer[: self.n_buffered])
+        os.replace(tmp_filename, filename)
+
+        self.chunk_lengths.append(self.n_buffered)
+        self.n_buffered = 0
+
+    def clear(self):
+        """Remove all the samples (and chunk files)."""
+        for filename in glob.glob(os.path.join(self.path, "chunk_*.npy")):
+            os.remove(filename)
+        self.chunk_lengths = []
+        self.n_buffered = 0
+
+    def chunk(self, index):
+        """Samples of chunk ``index`` (memory-mapped, or buffered if the last)."""
+        if index == len(self.chunk_lengths):
+            return self.buffer[: self.n_buffered]
+        return np.load(self.chunk_filename(index), mmap_mode="r")
+
+    def chunks(self):
+        """Iterate over the ``(offset, length)`` of each chunk of samples."""
+        offset = 0
+        for length in self.chunk_lengths + [self.n_buffered]:
+            if length > 0:
+                yield offset, length
+            offset += length
+
+    def __array__(self, dtype=None, copy=None):
+        chunks = [self.chunk(i) for i, _ in enumerate(self.chunks())]
+        array = np.concatenate(chunks) if chunks else np.zeros(self.shape, self.dtype)
+        return array if dtype is None else array.astype(dtype)
+
+    def __getitem__(self, key):
+        index, rest = (key[0], key[1:]) if isinstance(key, tuple) else (key, ())
+
+        if isinstance(index, numbers.Integral):
+            n = len(self)
+            if not -n <= index < n:
+                raise IndexError(f"Index {index} is out of bounds for {n} samples")
+            index %= n
+            for i, (offset, length) in enumerate(self.chunks()):
+                if index < offset + length:
+                    return np.array(self.chunk(i)[(index - offset,) + rest])
+
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step > 0:
+                return self._get_slice(start, stop, step, rest)
+
+        # Other (e.g., fancy) indexing loads all the samples
+        return np.asarray(self)[key]
+
+    def _get_slice(self, start, stop, step, rest):
+        """Samples ``start:stop:step`` (``step > 0``), indexed by ``rest``."""
+        parts = []
+        for i, (offset, length) in enumerate(self.chunks()):
+            # First sample of the slice in this chunk
+            first = max(start, offset)
+            first += -(first - start) % step
+            last = min(stop, offset + length)
+            if first < last:
+                chunk = self.chunk(i)[slice(first - offset, last - offset, step)]
+                parts.append(np.array(chunk[(slice(None),) + rest]))
+
+        if not parts:
+            return np.zeros((0,) + self.shape[1:], self.dtype)[(slice(None),) + rest]
+        return np.concatenate(parts)
@@ -0,0 +1,177 @@
+"""Provides non-blocking handling of the output of board-side scripts."""
+
+import collections
+import logging
+import logging.handlers
+import queue
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Logger used for all the lines received from board-side scripts. Records are
+# handed off to a queue and emitted by a listener thread (see `RemoteLogQueue`)
+# so that slow log handlers never block the board connection.
+remote_logger = logging.getLogger("nengo_fpga.remote")
+
+# Any of "\r\n", "\r\r", "\r" or "\n" terminates a line
+_line_end = re.compile(rb"\r\n|\r\r|\r|\n")
+
+
+class LineReader:
+    """
+    Split a byte stream into lines.
+
+    Only the incomplete tail of the stream is kept between calls to `feed`, so
+    the cost of processing the stream is linear in its length. Lines longer than
+    ``max_line_length`` are split so that the buffer stays bounded. Empty lines
+    are dropped.
+
+    Parameters
+    ----------
+    max_line_length : int, optional (Default: 4096)
+        Maximum number of bytes kept for a single line.
+    encoding : str, optional (Default: "latin1")
+        Encoding used to decode the lines.
+    """
+
+    def __init__(self, max_line_length=4096, encoding="latin1"):
+        self.max_line_length = max_line_length
+        self.encoding = encoding
+        self._partial = b""
+
+    def feed(self, data):
+        """Add ``data`` (bytes) to the stream, return the list of completed lines."""
+        chunks = _line_end.split(self._partial + data)
+        self._partial = chunks.pop()
+
+        lines = [c.decode(self.encoding) for c in chunks if c]
+        while len(self._partial) > self.max_line_length:
+            lines.append(self._partial[: self.max_line_length].decode(self.encoding))
+            self._partial = self._partial[self.max_line_length :]
+        return lines
+
+    def flush(self):
+        """Return the incomplete tail of the stream (if any) as a list of lines."""
+        lines = [self._partial.decode(self.encoding)] if self._partial else []
+        self._partial = b""
+        return lines
+
+
+class RemoteLog:
+    """
+    Bounded record of the output of a board-side script.
+
+    The most recent ``maxlen`` lines (with the time they were received) are kept
+    in a ring buffer for post-mortem inspection. Lines of the standard output and
+    standard error of the script are split separately, and recorded together.
+
+    Parameters
+    ----------
+    maxlen : int, optional (Default: 1000)
+        Number of lines kept in the ring buffer.
+    max_line_length : int, optional (Default: 4096)
+        Maximum number of bytes kept for a single line.
+    """
+
+    def __init__(self, maxlen=1000, max_line_length=4096):
+        self.lines = collections.deque(maxlen=maxlen)
+        self.reader = LineReader(max_line_length=max_line_length)
+        self.stderr_reader = LineReader(max_line_length=max_line_length)
+
+    def feed(self, data, stderr=False):
+        """Process ``data`` (bytes) received from the board, return new lines."""
+        lines = (self.stderr_reader if stderr else self.reader).feed(data)
+        now = time.time()
+        self.lines.extend((now, line) for line in lines)
+        return lines
+
+    def clear_partial(self):
+        """Drop any incomplete line (e.g., left by a previous session)."""
+        self.reader.flush()
+        self.stderr_reader.flush()
+
+    def tail(self, n=None):
+        """Return the last ``n`` lines (or all recorded lines if ``None``)."""
+        lines = [line for _, line in self.lines]
+        return lines if n is None else lines[-n:]
+
+    def clear(self):
+        """Clear the recorded lines and any incomplete line."""
+        self.lines.clear()
+        self.clear_partial()
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of blocking when full."""
+
+    def __init__(self, queue_):
+        super().__init__(queue_)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _ForwardHandler(logging.Handler):
+    """Hand records from the listener thread to the ``nengo_fpga`` handlers."""
+
+    def emit(self, record):
+        parent = remote_logger.parent
+        if parent.isEnabledFor(record.levelno):
+            parent.handle(record)
+
+
+class RemoteLogQueue:
+    """
+    Owns the queue and listener thread used by ``remote_logger``.
+
+    The listener is started by the first call to `acquire` and stopped (flushing
+    any queued records) when every `acquire` has been matched by a `release`.
+
+    Parameters
+    ----------
+    maxsize : int, optional (Default: 10000)
+        Maximum number of queued records, further records are dropped.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.handler = _DroppingQueueHandler(self.queue)
+        self.listener = None
+        self._users = 0
+        self._lock = threading.Lock()
+
+    @property
+    def dropped(self):
+        """Number of remote log records dropped because the queue was full."""
+        return self.handler.dropped
+
+    def acquire(self):
+        """Start forwarding remote log records (if not already started)."""
+        with self._lock:
+            self._users += 1
+            if self.listener is None:
+                remote_logger.addHandler(self.handler)
+                remote_logger.propagate = False
+                self.listener = logging.handlers.QueueListener(
+                    self.queue, _ForwardHandler()
+                )
+                self.listener.start()
+
+    def release(self):
+        """Stop forwarding remote log records once there are no more users."""
+        with self._lock:
+            self._users = max(self._users - 1, 0)
+            if self._users == 0 and self.listener is not None:
+                self.listener.stop()
+                self.listener = None
+                remote_logger.removeHandler(self.handler)
+                remote_logger.propagate = True
+
+
+remote_log_queue = RemoteLogQueue()
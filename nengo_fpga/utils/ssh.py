@@ -0,0 +1,85 @@
+"""
+Provides helpers to launch the board-side scripts and identify boards over SSH.
+
+Paramiko (and its cryptography stack) is only imported when it is first used, so
+that importing NengoFPGA stays fast when no board is used.
+"""
+
+import base64
+import hashlib
+import socket
+import time
+
+
+def new_ssh_client():
+    """Return a new `paramiko.SSHClient` accepting unknown host keys."""
+    import paramiko  # pylint: disable=import-outside-toplevel
+
+    ssh_client = paramiko.SSHClient()
+    ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    return ssh_client
+
+
+def sudo_command(command, ssh_user):
+    """
+    Return ``command`` run as root by ``ssh_user``.
+
+    Non-root users run the command with ``sudo -n``, so the FPGA board must be
+    configured to allow the SSH user to run sudo commands WITHOUT a password
+    (see the specific FPGA hardware docs for details). If a password is
+    required, sudo fails immediately (with an error on stderr and a non-zero
+    exit status) rather than waiting for a password.
+    """
+    return command if ssh_user == "root" else f"sudo -n {command}"
+
+
+def exec_remote(ssh_client, command, combine_stderr=False):
+    """
+    Run ``command`` on a new exec channel (without a PTY) of ``ssh_client``.
+
+    Returns the channel, on which the standard output (``recv``), the standard
+    error (``recv_stderr``) and the exit status (``recv_exit_status``) of the
+    command are received, and the time (in seconds) the board took to accept the
+    command. If ``combine_stderr``, the standard error is received with the
+    standard output (so that reading one stream cannot block the other).
+    """
+    channel = ssh_client.get_transport().open_session()
+    start = time.perf_counter()
+    try:
+        if combine_stderr:
+            channel.set_combine_stderr(True)
+        channel.exec_command(command)
+    except BaseException:
+        channel.close()
+        raise
+    return channel, time.perf_counter() - start
+
+
+def key_fingerprint(key):
+    """SHA256 fingerprint of an SSH key (as shown by ``ssh-keygen -l``)."""
+    digest = hashlib.sha256(key.asbytes()).digest()
+    return "SHA256:" + base64.b64encode(digest).decode("ascii").rstrip("=")
+
+
+def fetch_host_fingerprint(ip, port=22, key_type=None, timeout=5):
+    """
+    Type and fingerprint of the host key presented by ``ip:port``.
+
+    Only the SSH key exchange is done (no authentication, and no command is
+    run on the host). If ``key_type`` is given (a host key algorithm such as
+    ``"ssh-ed25519"``), the host key of that type is requested, and a
+    `paramiko.SSHException` is raised if the host has none.
+    """
+    import paramiko  # pylint: disable=import-outside-toplevel
+
+    with socket.create_connection((ip, int(port)), timeout=timeout) as sock:
+        transport = paramiko.Transport(sock)
+        try:
+            if key_type is not None:
+                transport.get_security_options().key_types = [key_type]
+            transport.start_client(timeout=timeout)
+            return transport.host_key_type, key_fingerprint(
+                transport.get_remote_server_key()
+            )
+        finally:
+            transport.close()
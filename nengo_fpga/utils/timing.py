@@ -0,0 +1,121 @@
+"""Provides wall-clock pacing of simulation steps."""
+
+import collections
+import time
+
+import numpy as np
+
+
+class StepTimer:
+    """
+    Paces simulation steps to a target period and records deadline misses.
+
+    Each step has a deadline one ``period`` after the previous one. If a step
+    finishes early, the timer sleeps (and then spins for the last ``spin_time``
+    seconds, for accuracy) until the deadline. If a step finishes late, the
+    deadline miss is recorded and the schedule restarts from the end of that
+    step (late steps are not made up for by running the next steps faster).
+
+    Parameters
+    ----------
+    period : float
+        Target duration of a step (in seconds).
+    spin_time : float, optional (Default: 0.001)
+        Time (in seconds) spent spinning, rather than sleeping, before each
+        deadline.
+    n_bins : int, optional (Default: 50)
+        Number of bins of the step time histogram.
+    max_step_time : float, optional (Default: None)
+        Upper edge of the step time histogram (longer steps are counted in the
+        last bin). Defaults to four periods.
+    max_misses : int, optional (Default: 10000)
+        Number of deadline misses whose details are kept in ``misses``.
+
+    Attributes
+    ----------
+    n_steps : int
+        Number of steps timed since the last reset.
+    n_misses : int
+        Number of steps that finished after their deadline.
+    max_overrun : float
+        Longest time (in seconds) by which a deadline was missed.
+    total_overrun : float
+        Total time (in seconds) by which deadlines were missed.
+    misses : `collections.deque`
+        ``(step, overrun)`` pairs of the most recent deadline misses.
+    counts : (n_bins,) `numpy.ndarray`
+        Histogram of step times (excluding the time spent waiting).
+    bin_edges : (n_bins + 1,) `numpy.ndarray`
+        Edges of the step time histogram bins (in seconds).
+    """
+
+    def __init__(
+        self, period, spin_time=0.001, n_bins=50, max_step_time=None, max_misses=10000
+    ):
+        self.period = period
+        self.spin_time = spin_time
+        if max_step_time is None:
+            max_step_time = 4 * period
+        self.bin_edges = np.linspace(0, max_step_time, n_bins + 1)
+        self.misses = collections.deque(maxlen=max_misses)
+        self.counts = np.zeros(n_bins, dtype=int)
+        self.reset()
+
+    def reset(self):
+        """Clear the statistics and restart the schedule."""
+        self.n_steps = 0
+        self.n_misses = 0
+        self.max_overrun = 0.0
+        self.total_overrun = 0.0
+        self.misses.clear()
+        self.counts[...] = 0
+        self.restart()
+
+    def restart(self):
+        """
+        Restart the schedule, keeping the statistics.
+
+        The next step has a full period before its deadline, so that the time
+        elapsed since the last step (e.g., between two runs) is not counted as a
+        deadline miss.
+        """
+        self._deadline = None
+        self._step_start = None
+
+    @property
+    def miss_rate(self):
+        """Fraction of the steps that missed their deadline."""
+        return self.n_misses / self.n_steps if self.n_steps > 0 else 0.0
+
+    def begin(self):
+        """Mark the start of a step."""
+        self._step_start = time.perf_counter()
+        if self._deadline is None:
+            self._deadline = self._step_start + self.period
+
+    def end(self):
+        """Mark the end of a step and wait for its deadline."""
+        now = time.perf_counter()
+        step_time = now - self._step_start
+        bin_width = self.bin_edges[1] - self.bin_edges[0]
+        self.counts[min(int(step_time / bin_width), len(self.counts) - 1)] += 1
+
+        if now > self._deadline:
+            overrun = now - self._deadline
+            self.n_misses += 1
+            self.max_overrun = max(self.max_overrun, overrun)
+            self.total_overrun += overrun
+            self.misses.append((self.n_steps, overrun))
+            self._deadline = now + self.period
+        else:
+            self._wait_until(self._deadline)
+            self._deadline += self.period
+        self.n_steps += 1
+
+    def _wait_until(self, deadline):
+        """Sleep, then spin, until ``deadline``."""
+        remaining = deadline - time.perf_counter()
+        if remaining > self.spin_time:
+            time.sleep(remaining - self.spin_time)
+        while time.perf_counter() < deadline:
+            pass
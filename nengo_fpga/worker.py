@@ -0,0 +1,202 @@
+"""
+Persistent board-side workers running models on request.
+
+Starting the board-side script (Python interpreter startup, NumPy import and
+FPGA driver load) takes several seconds on the boards. When the ``worker``
+option of a board is set in the ``fpga_config`` file, the script is instead
+started once per board and process (``<remote_script> --worker``) and kept
+running, and each run hands it the arguments of the model to run.
+
+The worker is controlled over its SSH standard streams. Each run is requested
+with one JSON line ``{"run": <id>, "args": {...}}`` (the arguments of the
+board-side script, see `.FpgaPesEnsembleNetwork.remote_args`) written to its
+standard input. The worker reports events as lines starting with `PREFIX`
+followed by a JSON object: ``{"event": "ready"}`` once it is started, then
+``{"event": "started", "run": <id>}``, and ``{"event": "done", "run": <id>}``
+or ``{"event": "error", "run": <id>, "error": <message>}`` for each run. Other
+lines are the output of the current run.
+"""
+
+import atexit
+import itertools
+import json
+import logging
+import threading
+
+from nengo_fpga.utils.remote_log import remote_logger
+
+logger = logging.getLogger(__name__)
+
+# Prefix of the worker's event lines
+PREFIX = b"@nengo_fpga "
+
+
+class RemoteWorker:
+    """
+    A persistent board-side script that runs models on request.
+
+    Parameters
+    ----------
+    fpga_name : str
+        Name of the board (for logging).
+    ssh_client : `paramiko.SSHClient`
+        SSH client connected to the board, owned by the worker (also used to
+        transfer the data files of the runs).
+    command : str
+        Command starting the worker on the board.
+    """
+
+    def __init__(self, fpga_name, ssh_client, command):
+        self.fpga_name = fpga_name
+        self.ssh_client = ssh_client
+        self.command = command
+
+        self.stdin = None
+        self.stdout = None
+        self.listeners = {}
+        self.current_run = None
+        self.ready = threading.Event()
+        self.lock = threading.Lock()
+        self._run_ids = itertools.count()
+        self._reader = None
+
+    @property
+    def alive(self):
+        """True if the worker is running."""
+        return self._reader is not None and self._reader.is_alive()
+
+    def start(self, timeout):
+        """Start the worker and wait until it is ready to run models."""
+        self.stdin, self.stdout, _ = self.ssh_client.exec_command(self.command)
+        self._reader = threading.Thread(
+            target=self._read,
+            name=f"nengo_fpga-worker-{self.fpga_name}",
+            daemon=True,
+        )
+        self._reader.start()
+
+        if not self.ready.wait(timeout):
+            self.close()
+            raise RuntimeError(
+                f"The worker on FPGA board <{self.fpga_name}> did not start within "
+                f"{timeout}s."
+            )
+        if not self.alive:
+            raise RuntimeError(
+                f"The worker on FPGA board <{self.fpga_name}> exited on startup."
+            )
+        logger.info("<%s> Worker ready", self.fpga_name)
+
+    def submit(self, args, listener):
+        """
+        Request a run with the board-side script arguments ``args``.
+
+        ``listener(kind, payload)`` is called from the reader thread with the
+        output of the run (``"log"``, bytes), and when it ends (``"done"``,
+        ``"error"`` with the error message, or ``"exit"`` if the worker exits).
+        Returns the ID of the run.
+        """
+        with self.lock:
+            run_id = next(self._run_ids)
+            self.listeners[run_id] = listener
+            self.stdin.write(json.dumps({"run": run_id, "args": args}) + "\n")
+            self.stdin.flush()
+        return run_id
+
+    def forget(self, run_id):
+        """Stop sending the output of run ``run_id`` to its listener."""
+        with self.lock:
+            self.listeners.pop(run_id, None)
+
+    def _read(self):
+        """Dispatch the output of the worker (in the reader thread)."""
+        try:
+            for line in self.stdout:
+                if isinstance(line, str):
+                    line = line.encode("latin1")
+                if not line.endswith(b"\n"):
+                    line += b"\n"
+                if line.startswith(PREFIX):
+                    self._dispatch_event(json.loads(line[len(PREFIX) :]))
+                else:
+                    self._dispatch("log", line, self.current_run)
+        except (OSError, ValueError) as e:
+            logger.warning("<%s> Worker output error: %s", self.fpga_name, e)
+        finally:
+            logger.info("<%s> Worker exited", self.fpga_name)
+            self.ready.set()
+            with self.lock:
+                listeners, self.listeners = self.listeners, {}
+            for listener in listeners.values():
+                listener("exit", None)
+
+    def _dispatch_event(self, event):
+        kind = event.get("event")
+        if kind == "ready":
+            self.ready.set()
+        elif kind == "started":
+            self.current_run = event["run"]
+        elif kind in ("done", "error"):
+            self._dispatch(kind, event.get("error"), event["run"])
+            self.forget(event["run"])
+            self.current_run = None
+
+    def _dispatch(self, kind, payload, run_id):
+        with self.lock:
+            listener = self.listeners.get(run_id)
+        if listener is not None:
+            listener(kind, payload)
+        elif kind == "log":
+            # Output of a run that is not listened to anymore
+            remote_logger.info(
+                "<%s> %s", self.fpga_name, payload.decode("latin1").rstrip()
+            )
+
+    def close(self):
+        """Stop the worker and close its SSH connection."""
+        if self.stdin is not None:
+            try:
+                self.stdin.write(json.dumps({"exit": True}) + "\n")
+                self.stdin.flush()
+            except OSError:
+                pass
+        self.ssh_client.close()
+        if self._reader is not None:
+            self._reader.join(timeout=1)
+
+
+_workers = {}
+_worker_locks = {}
+_workers_lock = threading.Lock()
+
+
+def get_worker(fpga_name, start):
+    """
+    Get the running worker of a board, starting it if needed.
+
+    ``start()`` is called to start a new worker if the board has none, or if
+    its worker exited; it must return a started `.RemoteWorker`. Workers of
+    different boards are started concurrently; concurrent calls for the same
+    board wait for a single worker to start.
+    """
+    with _workers_lock:
+        lock = _worker_locks.setdefault(fpga_name, threading.Lock())
+
+    with lock:
+        with _workers_lock:
+            worker = _workers.get(fpga_name)
+        if worker is None or not worker.alive:
+            worker = start()
+            with _workers_lock:
+                _workers[fpga_name] = worker
+        return worker
+
+
+@atexit.register
+def shutdown_workers():
+    """Stop the workers of all boards."""
+    with _workers_lock:
+        workers = list(_workers.values())
+        _workers.clear()
+    for worker in workers:
+        worker.close()